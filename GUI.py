@@ -3,6 +3,7 @@ import tkinter as tk
 from tkinter import scrolledtext, messagebox
 import queue
 import threading
+from utils.preview import pump_previews
 
 
 class AppGUI(tk.Tk):
@@ -136,5 +137,12 @@ def start_gui(collector_instance):
     collector_thread = threading.Thread(target=collector_instance.run, daemon=True)
     collector_thread.start()
 
+    # Camera previews opened by the recording threads are drawn here, on the main thread
+    def show_previews():
+        pump_previews()
+        app.after(20, show_previews)
+
+    app.after(20, show_previews)
+
     # Start the Tkinter event loop. This is a blocking call.
     app.mainloop()
\ No newline at end of file
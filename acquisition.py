@@ -0,0 +1,906 @@
+"""
+Process-Based Acquisition Runtime
+
+Runs serial ingestion, camera capture, face analysis, storage and the GUI as
+separate processes instead of threads in one interpreter, so a slow Face Mesh
+inference or a GUI redraw can no longer stall serial reading or frame capture.
+
+    serial   -- samples (shared-memory ring) -->  storage (pulse_data.csv), GUI (monitor)
+    camera   -- frames  (shared-memory ring) -->  analysis (geometric_data.csv, roi_traces.npy),
+                                                  storage (frame images)
+    GUI      -- commands (queue) -->  supervisor -- control messages (queue per process)
+
+All processes stamp data with one SessionClock (its monotonic counter is
+system-wide), so latencies can be measured across process boundaries.
+
+The supervisor (AcquisitionRuntime, in the main process):
+- starts the processes in dependency order and waits until each reports ready
+  (the frame ring is created once the camera has reported its frame shape),
+- relays control messages (collect / stop / serial commands) and events,
+- collects per-process telemetry (CPU %, loop latency, counters),
+- shuts down in order (producers first, then consumers drain), terminates
+  processes that do not exit in time, and removes the shared memory.
+
+Usage:
+python acquisition.py --port COM3
+python acquisition.py --port synthetic --camera synthetic --no-gui
+"""
+
+import os
+import sys
+import time
+import json
+import queue
+import signal
+import argparse
+import threading
+import traceback
+import multiprocessing
+import numpy as np
+from datetime import datetime
+
+from config import data_settings as settings
+from utils.session_clock import SessionClock, FrameScheduler
+from utils.shm_ring import ShmRing, RingReader
+
+# One serial sample in the sample ring (t_ns is kept in the ring's slot metadata)
+SAMPLE_DTYPE = np.dtype([('arduino_millis', '<i8'), ('signal', '<i4'), ('led', '<i4'),
+                         ('hr', '<i4'), ('collect', '<i1')])
+
+# Cursor indices of the lossless readers of each ring
+FRAME_READERS = {'analysis': 0, 'storage': 1}
+SAMPLE_READERS = {'storage': 0}
+
+
+# ===== Process plumbing =====
+
+class _StatusWriter:
+    """stdout / stderr replacement in child processes: forwards complete lines to the supervisor."""
+
+    def __init__(self, status, role):
+        self.status = status
+        self.role = role
+        self._buffer = ""
+
+    def write(self, text):
+        self._buffer += text.replace('\r', '\n')
+        while '\n' in self._buffer:
+            line, self._buffer = self._buffer.split('\n', 1)
+            if line.strip():
+                self.status.put(('log', self.role, line))
+
+    def flush(self):
+        if self._buffer.strip():
+            self.status.put(('log', self.role, self._buffer))
+        self._buffer = ""
+
+
+class ProcessContext:
+    """Role, queues and session clock handed to every acquisition process."""
+
+    def __init__(self, role, control, status, clock):
+        self.role = role
+        self.control = control
+        self.status = status
+        self.clock = clock
+
+    def send(self, kind, *payload):
+        self.status.put((kind, self.role) + payload)
+
+    def poll_control(self, timeout=None):
+        """Next control message, or None (waits up to `timeout` seconds if given)."""
+        try:
+            if timeout is None:
+                return self.control.get_nowait()
+            return self.control.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ProcessTelemetry:
+    """
+    Per-process CPU and latency telemetry, sent to the supervisor every `interval_s`.
+    CPU % is process CPU time (all threads) over wall time, so 100 = one full core.
+    """
+
+    def __init__(self, ctx, interval_s=1.0):
+        self.ctx = ctx
+        self.interval_s = interval_s
+        self.counters = {}
+        self._latency_ns = []
+        self._loops = 0
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    def record_latency(self, latency_ns):
+        self._latency_ns.append(latency_ns)
+
+    def count(self, key, n=1):
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def tick(self):
+        self._loops += 1
+        now = time.perf_counter()
+        elapsed = now - self._wall0
+        if elapsed < self.interval_s:
+            return
+        cpu = time.process_time()
+        latency, self._latency_ns = np.asarray(self._latency_ns, dtype=np.float64) / 1e6, []
+        report = {
+            'cpu_percent': 100.0 * (cpu - self._cpu0) / elapsed,
+            'loop_hz': self._loops / elapsed,
+            'items': int(len(latency)),
+            **self.counters,
+        }
+        if len(latency):
+            report.update({'latency_mean_ms': float(latency.mean()),
+                           'latency_p95_ms': float(np.percentile(latency, 95)),
+                           'latency_max_ms': float(latency.max())})
+        self.ctx.send('telemetry', report)
+        self._wall0, self._cpu0, self._loops = now, cpu, 0
+
+
+def _process_entry(role, target, control, status, clock, kwargs):
+    """Common entry point: log forwarding, Ctrl+C handled by the supervisor only, error reporting."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sys.stdout = sys.stderr = _StatusWriter(status, role)
+    ctx = ProcessContext(role, control, status, clock)
+    try:
+        target(ctx, **kwargs)
+    except Exception:
+        ctx.send('error', traceback.format_exc())
+    finally:
+        sys.stdout.flush()
+        ctx.send('exited')
+
+
+def _to_int(value, default=-1):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class SyntheticPulseSerial:
+    """
+    Stand-in for the Arduino serial port (port='synthetic') for dry runs without hardware.
+    Emits [SENSOR] lines at 50 Hz, and [COLLECT] lines for record_duration seconds after
+    'collect', followed by COLLECTION COMPLETED, like the sketch does.
+    """
+
+    def __init__(self, rate_hz=50.0, hr_bpm=72.0, collect_s=None):
+        self.rate_hz = rate_hz
+        self.hr_bpm = hr_bpm
+        self.collect_s = collect_s if collect_s is not None else settings["record_duration"]
+        self.is_open = True
+        self._t0 = time.perf_counter()
+        self._emitted = 0
+        self._collect_until = None
+        self._pending = []
+
+    @property
+    def in_waiting(self):
+        due = int((time.perf_counter() - self._t0) * self.rate_hz)
+        while self._emitted < due:
+            self._pending.append(self._line(self._emitted))
+            self._emitted += 1
+        return sum(len(line) for line in self._pending)
+
+    def _line(self, n):
+        t = n / self.rate_hz
+        millis = int(t * 1000)
+        value = int(512 + 200 * np.sin(2 * np.pi * self.hr_bpm / 60.0 * t))
+        if self._collect_until is not None:
+            if t < self._collect_until:
+                return f"[COLLECT] TIMESTAMP_REQUEST | {millis} | {value} | 128 | {int(self.hr_bpm)}\n"
+            self._collect_until = None
+            return "[SYSTEM] COLLECTION COMPLETED\n"
+        return f"[SENSOR] Signal: {value} | LED Output: 128 | Package Number: 0%\n"
+
+    def readline(self):
+        return self._pending.pop(0).encode() if self._pending or self.in_waiting else b""
+
+    def write(self, data):
+        if data.decode().strip() == 'collect':
+            self._collect_until = self._emitted / self.rate_hz + self.collect_s
+
+    def reset_input_buffer(self):
+        self._pending = []
+
+    def close(self):
+        self.is_open = False
+
+
+# ===== Processes =====
+
+def serial_process(ctx, port, baudrate, sample_ring_spec):
+    """Read the serial port, stamp every line on the session clock and publish samples."""
+    from utils import pulse_serial  # serial connection and line parsing shared with main.py, no GUI imports
+
+    ring = ShmRing.attach(sample_ring_spec)
+    ser = SyntheticPulseSerial() if port == 'synthetic' else pulse_serial.connect(port, baudrate)
+    if ser is None:
+        raise RuntimeError(f"Cannot open serial port {port}")
+    is_paused = False
+
+    telemetry = ProcessTelemetry(ctx)
+    sample = np.zeros((), dtype=SAMPLE_DTYPE)
+    n_samples = 0
+    ctx.send('ready', {})
+
+    while True:
+        message = ctx.poll_control()
+        if message is not None:
+            if message[0] == 'stop':
+                break
+            elif message[0] == 'send':
+                pulse_serial.send_command(ser, message[1])
+
+        if ser.in_waiting > 0:
+            line = ser.readline().decode('utf-8', errors='ignore').strip()
+            t_ns = ctx.clock.now_ns()
+            if line:
+                print(line)
+                if "[SYSTEM]" in line:
+                    if "PAUSED" in line:
+                        is_paused = True
+                        ser.reset_input_buffer()
+                        print("Buffer cleared")
+                    elif "STARTED" in line:
+                        is_paused = False
+
+                # [COLLECT] samples are written by storage while a collection is open
+                publish = False
+                if "[COLLECT]" in line:
+                    data = pulse_serial.parse_collect_line(line, ctx.clock, t_ns)
+                    if data:
+                        sample['arduino_millis'] = _to_int(data[2])
+                        sample['signal'] = _to_int(data[3])
+                        sample['led'] = _to_int(data[4])
+                        sample['hr'] = _to_int(data[5])
+                        sample['collect'] = 1
+                        publish = True
+                elif not is_paused:
+                    value = pulse_serial.parse_signal_from_line(line)
+                    if value is not None:
+                        sample['arduino_millis'] = -1
+                        sample['signal'] = value
+                        sample['led'] = sample['hr'] = -1
+                        sample['collect'] = 0
+                        publish = True
+
+                if publish:
+                    if ring.write(sample, t_ns=t_ns, tag=n_samples):
+                        n_samples += 1
+                        telemetry.count('samples')
+                    else:
+                        telemetry.count('ring_full_drops')
+                    telemetry.record_latency(ctx.clock.now_ns() - t_ns)
+
+                if "COLLECTION COMPLETED" in line:
+                    ctx.send('event', 'collection_completed', {})
+        else:
+            time.sleep(0.001)
+        telemetry.tick()
+
+    ring.close()
+    if ser.is_open:
+        ser.close()
+        print("Serial port closed")
+    ring.detach()
+
+
+def camera_process(ctx, source_spec, policy):
+    """Capture frames on the session clock and publish the recorded ones into the frame ring."""
+    import cv2
+    from utils.frame_source import FrameSource, create_frame_source
+    from utils.frame_pool import read_into
+    from utils.raw_recorder import save_frame_timestamps
+
+    cap = create_frame_source(source_spec)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open camera {source_spec}")
+    is_device = not isinstance(cap, FrameSource)
+    target_fps = 50.0
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter.fourcc('M', 'J', 'P', 'G'))
+    cap.set(cv2.CAP_PROP_FPS, target_fps)
+
+    # Warm up (the first frames of a device are black) and learn the frame shape
+    ret, frame = cap.read()
+    for _ in range(20 if is_device else 0):
+        ret, frame = cap.read()
+    if not ret:
+        raise RuntimeError("Cannot grab a frame from the camera")
+    scratch = frame.copy()
+    ctx.send('ready', {'shape': frame.shape})
+
+    # The supervisor creates the frame ring once it knows the frame shape
+    message = ctx.poll_control(timeout=30.0)
+    if message is None or message[0] != 'attach':
+        raise RuntimeError(f"Expected the frame ring, got {message}")
+    ring = ShmRing.attach(message[1])
+
+    telemetry = ProcessTelemetry(ctx)
+    record = None
+
+    while True:
+        message = ctx.poll_control()
+        if message is not None:
+            if message[0] == 'stop':
+                break
+            elif message[0] == 'start_record':
+                options = message[1]
+                max_frames = int(target_fps * options['record_time']) + 1
+                record = {
+                    'output_dir': options['output_dir'],
+                    'record_time': options['record_time'],
+                    'scheduler': FrameScheduler(ctx.clock, target_fps, max_frames, policy=policy),
+                    'round': 0,
+                    'frame_numbers': [],
+                    'grab_ns': [],
+                    'ring_full_drops': 0,
+                }
+                record['scheduler'].start()
+                print(f"Start recording: {options['record_time']}s -> {options['output_dir']}")
+
+        if record is None:
+            # Idle: keep the device buffer fresh; file / synthetic sources wait
+            if is_device:
+                cap.read(image=scratch)
+            else:
+                time.sleep(0.005)
+            telemetry.tick()
+            continue
+
+        slot = ring.claim()
+        ret, frame = read_into(cap, slot if slot is not None else scratch)
+        grab_ns = ctx.clock.now_ns()
+        scheduler = record['scheduler']
+        if ret and scheduler.poll(grab_ns):
+            # Skip the first frame (warm-up), as Camera.record does
+            if record['round'] > 0:
+                frame_number = scheduler.frame_count - 1
+                if slot is not None:
+                    ring.publish(t_ns=grab_ns, tag=frame_number)
+                    record['frame_numbers'].append(frame_number)
+                    record['grab_ns'].append(grab_ns)
+                    telemetry.count('frames')
+                    telemetry.record_latency(ctx.clock.now_ns() - grab_ns)
+                else:
+                    # Analysis / storage are a full ring behind: this frame is lost
+                    record['ring_full_drops'] += 1
+                    telemetry.count('ring_full_drops')
+            record['round'] += 1
+
+        elapsed = scheduler.elapsed_s(grab_ns)
+        if not ret or elapsed >= record['record_time'] or scheduler.done:
+            if not ret:
+                print("Failed to grab frame")
+            output_dir = record['output_dir']
+            save_frame_timestamps(output_dir, np.asarray(record['frame_numbers'], dtype=np.int64),
+                                  np.asarray(record['grab_ns'], dtype=np.int64), ctx.clock)
+            report = scheduler.save_report(os.path.join(output_dir, "frame_timing.json"), skip_first=1,
+                                           runtime='processes', ring_full_drops=record['ring_full_drops'])
+            print(f"Stop: duration={elapsed:.3f}s, frames={len(record['frame_numbers'])}, "
+                  f"ring full drops={record['ring_full_drops']}")
+            ctx.send('event', 'record_done', {'frames': len(record['frame_numbers']),
+                                              'achieved_fps': report.get('achieved_fps')})
+            record = None
+        telemetry.tick()
+
+    ring.close()
+    cap.release()
+    ring.detach()
+
+
+def analysis_process(ctx, frame_ring_spec, calibration_file):
+    """Face Mesh distance / pose, face pixels and ROI traces for every recorded frame."""
+    from nexigo_camera import load_calibration
+    from utils.distance_ruler import FaceDistanceMeasurement
+    from utils.pixel_counter import FacePixelCounter
+    from utils.roi_tracer import FaceROITracer
+    from utils.geometric_logger import GeometricDataLogger
+
+    ring = ShmRing.attach(frame_ring_spec)
+    reader = RingReader(ring, lossless=True, cursor=FRAME_READERS['analysis'])
+    measurer = FaceDistanceMeasurement(load_calibration(calibration_file))
+    pixel_counter = FacePixelCounter()
+    roi_tracer = FaceROITracer()
+    telemetry = ProcessTelemetry(ctx)
+    ctx.send('ready', {})
+
+    session = None
+    stopping = False
+    while True:
+        message = ctx.poll_control()
+        if message is not None:
+            if message[0] == 'stop':
+                stopping = True
+            elif message[0] == 'start_record':
+                output_dir = message[1]['output_dir']
+                session = {'output_dir': output_dir, 'logger': GeometricDataLogger(output_dir),
+                           'expected': None, 'done': 0}
+                roi_tracer.reset()
+            elif message[0] == 'stop_record' and session is not None:
+                session['expected'] = message[1]['frames']
+
+        item = reader.get(timeout=0.005)
+        if item is not None:
+            seq, t_ns, frame_number, frame = item
+            if session is not None:
+                ts_ms = ctx.clock.to_wall_ms(t_ns)
+                measurement = measurer.measure_distance(frame)
+                pixel_info = pixel_counter.count_face_pixels(frame)
+                session['logger'].log(frame_number, ts_ms, measurement, pixel_info)
+                roi_tracer.extract(frame, frame_number, ts_ms,
+                                   pixel_info['face_landmarks'] if pixel_info else None)
+                session['done'] += 1
+                telemetry.count('frames')
+            reader.release(seq)
+            telemetry.record_latency(ctx.clock.now_ns() - t_ns)
+
+        if session is not None and session['expected'] is not None and session['done'] >= session['expected']:
+            session['logger'].close()
+            roi_tracer.save(os.path.join(session['output_dir'], "roi_traces.npy"))
+            ctx.send('event', 'analysis_done', {'frames': session['done']})
+            session = None
+
+        if stopping and item is None and (session is None or ring.closed):
+            break
+        telemetry.tick()
+
+    if session is not None:
+        session['logger'].close()
+        roi_tracer.save(os.path.join(session['output_dir'], "roi_traces.npy"))
+    reader.close()
+    ring.detach()
+
+
+def storage_process(ctx, frame_ring_spec, sample_ring_spec):
+    """Encode recorded frames and write pulse_data.csv."""
+    import csv
+    from utils.frame_writer import FrameSavePipeline
+    from utils.ppg_clean import StreamingPPGCleaner, save_quality_counts, format_counts
+
+    frame_ring = ShmRing.attach(frame_ring_spec)
+    sample_ring = ShmRing.attach(sample_ring_spec)
+    frame_reader = RingReader(frame_ring, lossless=True, cursor=FRAME_READERS['storage'])
+    sample_reader = RingReader(sample_ring, lossless=True, cursor=SAMPLE_READERS['storage'])
+    saver = FrameSavePipeline(workers=settings["save_workers"],
+                              max_queue=settings["save_queue_size"],
+                              image_format=settings["save_format"],
+                              png_compression=settings["png_compression"],
+                              full_policy=settings["save_full_policy"])
+    saver.start()
+    telemetry = ProcessTelemetry(ctx)
+    ctx.send('ready', {})
+
+    def frame_written(seq, t_ns):
+        frame_reader.release(seq)
+        telemetry.record_latency(ctx.clock.now_ns() - t_ns)
+
+    video = None
+    csv_file = csv_writer = None
+    collection_dir = None
+    cleaner = StreamingPPGCleaner(**settings.get("ppg_cleaning", {}))
+    stopping = False
+    while True:
+        message = ctx.poll_control()
+        if message is not None:
+            if message[0] == 'stop':
+                stopping = True
+            elif message[0] == 'start_record':
+                video = {'output_dir': message[1]['output_dir'], 'expected': None, 'done': 0}
+            elif message[0] == 'stop_record' and video is not None:
+                video['expected'] = message[1]['frames']
+            elif message[0] == 'start_collection':
+                filename = os.path.join(message[1]['output_dir'], "pulse_data.csv")
+                csv_file = open(filename, 'w', newline='', encoding='utf-8')
+                csv_writer = csv.writer(csv_file)
+                csv_writer.writerow(['PC_Timestamp_ms', 'PC_DateTime', 'Arduino_millis',
+                                     'Signal_Value', 'Package_Num', 'HR'])
+                collection_dir = message[1]['output_dir']
+                cleaner.reset()
+                print(f"Started data collection, saving to: {filename}")
+            elif message[0] == 'stop_collection' and csv_file is not None:
+                csv_file.close()
+                print(f"Finished data collection, saved to: {csv_file.name}")
+                cleaner.flush()
+                print(f"Signal quality: {format_counts(cleaner.counts)}")
+                save_quality_counts(cleaner.counts, collection_dir)
+                csv_file = csv_writer = None
+
+        # Samples: everything that arrived since the last pass
+        while True:
+            item = sample_reader.get()
+            if item is None:
+                break
+            seq, t_ns, _, sample = item
+            if csv_writer is not None and sample['collect'] == 1:
+                csv_writer.writerow([ctx.clock.to_wall_ms(t_ns), ctx.clock.to_datetime_str(t_ns),
+                                     int(sample['arduino_millis']), int(sample['signal']),
+                                     int(sample['led']), int(sample['hr'])])
+                if sample['signal'] >= 0:  # -1: unparseable serial field
+                    cleaner.update(sample['signal'])
+            sample_reader.release(seq)
+        if csv_file is not None:
+            csv_file.flush()
+
+        # Frames: the encoder threads read straight from shared memory and release the slot when written
+        item = frame_reader.get(timeout=0.005)
+        if item is not None:
+            seq, t_ns, _, frame = item
+            if video is not None:
+                filename = os.path.join(video['output_dir'], f"{ctx.clock.to_wall_ms(t_ns)}.png")
+                saver.submit(filename, frame, on_done=lambda seq=seq, t_ns=t_ns: frame_written(seq, t_ns))
+                video['done'] += 1
+                telemetry.count('frames')
+            else:
+                frame_reader.release(seq)
+
+        if video is not None and video['expected'] is not None and video['done'] >= video['expected']:
+            saver.join()
+            ctx.send('event', 'storage_done', {'frames': video['done'], 'save_pipeline': saver.stats()})
+            video = None
+
+        telemetry.counters['save_queue_depth'] = saver.queue_depth
+        if stopping and item is None and (video is None or frame_ring.closed):
+            break
+        telemetry.tick()
+
+    saver.close()
+    print(saver.status_line())
+    if csv_file is not None:
+        csv_file.close()
+    frame_reader.close()
+    sample_reader.close()
+    frame_ring.detach()
+    sample_ring.detach()
+
+
+def gui_process(ctx, sample_ring_spec, command_queue, log_queue):
+    """Control panel and real-time PPG monitor; commands go to the supervisor."""
+    from GUI import AppGUI
+    from utils.realtime_monitor import RealtimePPGMonitor
+
+    ring = ShmRing.attach(sample_ring_spec)
+    reader = RingReader(ring, lossless=False)
+    sample = np.zeros((), dtype=SAMPLE_DTYPE)
+    telemetry = ProcessTelemetry(ctx)
+
+    app = AppGUI(command_queue, None)
+    monitor = RealtimePPGMonitor(None)
+    monitor.create_window()
+    ctx.send('ready', {})
+
+    def pump():
+        if ctx.poll_control() is not None:  # only 'stop' is sent to the GUI
+            app.destroy()
+            return
+        for _ in range(200):
+            try:
+                app.write(log_queue.get_nowait() + "\n")
+            except queue.Empty:
+                break
+        while True:
+            item = reader.get(copy_to=sample)
+            if item is None:
+                break
+            monitor.add_data_point(int(sample['signal']))
+        telemetry.counters['lost_samples'] = reader.lost
+        telemetry.tick()
+        app.after(20, pump)
+
+    app.after(20, pump)
+    app.mainloop()
+    ring.detach()
+
+
+# ===== Supervisor =====
+
+class AcquisitionRuntime:
+    """
+    Starts, connects and supervises the acquisition processes.
+
+    Usage:
+        runtime = AcquisitionRuntime(port='COM3')
+        runtime.run()                 # blocks until 'quit' (GUI button / stdin) or Ctrl+C
+    """
+
+    # Shutdown order: producers first, so the consumers can drain what is left
+    SHUTDOWN_ORDER = ('gui', 'camera', 'serial', 'analysis', 'storage')
+    # Delay between opening the PPG CSV (collect sent to the Arduino) and starting the camera
+    RECORD_START_DELAY_S = 0.5
+
+    def __init__(self, port='COM3', baudrate=115200, camera_source=None, calibration_file=None,
+                 clock=None, gui=True, startup_timeout=60.0, shutdown_timeout=30.0):
+        """
+        Args:
+            port: Serial port of the pulse sensor ('synthetic' for a dry run).
+            baudrate: Serial baud rate.
+            camera_source: Device index / frame source spec (defaults to settings["camera_index"]).
+            calibration_file: Calibration used by the analysis process.
+            clock: SessionClock shared by all processes (a new one is created if None).
+            gui: Start the GUI process; without it commands are read from stdin.
+            startup_timeout: Seconds to wait for every process to report ready.
+            shutdown_timeout: Seconds to wait for a process to exit before terminating it.
+        """
+        self.port = port
+        self.baudrate = baudrate
+        self.camera_source = camera_source if camera_source is not None else settings["camera_index"]
+        self.calibration_file = calibration_file or settings["calibration_file"]
+        self.clock = clock if clock is not None else SessionClock()
+        self.gui = gui
+        self.startup_timeout = startup_timeout
+        self.shutdown_timeout = shutdown_timeout
+
+        self.processes = {}
+        self.controls = {}
+        self.ready = {}
+        self.telemetry = {}
+        self.telemetry_history = []
+        self.status = None
+        self.command_queue = None
+        self.gui_log = None
+        self.sample_ring = None
+        self.frame_ring = None
+        self.running = False
+        self.stopping = False
+        self.session_dir = None
+        self._next_telemetry_print = 0.0
+        self._pending_record = None     # (start time on perf_counter, start_record message)
+
+    # ----- startup -----
+
+    def _spawn(self, role, target, **kwargs):
+        control = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_process_entry, name=f"acq-{role}",
+                                          args=(role, target, control, self.status, self.clock, kwargs),
+                                          daemon=True)
+        process.start()
+        self.processes[role] = process
+        self.controls[role] = control
+
+    def _wait_ready(self, roles):
+        deadline = time.perf_counter() + self.startup_timeout
+        while not all(role in self.ready for role in roles):
+            if time.perf_counter() > deadline:
+                missing = [role for role in roles if role not in self.ready]
+                raise RuntimeError(f"Startup timed out waiting for: {missing}")
+            self.poll(timeout=0.1)
+            for role in roles:
+                if role not in self.ready and not self.processes[role].is_alive():
+                    raise RuntimeError(f"{role} process exited during startup")
+
+    def start(self):
+        """Start all processes in dependency order; raises RuntimeError (after cleanup) on failure."""
+        self.status = multiprocessing.Queue()
+        self.command_queue = multiprocessing.Queue()
+        self.gui_log = multiprocessing.Queue()
+        self.sample_ring = ShmRing(settings["shm_sample_slots"], (), SAMPLE_DTYPE,
+                                   max_readers=len(SAMPLE_READERS))
+        try:
+            self._spawn('serial', serial_process, port=self.port, baudrate=self.baudrate,
+                        sample_ring_spec=self.sample_ring.spec)
+            self._spawn('camera', camera_process, source_spec=self.camera_source,
+                        policy=settings["frame_policy"])
+            self._wait_ready(['serial', 'camera'])
+
+            shape = tuple(self.ready['camera']['shape'])
+            self.frame_ring = ShmRing(settings["shm_frame_slots"], shape, np.uint8,
+                                      max_readers=len(FRAME_READERS))
+            print(f"[Runtime] Frame ring: {settings['shm_frame_slots']} x {shape} "
+                  f"({self.frame_ring.items.nbytes / 1e6:.0f} MB), "
+                  f"sample ring: {settings['shm_sample_slots']} samples")
+            self._send('camera', ('attach', self.frame_ring.spec))
+
+            self._spawn('analysis', analysis_process, frame_ring_spec=self.frame_ring.spec,
+                        calibration_file=self.calibration_file)
+            self._spawn('storage', storage_process, frame_ring_spec=self.frame_ring.spec,
+                        sample_ring_spec=self.sample_ring.spec)
+            roles = ['analysis', 'storage']
+            if self.gui:
+                self._spawn('gui', gui_process, sample_ring_spec=self.sample_ring.spec,
+                            command_queue=self.command_queue, log_queue=self.gui_log)
+                roles.append('gui')
+            self._wait_ready(roles)
+        except Exception:
+            self.shutdown()
+            raise
+        self.running = True
+        print(f"[Runtime] All processes ready: " +
+              ", ".join(f"{role} (pid {p.pid})" for role, p in self.processes.items()))
+
+    # ----- messages -----
+
+    def _send(self, role, message):
+        if role in self.controls and self.processes[role].is_alive():
+            self.controls[role].put(message)
+
+    def _log(self, text):
+        print(text)
+        if self.gui and 'gui' in self.ready:
+            self.gui_log.put(text)
+
+    def poll(self, timeout=0.05):
+        """Handle GUI commands and one status message from the processes."""
+        while True:
+            try:
+                self.command(self.command_queue.get_nowait())
+            except queue.Empty:
+                break
+        if self._pending_record is not None:
+            start_at, record = self._pending_record
+            wait = start_at - time.perf_counter()
+            if wait <= 0:
+                self._pending_record = None
+                self._start_record(record)
+            else:
+                timeout = min(timeout, wait)
+        try:
+            message = self.status.get(timeout=timeout)
+        except queue.Empty:
+            message = None
+
+        if message is not None:
+            kind, role = message[0], message[1]
+            if kind == 'log':
+                self._log(f"[{role}] {message[2]}")
+            elif kind == 'ready':
+                self.ready[role] = message[2]
+            elif kind == 'telemetry':
+                self.telemetry[role] = message[2]
+                self.telemetry_history.append({'t_s': time.perf_counter(), 'role': role, **message[2]})
+            elif kind == 'event':
+                self._handle_event(role, message[2], message[3])
+            elif kind == 'error':
+                self._log(f"[Runtime] {role} process failed:\n{message[2]}")
+            elif kind == 'exited' and self.running and not self.stopping:
+                self._log(f"[Runtime] {role} process exited unexpectedly, shutting down")
+                self.running = False
+
+        # Supervision: a process that died without saying so
+        if self.running and not self.stopping:
+            for role, process in self.processes.items():
+                if not process.is_alive():
+                    self._log(f"[Runtime] {role} process died (exit code {process.exitcode}), shutting down")
+                    self.running = False
+                    break
+
+        now = time.perf_counter()
+        if self.running and now >= self._next_telemetry_print and self.telemetry:
+            self._next_telemetry_print = now + settings["telemetry_print_s"]
+            self._log("[Runtime] " + self.telemetry_line())
+
+    def _handle_event(self, role, name, data):
+        if name == 'collection_completed':
+            self._send('storage', ('stop_collection',))
+        elif name == 'record_done':
+            self._log(f"[Runtime] Camera recorded {data['frames']} frames")
+            self._send('analysis', ('stop_record', data))
+            self._send('storage', ('stop_record', data))
+        elif name in ('analysis_done', 'storage_done'):
+            self._log(f"[Runtime] {role} finished {data['frames']} frames")
+
+    def command(self, user_input):
+        """Handle a user command (same commands as PulseSensorCollector)."""
+        from nexigo_camera import session_folder_name
+
+        user_input = user_input.strip()
+        if user_input.lower() == 'quit':
+            self._log("\nExiting...")
+            self.running = False
+        elif user_input.lower() == 'collect':
+            rawsignal_dir = os.path.join("./data/rawsignal", datetime.now().strftime("%Y%m%d_%H%M%S"))
+            self.session_dir = os.path.join("./data/video", session_folder_name())
+            os.makedirs(rawsignal_dir, exist_ok=True)
+            os.makedirs(self.session_dir, exist_ok=True)
+
+            # Open the CSV first; the recording is started by poll() once RECORD_START_DELAY_S
+            # has passed, so commands, events and telemetry keep being handled meanwhile
+            self._send('storage', ('start_collection', {'output_dir': rawsignal_dir}))
+            self._send('serial', ('send', 'collect'))
+            record_time = settings["record_duration"] + 1
+            record = {'output_dir': self.session_dir, 'record_time': record_time}
+            self._pending_record = (time.perf_counter() + self.RECORD_START_DELAY_S, record)
+        elif user_input:
+            self._send('serial', ('send', user_input))
+
+    def _start_record(self, record):
+        self._send('analysis', ('start_record', record))
+        self._send('storage', ('start_record', record))
+        self._send('camera', ('start_record', record))
+
+    def telemetry_line(self):
+        parts = []
+        for role in self.SHUTDOWN_ORDER:
+            t = self.telemetry.get(role)
+            if t is None:
+                continue
+            part = f"{role}: cpu {t['cpu_percent']:.0f}%"
+            if 'latency_mean_ms' in t:
+                part += f" lat {t['latency_mean_ms']:.1f}/{t['latency_p95_ms']:.1f} ms"
+            parts.append(part)
+        return " | ".join(parts)
+
+    # ----- main loop / shutdown -----
+
+    def _stdin_commands(self):
+        while self.running:
+            try:
+                self.command_queue.put(input())
+            except EOFError:
+                break
+
+    def run(self):
+        """Start, then supervise until 'quit', Ctrl+C or a process failure."""
+        self.start()
+        if not self.gui:
+            threading.Thread(target=self._stdin_commands, daemon=True).start()
+        print("Commands: pause | start | collect | 0-255 | quit")
+        try:
+            while self.running:
+                self.poll()
+        except KeyboardInterrupt:
+            print("\nUser interrupted (Ctrl+C)")
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Stop the processes in order, drain them, and release the shared memory."""
+        self.stopping = True
+        self.running = False
+        self._pending_record = None
+        for role in self.SHUTDOWN_ORDER:
+            process = self.processes.get(role)
+            if process is None:
+                continue
+            self._send(role, ('stop',))
+            deadline = time.perf_counter() + self.shutdown_timeout
+            while process.is_alive() and time.perf_counter() < deadline:
+                if self.status is not None:
+                    self.poll(timeout=0.05)
+                else:
+                    process.join(timeout=0.05)
+            if process.is_alive():
+                print(f"[Runtime] {role} did not stop in {self.shutdown_timeout:.0f}s, terminating")
+                process.terminate()
+            process.join(timeout=1)
+
+        # Drain the remaining log lines
+        while self.status is not None:
+            try:
+                message = self.status.get(timeout=0.1)
+            except queue.Empty:
+                break
+            if message[0] == 'log':
+                print(f"[{message[1]}] {message[2]}")
+
+        for ring in (self.frame_ring, self.sample_ring):
+            if ring is not None:
+                ring.unlink()
+        self.frame_ring = self.sample_ring = None
+
+        if self.telemetry_history and self.session_dir is not None:
+            path = os.path.join(self.session_dir, "acquisition_telemetry.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.telemetry_history, f, indent=1)
+            print(f"[Runtime] Telemetry saved: {path}")
+        self.processes = {}
+        print("[Runtime] Stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Process-based acquisition runtime')
+    parser.add_argument('--port', type=str, default='COM3', help="serial port, or 'synthetic'")
+    parser.add_argument('--camera', type=str, default=None,
+                        help='camera index or frame source spec (default: settings["camera_index"])')
+    parser.add_argument('--no-gui', action='store_true', help='read commands from stdin instead')
+    args = parser.parse_args()
+
+    camera = int(args.camera) if args.camera is not None and args.camera.isdigit() else args.camera
+    AcquisitionRuntime(port=args.port, camera_source=camera, gui=not args.no_gui).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Headless record / measure throughput benchmark
+
+Runs the full Camera.record path (scheduling, Face Mesh, pixel counting, ROI traces,
+CSV logging and PNG saving) on a synthetic face source, without a camera or window.
+Use --max-speed to feed frames as fast as possible and find the pipeline's ceiling,
+or --source to replay a previous recording folder / video file instead.
+
+Usage:
+python benchmarks/bench_record.py --seconds 10 --width 1280 --height 720
+python benchmarks/bench_record.py --source file:./data/video/<folder> --seconds 20
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from nexigo_camera import Camera
+from utils.frame_source import SyntheticFaceSource, create_frame_source
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the headless record / measure path')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--hr', type=float, default=72.0, help='synthetic heart rate (bpm)')
+    parser.add_argument('--max-speed', action='store_true', help='do not pace the source in real time')
+    parser.add_argument('--source', type=str, default=None, help='frame source spec instead of synthetic')
+    parser.add_argument('--measure-frames', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.source:
+        source = create_frame_source(args.source)
+    else:
+        source = SyntheticFaceSource(args.width, args.height, fps=50.0, hr_bpm=args.hr,
+                                     realtime=not args.max_speed)
+    camera = Camera(0, source=source)
+
+    t0 = time.perf_counter()
+    camera.measure(display_mode='headless', max_frames=args.measure_frames)
+    print(f"measure(): {args.measure_frames / (time.perf_counter() - t0):.1f} frames/s")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        t0 = time.perf_counter()
+        camera.record(record_time=args.seconds, display_mode='headless', output_dir=output_dir)
+        elapsed = time.perf_counter() - t0
+
+        with open(os.path.join(output_dir, "frame_timing.json"), encoding='utf-8') as f:
+            timing = json.load(f)
+        pngs = sum(1 for name in os.listdir(output_dir) if name.endswith('.png'))
+        print(f"record(): {pngs} frames saved in {elapsed:.2f}s | "
+              f"achieved {timing.get('achieved_fps', 0):.2f} fps | "
+              f"late {timing['late_frames']} | dropped {timing['dropped_slots']}")
+
+    camera.release()
+
+
+if __name__ == "__main__":
+    main()
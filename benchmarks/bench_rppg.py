@@ -0,0 +1,67 @@
+"""
+rPPG algorithm benchmark
+
+Synthesizes RGB traces (N frames x ROIs x 3) with a pulsatile component of known,
+slowly varying heart rate, then times every algorithm in utils/rppg.py plus the
+windowed HR estimation, and reports the HR error against the ground truth.
+
+Usage:
+python benchmarks/bench_rppg.py --minutes 60 --fs 50
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.rppg import ALGORITHMS, extract_pulse, estimate_hr
+
+
+def synthesize_traces(n, fs, n_roi=4, seed=0):
+    """Skin-tone RGB traces with a pulse (stronger in green), illumination drift and noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / fs
+    hr_hz = 1.2 + 0.2 * np.sin(2 * np.pi * t / 300.0)          # 60-84 bpm, slowly varying
+    phase = 2 * np.pi * np.cumsum(hr_hz) / fs
+    pulse = np.sin(phase) + 0.3 * np.sin(2 * phase)
+
+    skin = np.array([180.0, 120.0, 100.0])
+    pulse_gain = np.array([0.33, 0.77, 0.53]) * 1e-3           # relative pulsatile strength per channel
+    drift = 1.0 + 0.05 * np.sin(2 * np.pi * t / 40.0)
+
+    traces = (skin[None, None, :] * drift[:, None, None]
+              * (1.0 + pulse_gain[None, None, :] * pulse[:, None, None]))
+    traces = traces + rng.normal(0.0, 0.05, size=(n, n_roi, 3))
+    return traces.astype(np.float32), hr_hz * 60.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rPPG algorithms')
+    parser.add_argument('--minutes', type=float, default=60.0)
+    parser.add_argument('--fs', type=float, default=50.0)
+    parser.add_argument('--rois', type=int, default=4)
+    args = parser.parse_args()
+
+    n = int(args.minutes * 60 * args.fs)
+    traces, hr_true = synthesize_traces(n, args.fs, args.rois)
+    print(f"Traces: {n} frames x {args.rois} ROIs x 3 ({args.minutes:.0f} min at {args.fs:.0f} fps, "
+          f"{traces.nbytes / 1e6:.1f} MB)")
+
+    for method in ALGORITHMS:
+        t0 = time.perf_counter()
+        pulse, _ = extract_pulse(traces, args.fs, method=method)
+        t1 = time.perf_counter()
+        hr = estimate_hr(pulse, args.fs)
+        t2 = time.perf_counter()
+
+        idx = np.clip((hr['times_s'] * args.fs).astype(int), 0, n - 1)
+        mae = np.mean(np.abs(hr['hr_bpm'] - hr_true[idx, None]))
+        print(f"{method:<6} pulse {t1 - t0:7.2f} s | HR {t2 - t1:6.2f} s | "
+              f"{n / (t1 - t0) / 1e3:8.1f} kframes/s | HR MAE {mae:5.2f} bpm")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+PNG sequence to video conversion benchmark
+
+Writes a synthetic PNG session (SyntheticFaceSource frames) to a temporary folder
+and converts it with one decoder and no read-ahead (the old serial loop) and with
+the parallel prefetching decoder at several worker counts.
+
+Usage:
+python benchmarks/bench_video_converter.py --frames 3000 --width 1280 --height 720 --workers 1 4 8
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+
+import cv2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.frame_source import SyntheticFaceSource
+from video_converter import convert_images_to_video
+
+
+def write_session(folder, frames, width, height):
+    source = SyntheticFaceSource(width=width, height=height, realtime=False)
+    for i in range(frames):
+        ret, frame = source.read()
+        cv2.imwrite(os.path.join(folder, f"{1_700_000_000_000 + 20 * i}.png"), frame,
+                    [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    source.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PNG sequence to video conversion benchmark')
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--workers', type=int, nargs='+', default=[os.cpu_count() or 1])
+    parser.add_argument('--executor', type=str, default='thread', choices=['thread', 'process'])
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_png_")
+    try:
+        print(f"Writing {args.frames} PNG frames ({args.width}x{args.height}) to {folder} ...")
+        write_session(folder, args.frames, args.width, args.height)
+        video = os.path.join(folder, "out.mp4")
+
+        results = [("serial (1 worker, no prefetch)",
+                    convert_images_to_video(folder, video, workers=1, prefetch=1))]
+        for workers in args.workers:
+            results.append((f"{args.executor} pool, {workers} workers",
+                            convert_images_to_video(folder, video, workers=workers, executor=args.executor)))
+
+        baseline = results[0][1]['fps']
+        print("\n" + "=" * 60)
+        for label, stats in results:
+            print(f"{label:<34} {stats['fps']:7.1f} fps  ({stats['seconds']:.2f}s, x{stats['fps'] / baseline:.2f})")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
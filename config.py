@@ -12,7 +12,56 @@ camera_name = [
 data_settings = {
     "calibration_file": "camera_calibration_iPhone15_wide_1.npz",# is only used in calibration.
     "camera_index": 0, # Select your camera device index, this depends on the computer. The default is 0, if 0 cannot detect the camera, try 1.
+                       # Also accepts a frame source spec: "v4l2:0", "dshow:0", "file:./data/video/<folder>", "synthetic" (see utils/frame_source.py).
     "camera_name": camera_name[5],# is only used in calibration.
     "ppg_input_file": "pulse_data.csv",# modify to your recorded ppg data's name format.
-    "record_duration": 60 # record duration time, second.
-}
\ No newline at end of file
+    "ppg_channels": ["Signal_Value"], # pulse_data.csv signal columns ppg_processor analyzes together, e.g. ["Red", "IR"] for a red / IR sensor pair.
+    "ppg_cleaning": {"window": 7, "n_sigmas": 3.0, "adc_range": [0, 1023], "flat_s": 0.5}, # Hampel spike filter / saturation / flat-line detection of the raw PPG (utils/ppg_clean.py), live in the collector and in ppg_processor.
+    "report_figures": True, # ppg_processor: render the spectrum / time-domain figures (False: numeric reports only).
+    "report_format": "png", # ppg_processor figure format: "png", "svg" or "webp" (smallest files).
+    "report_dpi": 150, # ppg_processor figure resolution.
+    "report_workers": 2, # ppg_processor figure rendering processes.
+    "motion_window_s": 10.0, # motion artifact windows (geometric_data.csv) and windowed PPG SQI, seconds.
+    "motion_step_s": 5.0, # hop between those windows, seconds.
+    "motion_thresholds": {}, # overrides of utils/motion.py MOTION_THRESHOLDS, e.g. {"pose_rate_dps": 30.0}.
+    "motion_gating": True, # ppg_processor: leave the windows flagged for head motion out of the windowed SQI.
+    "record_duration": 60, # record duration time, second.
+    "is_name": False, # append "_1" to the video folder name (a repeated take of the same test condition).
+    "display_mode": "preview", # "preview": decimated preview window while recording, "headless": no window at all.
+    "preview_every_n": 1, # preview shows only every Nth recorded-loop frame.
+    "preview_max_fps": 15, # preview shows at most this many frames per second.
+    "frame_policy": "drop", # when capture falls behind: "drop" skips missed frame slots, "catchup" fills them with the next frames.
+    "save_workers": 2, # number of frame encoder threads.
+    "save_queue_size": 64, # maximum number of frames waiting to be encoded.
+    "save_format": "png", # "png", "jpg", "webp" or "bmp".
+    "png_compression": 1, # PNG compression level 0-9, 0 is fastest / largest.
+    "save_full_policy": "block", # when the save queue is full: "block", "drop_oldest", or "degrade" (switch to jpg while backlogged).
+    "record_storage": "images", # "images": encode every frame (save_format), "raw": uncompressed memory-mapped frames.npy, convert later with raw_converter.py, "crop": face crop per frame + full keyframes.
+    "crop_size": 256, # crop recording: side of the saved square face crop in pixels.
+    "crop_margin": 0.25, # crop recording: border around the face bbox, fraction of its larger side on each side.
+    "crop_smoothing": 0.2, # crop recording: EMA weight of the newest face bbox (1.0 = no stabilization).
+    "crop_keyframe_every": 50, # crop recording: save every Nth full frame to keyframes/ for context.
+    "raw_online_analysis": False, # in raw mode, also run Face Mesh / geometric_data.csv / ROI traces while recording.
+    "multi_camera": False, # record all cameras in "cameras" at once (multi_camera.py) instead of camera_index only.
+    "cameras": [ # name, device index / frame source spec and calibration file of each camera for multi-camera recording.
+        {"name": "iPhone15_wide_1", "source": 0, "calibration_file": "camera_calibration_iPhone15_wide_1.npz"},
+        {"name": "NEXIGO", "source": 1, "calibration_file": "camera_calibration_NEXIGO.npz"},
+    ],
+    "multi_camera_mode": "thread", # "thread": one capture thread per camera, "process": one process per camera (spreads Face Mesh / encoding over cores).
+    "multi_camera_display_mode": "headless", # "preview" opens one window per camera, drawn by the main thread (the GUI, or MultiCameraRecorder while it waits).
+    "frame_pool_size": 0, # preallocated frame buffers for recording, 0 = save_queue_size + save_workers + 3.
+    "acquisition_runtime": "threads", # "threads": everything in one interpreter, "processes": serial / camera / analysis / storage / GUI as separate processes (acquisition.py).
+    "shm_frame_slots": 32, # processes runtime: frames buffered in shared memory between capture and analysis / storage.
+    "shm_sample_slots": 8192, # processes runtime: serial samples buffered in shared memory (~160 s at 50 Hz).
+    "telemetry_print_s": 10.0, # processes runtime: how often the per-process CPU / latency line is printed.
+}
+
+# Test condition of the current recording, encoded in the video folder name by Camera.record:
+# vid_{distance}m_{illumination}lux_{motion}_{angle}deg_use{camera}
+test_settings = {
+    "distance": 1, # subject-camera distance, meter.
+    "illumination": 300, # illumination, lux.
+    "motion": "Stationary", # motion condition, e.g. "Stationary", "Talking", "Rotation".
+    "angle": 0, # subject-camera angle, degree.
+    "camera": True # True: iPhone, False: GoPro.
+}
@@ -1,21 +1,24 @@
-import serial
 from datetime import datetime
 import csv
 import queue
-import re
 from GUI import start_gui
 from utils.realtime_monitor import start_realtime_monitor
 from nexigo_camera import *
 from config import data_settings as settings
+from utils.session_clock import SessionClock
+from multi_camera import MultiCameraRecorder
+from utils.ppg_clean import StreamingPPGCleaner, save_quality_counts, format_counts
+from utils import pulse_serial
 
 class PulseSensorCollector:
-    def __init__(self, port='COM3', baudrate=115200, save_dir="./data/rawsignal",camera = None):
+    def __init__(self, port='COM3', baudrate=115200, save_dir="./data/rawsignal",camera = None, clock=None):
         """
         Initialize serial collector.
 
         Parameters:
             port: Serial port name (Windows: COM3... | Linux/Mac: /dev/ttyUSB0, /dev/ttyACM0...)
             baudrate: Baud rate (default 115200)
+            clock: SessionClock shared with the camera (defaults to the camera's clock, or a new one)
         """
         self.port = port
         self.baudrate = baudrate
@@ -28,28 +31,23 @@ class PulseSensorCollector:
         self.command_queue = queue.Queue()
         self.monitor = None  # Real-time monitor window reference
         self.is_paused = False  # Track Arduino pause status
+        self.collection_dir = None
+        # Spike / saturation / flat-line counts of the collected samples, updated as they arrive
+        self.cleaner = StreamingPPGCleaner(**settings.get("ppg_cleaning", {}))
 
         self.camera = camera
+        if clock is None:
+            clock = camera.clock if camera is not None else SessionClock()
+        self.clock = clock
 
     def connect(self):
         """Connect to serial port"""
-        try:
-            self.ser = serial.Serial(self.port, self.baudrate, timeout=1)
-            time.sleep(2)  # Wait for Arduino reset
-            print(f"Connected to {self.port} (Baudrate: {self.baudrate})")
-            return True
-        except serial.SerialException as e:
-            print(f"Serial connection failed: {e}")
-            print(f"Please check if port name is correct")
-            return False
+        self.ser = pulse_serial.connect(self.port, self.baudrate)
+        return self.ser is not None
 
     def send_command(self, command):
         """Send command to Arduino"""
-        if self.ser and self.ser.is_open:
-            self.ser.write(f"{command}\n".encode())
-            print(f"Sent command: {command}")
-        else:
-            print("Serial not connected")
+        pulse_serial.send_command(self.ser, command)
 
     def start_collection(self, save_dir=None):
         """
@@ -74,6 +72,8 @@ class PulseSensorCollector:
             'HR'
         ])
 
+        self.collection_dir = target_dir
+        self.cleaner.reset()
         self.collection_active = True
         print(f"Started data collection, saving to: {filename}")
         print("-" * 60)
@@ -97,52 +97,31 @@ class PulseSensorCollector:
             self.collection_active = False
             print("-" * 60)
             print(f"Finished data collection, saved to: {self.csv_file.name}")
+            self.cleaner.flush()
+            print(f"Signal quality: {format_counts(self.cleaner.counts)}")
+            print(f"Saved to: {save_quality_counts(self.cleaner.counts, self.collection_dir)}")
             print(f"Collection completed")
 
-    def parse_collect_line(self, line):
-        """Parse data line during collection"""
-        try:
-            # Format: [COLLECT] TIMESTAMP_REQUEST | 5234 | 512 | 128
-            if "TIMESTAMP_REQUEST" in line:
-                parts = line.split("|")
-                if len(parts) >= 4:
-                    arduino_millis = parts[1].strip()
-                    signal_value = parts[2].strip()
-                    led_output = parts[3].strip()
-                    heart_rate = parts[4].strip()
-
-                    pc_timestamp_ms = int(time.time() * 1000)
-                    pc_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-
-                    return [pc_timestamp_ms, pc_datetime, arduino_millis, signal_value, led_output, heart_rate]
-        except Exception as e:
-            print(f"Parse error: {e}")
-        return None
-
-    def parse_signal_from_line(self, line):
+    def parse_collect_line(self, line, t_ns=None):
         """
-        Extract signal value from serial data line for real-time monitoring.
+        Parse data line during collection
 
-        Supported formats:
-        - [COLLECT] TIMESTAMP_REQUEST | 5234 | 512 | 128
-        - [SENSOR] Signal: 512 | LED Output: 128 | Package Number: 0%
+        Parameters:
+            line: Decoded serial line
+            t_ns: Session clock reading taken when the line was read (default: now)
         """
+        return pulse_serial.parse_collect_line(line, self.clock, t_ns)
+
+    def clean_sample(self, signal_value):
+        """Feed one collected signal value (string from the serial line) to the streaming cleaner."""
         try:
-            if "[COLLECT]" in line and "TIMESTAMP_REQUEST" in line:
-                parts = line.split("|")
-                if len(parts) >= 3:
-                    signal = int(parts[2].strip())
-                    return signal
-
-            elif "[SENSOR]" in line:
-                match = re.search(r'Signal:\s*(\d+)', line)
-                if match:
-                    return int(match.group(1))
-
-        except Exception:
+            self.cleaner.update(float(signal_value))
+        except ValueError:
             pass
 
-        return None
+    def parse_signal_from_line(self, line):
+        """Extract signal value from serial data line for real-time monitoring (see utils/pulse_serial.py)."""
+        return pulse_serial.parse_signal_from_line(line)
 
     def input_thread(self):
         """Thread for user input"""
@@ -206,6 +185,7 @@ class PulseSensorCollector:
                 # Read serial data
                 if self.ser.in_waiting > 0:
                     line = self.ser.readline().decode('utf-8', errors='ignore').strip()
+                    t_ns = self.clock.now_ns()
 
                     if line:
                         print(line)
@@ -224,10 +204,11 @@ class PulseSensorCollector:
                                 self.monitor.add_data_point(signal_value)
 
                         if self.collection_active and "[COLLECT]" in line:
-                            data = self.parse_collect_line(line)
+                            data = self.parse_collect_line(line, t_ns)
                             if data:
                                 self.csv_writer.writerow(data)
                                 self.csv_file.flush()
+                                self.clean_sample(data[3])
 
                         if "COLLECTION COMPLETED" in line:
                             self.stop_collection()
@@ -257,7 +238,17 @@ def main():
     print("=" * 60)
 
     port = 'COM3'
-    collector = PulseSensorCollector(port=port, baudrate=115200, camera = Camera(settings["camera_index"]))
+    # One session clock for both the serial samples and the camera frames
+    clock = SessionClock()
+    if settings["acquisition_runtime"] == "processes":
+        from acquisition import AcquisitionRuntime
+        AcquisitionRuntime(port=port, clock=clock).run()
+        return
+    if settings["multi_camera"]:
+        camera = MultiCameraRecorder(settings["cameras"], clock=clock)
+    else:
+        camera = Camera(settings["camera_index"], clock=clock)
+    collector = PulseSensorCollector(port=port, baudrate=115200, camera=camera, clock=clock)
 
     if collector.connect():
         monitor = start_realtime_monitor(collector)
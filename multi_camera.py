@@ -0,0 +1,271 @@
+"""
+Multi-Camera Synchronized Recording
+
+Records several cameras at once on one SessionClock, e.g. the iPhone15_wide_1 and
+NEXIGO viewpoints next to the PPG sensor. Every camera is a normal Camera with its
+own calibration file, save pipeline and output subfolder, and writes its own
+frame_timestamps.npy. After recording, the grab times of all cameras are matched
+frame by frame (nearest frame via searchsorted) and the inter-camera skew is
+written to camera_alignment.json.
+
+Capture runs in one thread per camera ('thread' mode, cameras are opened up front
+like a single Camera) or in one process per camera ('process' mode, so Face Mesh
+and encoding of different cameras run on different cores). The clock's monotonic
+counter is system-wide, so timestamps taken in different processes stay comparable.
+
+Usage:
+    recorder = MultiCameraRecorder([
+        {"name": "iPhone15_wide_1", "source": 0, "calibration_file": "camera_calibration_iPhone15_wide_1.npz"},
+        {"name": "NEXIGO", "source": 1, "calibration_file": "camera_calibration_NEXIGO.npz"},
+    ], clock=clock)
+    result = recorder.record(record_time=60)
+"""
+
+import os
+import json
+import queue
+import threading
+import multiprocessing
+import numpy as np
+
+from config import data_settings as settings
+from nexigo_camera import Camera, session_folder_name
+from utils.session_clock import SessionClock
+from utils.preview import pump_previews
+from utils.raw_recorder import TIMESTAMPS_FILE
+
+ALIGNMENT_FILE = "camera_alignment.json"
+
+
+def _open_camera(spec, clock):
+    return Camera(spec["source"], clock=clock,
+                  calibration_file=spec.get("calibration_file"), name=spec["name"])
+
+
+def _record_camera(camera, barrier, record_time, display_mode, output_dir, results):
+    """Wait for every camera to be ready, then record; the report goes to `results`."""
+    name = camera.name
+    try:
+        barrier.wait()
+        report = camera.record(record_time=record_time, display_mode=display_mode, output_dir=output_dir)
+        results.put((name, report))
+    except Exception as e:
+        barrier.abort()
+        print(f"[MultiCamera] {name}: recording failed: {e}")
+        results.put((name, {'error': str(e)}))
+
+
+def _record_camera_process(spec, clock, barrier, record_time, display_mode, output_dir, results):
+    """Process entry point: open the camera inside the process, then record."""
+    try:
+        camera = _open_camera(spec, clock)
+    except BaseException as e:
+        barrier.abort()
+        results.put((spec["name"], {'error': f"cannot open camera: {e!r}"}))
+        return
+    try:
+        _record_camera(camera, barrier, record_time, display_mode, output_dir, results)
+    finally:
+        camera.release()
+
+
+def align_camera_timestamps(grab_ns_by_camera, interval_ns, reference=None):
+    """
+    Match every frame of the reference camera with the nearest frame of each other
+    camera and summarize the grab-time skew.
+
+    Args:
+        grab_ns_by_camera: dict camera name -> sorted (N,) int64 grab times on the session clock.
+        interval_ns: Nominal frame interval; frames within half of it count as in sync.
+        reference: Reference camera name (defaults to the first one).
+
+    Returns:
+        dict with the reference name and, per other camera, skew statistics in ms
+        (positive skew: the other camera grabbed later), the matched frame count,
+        the overlap duration and the skew drift over the recording (ms per minute).
+    """
+    names = list(grab_ns_by_camera)
+    reference = reference or names[0]
+    ref = np.asarray(grab_ns_by_camera[reference], dtype=np.int64)
+    result = {'reference': reference, 'interval_ms': interval_ns / 1e6, 'cameras': {}}
+
+    for name in names:
+        if name == reference:
+            continue
+        other = np.asarray(grab_ns_by_camera[name], dtype=np.int64)
+        if len(ref) == 0 or len(other) == 0:
+            result['cameras'][name] = {'matched_frames': 0}
+            continue
+
+        # Only the time span both cameras were recording
+        start, end = max(ref[0], other[0]), min(ref[-1], other[-1])
+        r = ref[(ref >= start) & (ref <= end)]
+        if len(r) == 0:
+            result['cameras'][name] = {'matched_frames': 0, 'overlap_s': 0.0}
+            continue
+
+        # Nearest frame of the other camera for every reference frame
+        right = np.clip(np.searchsorted(other, r), 1, len(other) - 1) if len(other) > 1 else np.zeros(len(r), int)
+        left = np.maximum(right - 1, 0)
+        nearest = np.where(np.abs(other[left] - r) <= np.abs(other[right] - r), left, right)
+        skew_ms = (other[nearest] - r) / 1e6
+        abs_skew = np.abs(skew_ms)
+
+        stats = {
+            'matched_frames': int(len(r)),
+            'overlap_s': float((end - start) / 1e9),
+            'skew_mean_ms': float(skew_ms.mean()),
+            'skew_median_ms': float(np.median(skew_ms)),
+            'skew_std_ms': float(skew_ms.std()),
+            'abs_skew_p95_ms': float(np.percentile(abs_skew, 95)),
+            'abs_skew_max_ms': float(abs_skew.max()),
+            'in_sync_fraction': float(np.mean(abs_skew <= interval_ns / 2e6)),
+            # The same other-camera frame matched to several reference frames = it missed frames
+            'repeated_matches': int(len(nearest) - len(np.unique(nearest))),
+        }
+        if len(r) > 2 and r[-1] > r[0]:
+            slope_ms_per_ns = np.polyfit((r - r[0]).astype(np.float64), skew_ms, 1)[0]
+            stats['skew_drift_ms_per_min'] = float(slope_ms_per_ns * 60e9)
+        result['cameras'][name] = stats
+
+    return result
+
+
+class MultiCameraRecorder:
+    """
+    Several Cameras recording at the same time on a shared SessionClock.
+    Has the same record(record_time=...) / clock interface as Camera, so it can be
+    handed to PulseSensorCollector in place of a single camera.
+    """
+
+    MODES = ('thread', 'process')
+
+    def __init__(self, camera_specs=None, clock=None, mode=None):
+        """
+        Args:
+            camera_specs: List of dicts with 'name', 'source' (device index or frame source spec)
+                          and optional 'calibration_file'. Defaults to settings["cameras"].
+            clock: SessionClock shared with the serial collector (a new one is created if None).
+            mode: 'thread' or 'process' (defaults to settings["multi_camera_mode"]).
+        """
+        self.camera_specs = list(camera_specs if camera_specs is not None else settings["cameras"])
+        if not self.camera_specs:
+            raise ValueError("MultiCameraRecorder needs at least one camera spec")
+        names = [spec["name"] for spec in self.camera_specs]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Camera names must be unique: {names}")
+
+        self.mode = mode or settings["multi_camera_mode"]
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown multi-camera mode: {self.mode}, expected one of {self.MODES}")
+        self.clock = clock if clock is not None else SessionClock()
+        self.output_dir = None
+
+        # In thread mode the cameras are opened (and warmed up) right away, like a single Camera
+        self.cameras = [_open_camera(spec, self.clock) for spec in self.camera_specs] \
+            if self.mode == 'thread' else []
+
+    @property
+    def names(self):
+        return [spec["name"] for spec in self.camera_specs]
+
+    def record(self, record_time=80, display_mode=None, output_dir=None):
+        """
+        Record all cameras at once into <output_dir>/<camera name>/ and write the
+        inter-camera alignment report.
+
+        Args:
+            record_time: Duration of recording in seconds.
+            display_mode: 'preview' or 'headless' (defaults to settings["multi_camera_display_mode"]).
+            output_dir: Session folder; defaults to ./data/video/<folder named after test_settings>.
+
+        Returns:
+            dict with each camera's timing report and the alignment report.
+        """
+        display_mode = display_mode or settings["multi_camera_display_mode"]
+        self.output_dir = output_dir or os.path.join("./data/video", session_folder_name())
+        camera_dirs = {name: os.path.join(self.output_dir, name) for name in self.names}
+        for path in camera_dirs.values():
+            os.makedirs(path, exist_ok=True)
+
+        n = len(self.camera_specs)
+        print(f"[MultiCamera] Recording {n} cameras ({self.mode} mode) into {self.output_dir}")
+
+        if self.mode == 'thread':
+            results = queue.Queue()
+            barrier = threading.Barrier(n)
+            workers = [threading.Thread(target=_record_camera,
+                                        args=(camera, barrier, record_time, display_mode,
+                                              camera_dirs[camera.name], results),
+                                        daemon=True)
+                       for camera in self.cameras]
+        else:
+            results = multiprocessing.Queue()
+            barrier = multiprocessing.Barrier(n)
+            workers = [multiprocessing.Process(target=_record_camera_process,
+                                               args=(spec, self.clock, barrier, record_time, display_mode,
+                                                     camera_dirs[spec["name"]], results),
+                                               daemon=True)
+                       for spec in self.camera_specs]
+
+        for worker in workers:
+            worker.start()
+        # Collect before joining, so a process never blocks on a full result pipe. On the main
+        # thread, the previews of thread-mode cameras are drawn while waiting (utils/preview.py)
+        show_previews = threading.current_thread() is threading.main_thread()
+        reports = {}
+        while len(reports) < n:
+            try:
+                if show_previews:
+                    pump_previews()
+                name, report = results.get(timeout=0.02 if show_previews else 1.0)
+                reports[name] = report
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    print("[MultiCamera] A camera worker exited without a report")
+                    break
+        for worker in workers:
+            worker.join()
+
+        alignment = self.alignment_report(camera_dirs)
+        print(f"[MultiCamera] Done: {self.output_dir}")
+        return {'cameras': reports, 'alignment': alignment}
+
+    def alignment_report(self, camera_dirs=None):
+        """
+        Align the cameras' frame_timestamps.npy files, print a summary and save
+        camera_alignment.json in the session folder.
+        """
+        camera_dirs = camera_dirs or {name: os.path.join(self.output_dir, name) for name in self.names}
+        grab_ns = {}
+        for name, path in camera_dirs.items():
+            timestamps_file = os.path.join(path, TIMESTAMPS_FILE)
+            if os.path.exists(timestamps_file):
+                grab_ns[name] = np.load(timestamps_file)['grab_ns']
+            else:
+                print(f"[MultiCamera] {name}: no {TIMESTAMPS_FILE}, left out of the alignment")
+
+        if not grab_ns:
+            return None
+        # Nominal frame interval, taken from the reference camera's own frame spacing
+        reference = next(iter(grab_ns.values()))
+        interval_ns = int(np.median(np.diff(reference))) if len(reference) > 1 else 20_000_000
+        alignment = align_camera_timestamps(grab_ns, interval_ns)
+        alignment['frames'] = {name: int(len(g)) for name, g in grab_ns.items()}
+
+        with open(os.path.join(self.output_dir, ALIGNMENT_FILE), 'w', encoding='utf-8') as f:
+            json.dump(alignment, f, indent=2)
+
+        for name, stats in alignment['cameras'].items():
+            if not stats.get('matched_frames'):
+                print(f"[MultiCamera] {name} vs {alignment['reference']}: no overlapping frames")
+                continue
+            print(f"[MultiCamera] {name} vs {alignment['reference']}: skew mean {stats['skew_mean_ms']:+.2f} ms | "
+                  f"|skew| p95 {stats['abs_skew_p95_ms']:.2f} ms | max {stats['abs_skew_max_ms']:.2f} ms | "
+                  f"in sync {stats['in_sync_fraction'] * 100:.1f}% of {stats['matched_frames']} frames")
+        return alignment
+
+    def release(self):
+        for camera in self.cameras:
+            camera.release()
+        self.cameras = []
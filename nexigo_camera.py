@@ -3,21 +3,104 @@ import time
 import os
 import threading
 import numpy as np
-import csv
-from datetime import datetime
 from config import data_settings as settings
-from queue import Queue
 from utils.distance_ruler import FaceDistanceMeasurement, create_optimal_calibration, CameraCalibration
 from pathlib import Path
 from utils.pixel_counter import FacePixelCounter
+from utils.roi_tracer import FaceROITracer
+from utils.preview import FramePreview, run_with_previews
+from utils.session_clock import SessionClock, FrameScheduler
+from utils.frame_writer import FrameSavePipeline
+from utils.frame_pool import FrameBufferPool, read_into
+from utils.raw_recorder import RawFrameRecorder, save_frame_timestamps
+from utils.face_crop import FaceCropTracker
+from utils.geometric_logger import GeometricDataLogger
 from config import test_settings  as ts
-from remind import ExperimentProtocol
+from utils.frame_source import FrameSource, create_frame_source
 
 window_name = "Camera Preview"
 
 
+def session_folder_name():
+    """Video folder name encoding the current test_settings."""
+    folder_format = "vid_{distance}m_{illumination}lux_{motion}_{angle}deg_use{camera}"
+    if settings['is_name']:
+        folder_format += "_1"
+    return folder_format.format(distance=ts['distance'],
+                                illumination=ts['illumination'],
+                                motion=ts['motion'],
+                                angle=ts['angle'],
+                                camera='iPhone' if ts['camera'] else 'GoPro')
+
+
+def load_calibration(calibration_file=settings["calibration_file"], cap=None):
+    """
+    Load a camera calibration from ./data/camera_parameter, falling back to
+    create_optimal_calibration (focal length from `cap`, or estimated from the FOV).
+    """
+    calibration_path = Path("./data/camera_parameter") / calibration_file
+
+    if calibration_path.exists():
+        try:
+            print(f"Loading calibration from: {calibration_file}")
+            data = np.load(calibration_path)
+
+            # Extract camera matrix parameters
+            camera_matrix = data['camera_matrix']
+            fx = camera_matrix[0, 0]
+            fy = camera_matrix[1, 1]
+            cx = camera_matrix[0, 2]
+            cy = camera_matrix[1, 2]
+
+            # Use average focal length (fx and fy should be similar)
+            focal_length = (fx + fy) / 2.0
+
+            image_width = int(data['image_width'])
+            image_height = int(data['image_height'])
+
+            print(" Calibration loaded successfully at {}!".format(calibration_file))
+            print(f"  Focal Length (fx): {fx:.2f} px")
+            print(f"  Focal Length (fy): {fy:.2f} px")
+            print(f"  Mean Focal Length: {focal_length:.2f} px")
+            print(f"  Principal Point: ({cx:.2f}, {cy:.2f})")
+            print(f"  Image Size: {image_width}x{image_height}")
+
+            # Create CameraCalibration object
+            calibration = CameraCalibration(
+                focal_length=focal_length,
+                principal_point=(cx, cy),
+                image_width=image_width,
+                image_height=image_height
+            )
+
+            return calibration
+
+        except Exception as e:
+            print(f" Failed to load calibration file: {e}")
+            print("  Falling back to default calibration...")
+    else:
+        print(f" Calibration file not found: {calibration_file}")
+        print("  Falling back to default calibration...")
+
+        # Fallback to create_optimal_calibration
+    print("Using create_optimal_calibration as fallback...")
+    calibration = create_optimal_calibration(cap, 720)
+    return calibration
+
+
 class Camera:
-    def __init__(self, camera_index):
+    def __init__(self, camera_index, clock=None, source=None, calibration_file=None, name=None):
+        """
+        Args:
+            camera_index: OpenCV device index, or a frame source spec understood by
+                          create_frame_source (e.g. "v4l2:0", "file:<folder>", "synthetic")
+            clock: SessionClock shared with the serial collector (a new one is created if None)
+            source: Already-built frame source; overrides camera_index
+            calibration_file: Calibration .npz in ./data/camera_parameter (defaults to settings["calibration_file"])
+            name: Camera name, used in the preview title and by MultiCameraRecorder
+        """
+        self.name = name
+        self.clock = clock if clock is not None else SessionClock()
         self.frame_count = 0
         self.output_dir = None
         self.TARGET_FPS = 50.0
@@ -27,13 +110,13 @@ class Camera:
         #self.MAX_FRAMES = int(self.TARGET_FPS * self.RECORD_DURATION)
         self.MAX_FRAMES = int(self.TARGET_FPS * settings["record_duration"]) + 1
         #self.MAX_FRAMES = 251
-        # Save
-        self.save_queue = Queue()
-        self.save_thread = None
-        self.save_thread_running = False
+        # Save (a FrameSavePipeline is created per recording)
+        self.saver = None
 
         #self.cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
-        self.cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
+        self.cap = source if source is not None else create_frame_source(camera_index)
+        # File / synthetic sources need no device setup or warm-up
+        self.is_device = not isinstance(self.cap, FrameSource)
         self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter.fourcc('m', 'j', 'p', 'g'))
         self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter.fourcc('M', 'J', 'P', 'G'))
         self.is_window_created = False
@@ -43,93 +126,60 @@ class Camera:
         self.cap.set(cv2.CAP_PROP_FPS, self.TARGET_FPS)
         print("Camera reported FPS:", self.cap.get(cv2.CAP_PROP_FPS))
         #
-        print("Warming up camera...")
-        time.sleep(0.1)  # warmup
+        if self.is_device:
+            print("Warming up camera...")
+            time.sleep(0.1)  # warmup
 
-        # ignore the black frames
-        warmup_frames = 20
-        for i in range(warmup_frames):
-            ret, frame = self.cap.read()
-            if ret and frame is not None:
+            # ignore the black frames
+            warmup_frames = 20
+            for i in range(warmup_frames):
+                ret, frame = self.cap.read()
+                if ret and frame is not None:
 
-                mean_brightness = frame.mean()
-                if i % 10 == 0:
-                    print(f"  Warmup frame {i + 1}/{warmup_frames}, brightness: {mean_brightness:.1f}")
+                    mean_brightness = frame.mean()
+                    if i % 10 == 0:
+                        print(f"  Warmup frame {i + 1}/{warmup_frames}, brightness: {mean_brightness:.1f}")
 
         print("✓ Camera ready!")
-        calibration = self._load_calibration(settings["calibration_file"])
+        calibration = self._load_calibration(calibration_file or settings["calibration_file"])
         self.measurer = FaceDistanceMeasurement(calibration)
 
         self.pixel_counter = FacePixelCounter()
+        self.roi_tracer = FaceROITracer(capacity=self.MAX_FRAMES)
 
         # CSV logging attributes
-        self.csv_file = None
-        self.csv_writer = None
-        self._flush_buffer()
+        self.csv_logger = None
+        if self.is_device:
+            self._flush_buffer()
 
     def _load_calibration(self, calibration_file=settings["calibration_file"]):
         """"""
-        calibration_path = Path("./data/camera_parameter") / calibration_file
-
-        if calibration_path.exists():
-            try:
-                print(f"Loading calibration from: {calibration_file}")
-                data = np.load(calibration_path)
-
-                # Extract camera matrix parameters
-                camera_matrix = data['camera_matrix']
-                fx = camera_matrix[0, 0]
-                fy = camera_matrix[1, 1]
-                cx = camera_matrix[0, 2]
-                cy = camera_matrix[1, 2]
-
-                # Use average focal length (fx and fy should be similar)
-                focal_length = (fx + fy) / 2.0
-
-                image_width = int(data['image_width'])
-                image_height = int(data['image_height'])
-
-                print(" Calibration loaded successfully at {}!".format(calibration_file))
-                print(f"  Focal Length (fx): {fx:.2f} px")
-                print(f"  Focal Length (fy): {fy:.2f} px")
-                print(f"  Mean Focal Length: {focal_length:.2f} px")
-                print(f"  Principal Point: ({cx:.2f}, {cy:.2f})")
-                print(f"  Image Size: {image_width}x{image_height}")
-
-                # Create CameraCalibration object
-                calibration = CameraCalibration(
-                    focal_length=focal_length,
-                    principal_point=(cx, cy),
-                    image_width=image_width,
-                    image_height=image_height
-                )
-
-                return calibration
-
-            except Exception as e:
-                print(f" Failed to load calibration file: {e}")
-                print("  Falling back to default calibration...")
-        else:
-            print(f" Calibration file not found: {calibration_file}")
-            print("  Falling back to default calibration...")
+        return load_calibration(calibration_file, self.cap)
 
-            # Fallback to create_optimal_calibration
-        print("Using create_optimal_calibration as fallback...")
-        calibration = create_optimal_calibration(self.cap, 720)
-        return calibration
+    def _create_saver(self):
+        """Build the bounded frame save pipeline from the save settings."""
+        return FrameSavePipeline(workers=settings["save_workers"],
+                                 max_queue=settings["save_queue_size"],
+                                 image_format=settings["save_format"],
+                                 png_compression=settings["png_compression"],
+                                 full_policy=settings["save_full_policy"])
 
-    def _save_worker(self):
-        """"""
-        while self.save_thread_running:
-            try:
-                item = self.save_queue.get(timeout=0.1)
-                if item is None:
-                    break
-                filename, frame = item
-                cv2.imwrite(filename, frame)
-                self.save_queue.task_done()
-            except:
-                continue
+    def _create_frame_pool(self, shape):
+        """
+        Preallocate the frame buffers for a recording.
+        Every buffer can be held by the capture loop, the preview, an encoder or the save
+        queue at the same time, so the default size covers all of them plus one spare.
+        """
+        size = settings["frame_pool_size"] or (settings["save_queue_size"] + settings["save_workers"] + 3)
+        pool = FrameBufferPool(size, shape)
+        print(f"Frame pool: {pool.size} x {shape} ({pool.nbytes / 1e6:.0f} MB)")
+        return pool
+
+    def _close_saver(self):
+        """Drain and stop the save pipeline, if one is running."""
+        if self.saver is not None:
+            self.saver.close()
+            print(self.saver.status_line())
 
     def _calculate_angle_camera_object(self, measurement):
         """
@@ -170,87 +220,26 @@ class Camera:
             print(f"Error calculating angle_camera_object: {e}")
             return None
 
-    def _initialize_csv(self, output_dir):
+    def _initialize_csv(self, output_dir, crop_columns=False):
         """
         Initialize the CSV file for synchronized logging.
 
         Args:
             output_dir: Directory where the CSV will be saved
+            crop_columns: Add the face crop window / keyframe columns (crop recording)
         """
-        csv_filename = os.path.join(output_dir, "geometric_data.csv")
-        self.csv_file = open(csv_filename, 'w', newline='', encoding='utf-8')
-        self.csv_writer = csv.writer(self.csv_file)
-
-        # Write header
-        self.csv_writer.writerow([
-            'Frame_Number',
-            'Timestamp_ms',
-            'Timestamp_DateTime',
-            'Distance_cm',
-            'Roll_deg',
-            'Yaw_deg',
-            'Pitch_deg',
-            'Angle_Camera_Object_deg',
-            'ROI_Pixels'
-        ])
-
-        print(f"CSV file initialized: {csv_filename}")
-
-    def _log_frame_data(self, frame_number, timestamp_ms, measurement, pixel_info):
-        """
-        Log geometric data for a single frame to CSV.
+        self.csv_logger = GeometricDataLogger(output_dir, crop_columns=crop_columns)
 
-        Args:
-            frame_number: Current frame index
-            timestamp_ms: Timestamp in milliseconds
-            measurement: Dictionary from FaceDistanceMeasurement
-            pixel_info: Dictionary from FacePixelCounter
-        """
-        # Get timestamp as datetime string
-        timestamp_dt = datetime.fromtimestamp(timestamp_ms / 1000.0).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-
-        # Extract values or use NaN if face not detected
-        if measurement is not None:
-            distance = measurement['distance_cm']
-            roll = measurement['roll_degrees']
-            yaw = measurement['yaw_degrees']
-            pitch = measurement['pitch_degrees']
-            angle_camera_object = self._calculate_angle_camera_object(measurement)
-            angle_camera_object = measurement['position_azimuth']
-        else:
-            distance = np.nan
-            roll = np.nan
-            yaw = np.nan
-            pitch = np.nan
-            angle_camera_object = np.nan
-
-        # Extract pixel count
-        if pixel_info is not None:
-            roi_pixels = pixel_info['total_pixels']
-        else:
-            roi_pixels = np.nan
-
-        # Write row to CSV
-        self.csv_writer.writerow([
-            frame_number,
-            timestamp_ms,
-            timestamp_dt,
-            distance,
-            roll,
-            yaw,
-            pitch,
-            angle_camera_object,
-            roi_pixels
-        ])
-
-        # Flush to ensure data is written immediately
-        self.csv_file.flush()
+    def _log_frame_data(self, frame_number, timestamp_ms, measurement, pixel_info,
+                        crop_window=None, keyframe=False):
+        """Log geometric data for a single frame to CSV (see GeometricDataLogger.log)."""
+        self.csv_logger.log(frame_number, timestamp_ms, measurement, pixel_info, crop_window, keyframe)
 
     def _close_csv(self):
         """Close the CSV file."""
-        if self.csv_file is not None:
-            self.csv_file.close()
-            print("CSV file closed successfully")
+        if self.csv_logger is not None:
+            self.csv_logger.close()
+            self.csv_logger = None
 
     def preview(self):
         cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
@@ -279,157 +268,310 @@ class Camera:
 
         print("Camera ready!")
 
-    def record(self, record_time=80):
+    def record(self, record_time=80, display_mode=None, output_dir=None, storage=None):
         """
         Record video with synchronized geometric data logging.
 
         Args:
             record_time: Duration of recording in seconds
+            display_mode: 'preview' shows a decimated preview, drawn by the main thread
+                          (utils/preview.py), 'headless' opens no window at all.
+                          Defaults to settings["display_mode"].
+            output_dir: Output folder; defaults to ./data/video/<folder named after test_settings>
+            storage: 'images' encodes every frame to an image file, 'raw' writes uncompressed
+                     frames into a preallocated memory-mapped file (convert afterwards with
+                     raw_converter.py), 'crop' saves a stabilized fixed-size face crop per
+                     frame plus every Nth full frame into keyframes/.
+                     Defaults to settings["record_storage"].
         """
-        # Start save thread
+        display_mode = display_mode or settings["display_mode"]
+        if display_mode == 'preview':
+            # Called on the main thread, the capture loop moves to a worker and this thread shows the preview
+            return run_with_previews(self._record, record_time, display_mode, output_dir, storage)
+        return self._record(record_time, display_mode, output_dir, storage)
+
+    def _record(self, record_time, display_mode, output_dir, storage):
+        storage = storage or settings["record_storage"]
+        if storage not in ('images', 'raw', 'crop'):
+            raise ValueError(f"Unknown storage: {storage}, expected 'images', 'raw' or 'crop'")
+        raw = storage == 'raw'
+        crop = storage == 'crop'
+        # Raw mode can leave Face Mesh / CSV / ROI traces to the offline converter
+        analyze = not raw or settings["raw_online_analysis"]
+
+        # Start save pipeline
         print(f"[DEBUG] record() called, cap.isOpened()={self.cap.isOpened()}")
-        print(f"[DEBUG] save_thread_running={self.save_thread_running}")
-        print(f"[DEBUG] is_window_created={self.is_window_created}")
-        self.save_thread_running = True
-        self.save_thread = threading.Thread(target=self._save_worker, daemon=True)
-        self.save_thread.start()
-
-        # Setup window
-        if not self.is_window_created:
-            cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-            self.is_window_created = True
-
-        if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1:
-            cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+        print(f"[DEBUG] display_mode={display_mode}, storage={storage}")
+        if not raw:
+            self.saver = self._create_saver()
+            self.saver.start()
+
+        # Setup preview; the loop only offers frames, the main thread shows them (see utils/preview.py)
+        preview = None
+        if display_mode == 'preview':
+            preview = FramePreview(self._window_title(),
+                                   every_n=settings["preview_every_n"],
+                                   max_fps=settings["preview_max_fps"])
+            preview.start()
+        elif display_mode != 'headless':
+            raise ValueError(f"Unknown display_mode: {display_mode}, expected 'preview' or 'headless'")
 
         # Create output directory
         base_dir = "./data/video"
         os.makedirs(base_dir, exist_ok=True)
 
-        session_ms = int(time.time() * 1000)
-        if settings['is_name']:
-            folder_name = "vid_{distance}m_{illumination}lux_{motion}_{angle}deg_use{camera}_1".format(distance = ts['distance'],
-                                                                                                 illumination = ts['illumination'],
-                                                                                                 motion = ts['motion'],
-                                                                                                 angle = ts['angle'],
-                                                                                                 camera = 'iPhone' if ts['camera'] else 'GoPro')
-        else:
-            folder_name = "vid_{distance}m_{illumination}lux_{motion}_{angle}deg_use{camera}".format(
-                distance=ts['distance'],
-                illumination=ts['illumination'],
-                motion=ts['motion'],
-                angle=ts['angle'],
-                camera='iPhone' if ts['camera'] else 'GoPro')
-
-        self.output_dir = os.path.join(base_dir, folder_name)
+        folder_name = session_folder_name()
+
+        self.output_dir = output_dir or os.path.join(base_dir, folder_name)
         os.makedirs(self.output_dir, exist_ok=True)
 
         print("Saving frames to folder:", self.output_dir)
 
         # Initialize CSV file for synchronized logging
-        self._initialize_csv(self.output_dir)
-
-        start_time = time.time()
-        next_capture_time = start_time
+        if analyze:
+            self._initialize_csv(self.output_dir, crop_columns=crop)
+            self.roi_tracer.reset()
+
+        # Face crop recording: the crop follows the face bbox, full frames only as keyframes
+        cropper = None
+        crop_pool = None
+        if crop:
+            cropper = FaceCropTracker(settings["crop_size"], margin=settings["crop_margin"],
+                                      smoothing=settings["crop_smoothing"])
+            keyframe_every = max(1, int(settings["crop_keyframe_every"]))
+            keyframe_dir = os.path.join(self.output_dir, "keyframes")
+            os.makedirs(keyframe_dir, exist_ok=True)
+
+        # Frame pacing on the shared session clock
+        scheduler = FrameScheduler(self.clock, self.TARGET_FPS, self.MAX_FRAMES,
+                                   policy=settings["frame_policy"])
+        scheduler.start()
         self.frame_count = 0
 
         print(f"Start recording: {record_time}s, target ~{int(self.TARGET_FPS * record_time)} frames")
-        print("Synchronized CSV logging enabled")
+        if analyze:
+            print("Synchronized CSV logging enabled")
         # if ts['motion'] != 'Stationary':
         #     app = ExperimentProtocol(monitor_index=1, word=ts['motion'], log_dir=self.output_dir)
         #     app.start()
 
         round = 0
+        next_status_s = 10.0
+        # Frames are read in place into pooled buffers (or straight into the raw file's next
+        # slot); the pool / raw file is sized on the first frame
+        pool = None
+        buf = None
+        recorder = None
 
         while True:
-            if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1:
-                print("Window closed by user (X).")
+            if preview is not None and preview.stop_requested:
                 break
 
-            ret, frame = self.cap.read()
+            if raw:
+                slot = recorder.slot() if recorder is not None else None
+                if slot is None:
+                    ret, frame = self.cap.read()
+                else:
+                    ret, frame = read_into(self.cap, slot)
+                if ret and recorder is None:
+                    recorder = RawFrameRecorder(self.output_dir, frame.shape, self.MAX_FRAMES,
+                                                fps=self.TARGET_FPS, clock=self.clock)
+            elif pool is None:
+                ret, frame = self.cap.read()
+                if ret:
+                    pool = self._create_frame_pool(frame.shape)
+                    if crop:
+                        crop_pool = self._create_frame_pool((cropper.crop_size, cropper.crop_size, 3))
+            else:
+                buf = pool.acquire(timeout=1.0)
+                if buf is None:
+                    print("Frame pool exhausted (buffers not released)")
+                    break
+                ret, frame = read_into(self.cap, buf)
+            grab_ns = self.clock.now_ns()
             if not ret:
                 print("Failed to grab frame")
+                if buf is not None:
+                    buf.release()
                 break
 
-            # Display frame (with optional debug visualization)
-            cv2.imshow(window_name, frame)
-
-
-            now = time.time()
-
-            if now >= next_capture_time and self.frame_count < self.MAX_FRAMES:
-                ts_ms = int(time.time() * 1000)
+            if scheduler.poll(grab_ns):
+                # Filename and CSV use the frame's actual grab time
+                ts_ms = self.clock.to_wall_ms(grab_ns)
                 filename = os.path.join(self.output_dir, f"{ts_ms}.png")
 
                 # Skip the first frame (warm-up)
                 if round > 0:
-                    # ===== GEOMETRIC PROCESSING =====
-                    # Measure face distance and pose
-                    measurement = self.measurer.measure_distance(frame)
-
-                    # Count face pixels
-                    pixel_info = self.pixel_counter.count_face_pixels(frame)
-
-                    # Log data to CSV (1-to-1 mapping with frame)
-                    self._log_frame_data(self.frame_count, ts_ms, measurement, pixel_info)
-
-                    # Save frame to disk
-                    self.save_queue.put((filename, frame.copy()))
+                    if analyze:
+                        # ===== GEOMETRIC PROCESSING =====
+                        # Measure face distance and pose
+                        measurement = self.measurer.measure_distance(frame)
+
+                        # Count face pixels
+                        pixel_info = self.pixel_counter.count_face_pixels(frame)
+
+                        crop_window, keyframe = None, False
+                        if crop:
+                            crop_window = cropper.update(pixel_info['bbox'] if pixel_info else None,
+                                                         frame.shape)
+                            keyframe = (self.frame_count - 1) % keyframe_every == 0
+
+                        # Log data to CSV (1-to-1 mapping with frame)
+                        self._log_frame_data(self.frame_count, ts_ms, measurement, pixel_info,
+                                             crop_window, keyframe)
+
+                        # Extract ROI RGB traces (1-to-1 mapping with the CSV rows)
+                        self.roi_tracer.extract(frame, self.frame_count, ts_ms,
+                                                pixel_info['face_landmarks'] if pixel_info else None)
+
+                    if raw:
+                        # Already in the raw file's slot; this only commits it and its timestamp
+                        recorder.write(frame, self.frame_count, ts_ms, grab_ns)
+                    elif crop:
+                        # The crop goes into its own pooled buffer, owned by the saver from here on
+                        crop_buf = crop_pool.acquire(timeout=1.0)
+                        if crop_buf is not None:
+                            self.saver.submit(filename, cropper.crop(frame, out=crop_buf.array),
+                                              on_done=crop_buf.release)
+                        else:
+                            self.saver.submit(filename, cropper.crop(frame))
+                        if keyframe:
+                            key_filename = os.path.join(keyframe_dir, os.path.basename(filename))
+                            if buf is not None:
+                                self.saver.submit(key_filename, frame, on_done=buf.retain().release)
+                            else:
+                                self.saver.submit(key_filename, frame.copy())
+                    # Save frame to disk (bounded queue, policy from settings); the saver
+                    # holds its own reference and releases it once written or dropped
+                    elif buf is not None:
+                        self.saver.submit(filename, frame, on_done=buf.retain().release)
+                    else:
+                        self.saver.submit(filename, frame)
 
                 round += 1
-                self.frame_count += 1
-                next_capture_time += self.FRAME_INTERVAL
+                self.frame_count = scheduler.frame_count
+
+            # Display frame (decimated, picked up by the main thread)
+            if preview is not None:
+                preview.offer(frame, buffer=buf)
+
+            # The capture loop is done with this frame
+            if buf is not None:
+                buf.release()
+                buf = None
+
+            elapsed = scheduler.elapsed_s(grab_ns)
+            if elapsed >= next_status_s:
+                if raw:
+                    print(f"[Raw] {recorder.count}/{recorder.capacity} frames")
+                else:
+                    print(self.saver.status_line())
+                next_status_s += 10.0
+
+            if elapsed >= record_time or scheduler.done:
+                print(f"Stop: duration={elapsed:.3f}s, frames={self.frame_count}")
+                break
 
-            if (now - start_time) >= record_time or self.frame_count >= self.MAX_FRAMES:
-                print(f"Stop: duration={now - start_time:.3f}s, frames={self.frame_count}")
+        # Wait for the save queue to drain and stop the encoders
+        if raw:
+            if recorder is not None:
+                recorder.close()
+        else:
+            self._close_saver()
 
-                # Wait for save queue to finish
-                self.save_queue.join()
+        # Close CSV file
+        if analyze:
+            self._close_csv()
+            self.roi_tracer.save(os.path.join(self.output_dir, "roi_traces.npy"))
+
+        if preview is not None:
+            preview.stop()
+            print(f"Preview: shown {preview.shown_frames} frames, dropped {preview.dropped_frames}")
+        # if app is not None:
+        #     app.stop()
+
+        # Per-frame timestamps on the session clock (the raw recorder already wrote them)
+        if recorder is None:
+            self._save_frame_timestamps(scheduler, skip_first=1)
+
+        # Timing report (the first captured frame is the skipped warm-up frame)
+        report = scheduler.save_report(os.path.join(self.output_dir, "frame_timing.json"),
+                                       skip_first=1, display_mode=display_mode, storage=storage,
+                                       save_pipeline=self.saver.stats() if self.saver is not None else None,
+                                       raw_frames=recorder.count if recorder is not None else None,
+                                       crop={'size': cropper.crop_size, 'keyframe_every': keyframe_every}
+                                       if cropper is not None else None,
+                                       frame_pool=pool.stats() if pool is not None else None)
+        self.saver = None
+        if pool is not None:
+            print(f"Frame pool: {pool.stats()}")
+        self._report_capture_stats(report)
+        return report
+
+    def _window_title(self):
+        return f"{window_name} ({self.name})" if self.name else window_name
+
+    def _save_frame_timestamps(self, scheduler, skip_first=1):
+        """Save frame_timestamps.npy for the frames captured by the scheduler (as a raw recording has)."""
+        grab_ns = scheduler.grab_ns[skip_first:scheduler.frame_count]
+        save_frame_timestamps(self.output_dir, np.arange(skip_first, skip_first + len(grab_ns)), grab_ns, self.clock)
+
+    def _report_capture_stats(self, report):
+        """
+        Print the achieved capture rate, frame-interval jitter and late / dropped counts.
 
-                # Stop save thread
-                self.save_thread_running = False
-                self.save_queue.put(None)
-                self.save_thread.join(timeout=2)
+        Args:
+            report: Dictionary from FrameScheduler.stats()
+        """
+        if 'achieved_fps' not in report:
+            print("Capture stats: not enough frames")
+            return
 
-                # Close CSV file
-                self._close_csv()
+        print(f"Capture stats [{report['display_mode']}, {report['policy']}]: "
+              f"{report['achieved_fps']:.2f} fps (target {report['target_fps']:.0f}) | "
+              f"interval {report['interval_mean_ms']:.2f} ms | jitter (std) {report['jitter_std_ms']:.2f} ms | "
+              f"p95 {report['interval_p95_ms']:.2f} ms | max {report['interval_max_ms']:.2f} ms | "
+              f"late {report['late_frames']} | dropped {report['dropped_slots']}")
 
-                cv2.destroyWindow(window_name)
-                self.is_window_created = False
-                # if app is not None:
-                #     app.stop()
-                break
+    def measure(self, display_mode='preview', max_frames=None):
+        """
+        Live distance / pose / pixel measurement.
 
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q') or key == 27:
-                print("Exit by key")
-                self.save_thread_running = False
-                self.save_queue.put(None)
-                self._close_csv()
-                cv2.destroyWindow(window_name)
-                self.is_window_created = False
-                break
+        Args:
+            display_mode: 'preview' shows the annotated frames, 'headless' only prints
+            max_frames: Stop after this many frames (None: until q / Esc / end of source)
+        """
+        if display_mode == 'preview':
+            return run_with_previews(self._measure, display_mode, max_frames)
+        return self._measure(display_mode, max_frames)
 
-    def measure(self):
-        """"""
+    def _measure(self, display_mode, max_frames):
         if not self.measurer:
             print("fail to initialize")
             return
 
         print("Start to measure\n")
-        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-        self.is_window_created = True
+        preview = None
+        if display_mode == 'preview':
+            preview = FramePreview(self._window_title(), every_n=1, max_fps=None)
+            preview.start()
+
+        n_frames = 0
+        start_ns = self.clock.now_ns()
 
         while True:
             #
-            if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1:
+            if preview is not None and preview.stop_requested:
                 print("\nclose")
                 break
+            if max_frames is not None and n_frames >= max_frames:
+                break
 
             ret, frame = self.cap.read()
             if not ret:
                 print("no frame exists")
                 break
+            n_frames += 1
 
             # begin to measure the distance
             measurement = self.measurer.measure_distance(frame)
@@ -457,43 +599,37 @@ class Camera:
                 print("\rCan not detect face", end='\n', flush=True)
 
             # Visualize results
-            frame_display = self.measurer.draw_on_frame(frame, measurement) if self.measurer else frame
-            frame_display = self.pixel_counter.draw_pixel_info(frame_display, pixel_info,
-                                                               show_contour=True,
-                                                               show_bbox=False)
-
-            cv2.imshow(window_name, frame_display)
-
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q') or key == 27:
-                print("\nexit")
-                break
-
-        cv2.destroyAllWindows()
-        self.is_window_created = False
+            if preview is not None:
+                frame_display = self.measurer.draw_on_frame(frame, measurement) if self.measurer else frame
+                frame_display = self.pixel_counter.draw_pixel_info(frame_display, pixel_info,
+                                                                   show_contour=True,
+                                                                   show_bbox=False)
+                preview.offer(frame_display)
+
+        if preview is not None:
+            preview.stop()
+        elapsed = (self.clock.now_ns() - start_ns) / 1e9
+        if n_frames and elapsed > 0:
+            print(f"Measured {n_frames} frames in {elapsed:.2f}s ({n_frames / elapsed:.1f} fps)")
         print("measurement ends")
 
     def __del__(self):
-        if hasattr(self, 'save_thread') and self.save_thread and self.save_thread.is_alive():
-            self.save_thread_running = False
-            self.save_queue.put(None)
-            self.save_thread.join(timeout=1)
+        if getattr(self, 'saver', None) is not None:
+            self._close_saver()
 
         # Close CSV if still open
-        if hasattr(self, 'csv_file') and self.csv_file is not None:
+        if getattr(self, 'csv_logger', None) is not None:
             self._close_csv()
 
         self.cap.release()
         cv2.destroyAllWindows()
         print(f"Camera released.")
     def release(self):
-        if hasattr(self, 'save_thread') and self.save_thread and self.save_thread.is_alive():
-            self.save_thread_running = False
-            self.save_queue.put(None)
-            self.save_thread.join(timeout=1)
+        if getattr(self, 'saver', None) is not None:
+            self._close_saver()
 
         # Close CSV if still open
-        if hasattr(self, 'csv_file') and self.csv_file is not None:
+        if getattr(self, 'csv_logger', None) is not None:
             self._close_csv()
 
         self.cap.release()
@@ -4,6 +4,11 @@ import pandas as pd
 
 from config import data_settings
 from utils.evaluate_ppg import *
+from utils.session import load_ppg_file, ppg_channels, find_ppg_sessions, Dataset
+from utils.hrv import analyze_ppg
+from utils.report_renderer import ReportRenderer, write_report_index
+from utils.report_aggregator import ReportAggregator
+from utils.ppg_clean import clean_ppg, format_counts
 
 
 class PhotoplethysmographyProcessor:
@@ -13,8 +18,8 @@ class PhotoplethysmographyProcessor:
     """
 
     def __init__(self):
-        # Channels to be used
-        self.used_ch = ['Signal_Value']
+        # Channels to be used (pulse_data.csv columns), processed together as one (channels x samples) array
+        self.used_ch = list(data_settings.get("ppg_channels", ['Signal_Value']))
 
         # Configuration (same as original script)
         self.sample_rate = int(70e3)  # for 'i' or 'd' mode (not used here but kept)
@@ -30,8 +35,16 @@ class PhotoplethysmographyProcessor:
             [32.0e3, 40.0e3],
         )
 
+        # Sliding window of the per-window HRV report (seconds)
+        self.hrv_window_s = 60.0
+        self.hrv_step_s = 30.0
+        # Sliding window of the per-window SQI report, and whether windows with head motion are skipped
+        self.sqi_window_s = data_settings.get("motion_window_s", 10.0)
+        self.sqi_step_s = data_settings.get("motion_step_s", 5.0)
+        self.motion_gating = data_settings.get("motion_gating", True)
+
         self.show_figures = False
-        self.save_figures = False
+        self.save_figures = data_settings.get("report_figures", True)  # figures are rendered by utils/report_renderer.py
         self.data_file_name = 'HQ_proto_v4'
 
         # Results containers
@@ -52,47 +65,30 @@ class PhotoplethysmographyProcessor:
         Read a single PPG CSV file and extract channel data.
 
         Returns:
-            list of dicts: [{"ch": <channel_index>, "data": [values, ...]}, ...]
+            (channels, samples) float array of the used_ch columns, the (samples,) PC
+            timestamps in ms and the clean_ppg counts per channel. Values are taken as
+            absolute integers, spikes are replaced by the Hampel median (utils/ppg_clean.py),
+            and samples where any channel is missing or zero are dropped.
         """
-        df = pd.read_csv(file_path)
-
-        all_chs_data = []
-        # Force column names to match the original format
-        df.columns = [
-            'PC_Timestamp_ms',
-            'PC_DateTime',
-            'Arduino_millis',
-            'Signal_Value',
-            'Package_Num',
-            'HR'
-        ]
-
-        try:
-            hrs = [abs(int(i)) for i in df['HR'].dropna().values]
-            hrs = self.remove_zeros(hrs)
-            if len(hrs) > 0:
-                HR_avg = sum(hrs) / len(hrs)
-            else:
-                HR_avg = None  #
-        except KeyError:
-            # No HR column
-            HR_avg = None
-        except Exception as e:
-            #
-            print(f"There is no column named HR: {e}")
-            HR_avg = None
+        # Typed, memory-mapped cache of the CSV (utils.session), parsed once per file
+        table = load_ppg_file(file_path)
+
+        hrs = np.abs(table['hr'][np.isfinite(table['hr'])].astype(np.int64))
+        hrs = hrs[hrs != 0]
+        HR_avg = float(hrs.mean()) if len(hrs) > 0 else None
         if HR_avg is not None:
             print('Average HR from Arduino:', HR_avg)
 
         # Extract PPG column data
-        for ch in self.used_ch:
-            data = [abs(int(i)) for i in df[ch].dropna().values]
-            data = self.remove_zeros(data)
-            all_chs_data.append({"ch": 0, "data": data})
-            fpath = file_path  # kept to preserve original structure (even if unused)
-
+        data = ppg_channels(table, self.used_ch)
+        finite = np.all(np.isfinite(data), axis=0)
+        raw = np.abs(np.trunc(data[:, finite]))
+        cleaned = clean_ppg(raw, fs=self.bfi_sample_rate, **data_settings.get("ppg_cleaning", {}))
+        for ch, name in enumerate(self.used_ch):
+            print(f"{name}: {format_counts({k: v if np.ndim(v) == 0 else v[ch] for k, v in cleaned['counts'].items()})}")
 
-        return all_chs_data
+        keep = np.all(raw != 0, axis=0)
+        return cleaned['ppg'][:, keep], table['pc_timestamp_ms'][finite][keep], cleaned['counts']
 
     # ---------- Main processing entry ----------
 
@@ -101,13 +97,20 @@ class PhotoplethysmographyProcessor:
         Main processing function: search for PPG files, compute SQI,
         and save CSV reports. This corresponds to the original top-level script.
         """
-        roots = []
-
         # Search for folders containing the target PPG file
-        for root, dirs, files in os.walk("./data/rawsignal"):
-            if data_settings["ppg_input_file"] in files:
-                roots.append(root)
-                print(f"Find the path: {root}")
+        roots = find_ppg_sessions("./data/rawsignal")
+        for root in roots:
+            print(f"Find the path: {root}")
+
+        out_dir = "./data/ppg_reports"  # The first layer of saved CSV
+        # Video session recorded with every collection: test condition (folder name) and head motion
+        sessions = {s.ppg_dir: s for s in Dataset("./data/video", "./data/rawsignal") if s.ppg_dir}
+        # Dataset-wide statistics, updated as every file finishes
+        aggregator = ReportAggregator()
+        # Figures render in worker processes while the next files are analyzed
+        renderer = ReportRenderer(fmt=data_settings.get("report_format", "png"),
+                                  dpi=data_settings.get("report_dpi", 150),
+                                  workers=data_settings.get("report_workers", 2)) if self.save_figures else None
 
         # Process each found folder
         for root in roots:
@@ -121,65 +124,131 @@ class PhotoplethysmographyProcessor:
             try:
                 print(f"\n=== Processing File: {ppg_file} ===")
                 rows = []
-                ppg_datas = self.read_ppg_file(ppg_file, data_settings)
+                hrv_results = []
+                sqi_windows = []
+                ppg_data, ppg_times, cleaning = self.read_ppg_file(ppg_file, data_settings)
+                session = sessions.get(root)
+                metadata = session.metadata if session is not None else {}
+                aggregator.add_session(metadata)
+
+                # Samples recorded while the head moved (geometric_data.csv of the matched video)
+                skip = None
+                if self.motion_gating and session is not None and session.motion is not None:
+                    skip = session.motion_mask(ppg_times)
+                    print(f"Motion: {int(session.motion['flagged'].sum())}/{len(session.motion)} windows flagged, "
+                          f"{skip.mean() * 100:.1f}% of the samples skipped")
+
+                # SQI / spectral HR of all channels in one call
+                sqi_result = compute_ppg_sqi_batch(ppg_data, fs_in=self.bfi_sample_rate)
+                # Beat-to-beat HR and HRV from the time-domain peaks
+                ppg_filt, fs = preprocess_ppg_batch(ppg_data, self.bfi_sample_rate)
 
-                for e in ppg_datas:
-                    ch_name = e["ch"]
-                    ppg_data = np.asarray(e["data"], dtype=float)
+                parent_folder = os.path.basename(os.path.dirname(ppg_file))
+                save_dir = os.path.join(out_dir, parent_folder)
+                os.makedirs(save_dir, exist_ok=True)
 
-                    SQI_final, f_hr = compute_ppg_sqi(
-                        ppg_data,
-                        file_path=ppg_file,
-                        ch=ch_name,
-                        fs_in=self.bfi_sample_rate
-                    )
+                for ch_name in range(ppg_data.shape[0]):
+                    if renderer is not None:
+                        renderer.ppg_channel(sqi_result, ch_name, save_dir, ch_name)
+                    hrv = analyze_ppg(ppg_filt[ch_name], fs, window_s=self.hrv_window_s, step_s=self.hrv_step_s)
+                    summary = hrv["summary"]
+                    windows = compute_ppg_sqi_windows(ppg_data[ch_name], self.bfi_sample_rate,
+                                                      self.sqi_window_s, self.sqi_step_s, skip=skip)
+                    kept_sqi = windows["sqi"][~windows["skipped"]]
+                    sqi_windows.append(pd.DataFrame({
+                        "ch": ch_name,
+                        "Start_s": windows["start_s"],
+                        "SQI": windows["sqi"],
+                        "HR_bpm": windows["f_hr"] * 60.0,
+                        "Motion_skipped": windows["skipped"],
+                    }))
 
                     rows.append({
                         "file": os.path.basename(ppg_file),
                         "ch": ch_name,
-                        "SQI_final": float(SQI_final),
-                        "HR_peak_Hz": float(f_hr)
+                        "SQI_final": float(sqi_result["sqi"][ch_name]),
+                        "HR_peak_Hz": float(sqi_result["f_hr"][ch_name]),
+                        "Beats": summary["beats"],
+                        "HR_beats_bpm": summary["hr_bpm"],
+                        "SDNN_ms": summary["sdnn_ms"],
+                        "RMSSD_ms": summary["rmssd_ms"],
+                        "pNN50": summary["pnn50"],
+                        "LF_HF": summary["lf_hf"],
+                        "SQI_window_mean": float(kept_sqi.mean()) if kept_sqi.size else np.nan,
+                        "Motion_skipped": float(windows["skipped"].mean()) if windows["skipped"].size else np.nan,
+                        "Spikes": int(cleaning["spikes"][ch_name]),
+                        "Saturated": int(cleaning["saturated"][ch_name]),
+                        "Flat_segments": int(cleaning["flat_segments"][ch_name]),
+                        "Flat_samples": int(cleaning["flat_samples"][ch_name]),
+                    })
+                    hrv_results.append((ch_name, hrv))
+                    aggregator.add(metadata, {
+                        **{k: v for k, v in rows[-1].items() if k not in ("file", "ch")},
+                        "window_hr_bpm": hrv["windows"]["hr_bpm"],
+                        "window_rmssd_ms": hrv["windows"]["rmssd_ms"],
+                        "window_sqi": kept_sqi,
                     })
 
                     # Save per-file SQI
-                    self.all_file_sqi.append(SQI_final)
-                    self.file_sqi_records.append((f"{root}:{ch_name}", float(SQI_final)))
+                    self.all_file_sqi.append(rows[-1]["SQI_final"])
+                    self.file_sqi_records.append((f"{root}:{ch_name}", rows[-1]["SQI_final"]))
 
                 # Save results
-                out_dir = "./data/ppg_reports"  # The first layer of saved CSV
-                os.makedirs(out_dir, exist_ok=True)
                 df_out = pd.DataFrame(rows)
 
                 if not df_out.empty:
                     df_out.loc[len(df_out)] = {
                         "file": os.path.basename(ppg_file),
                         "ch": "AVG_ALL",
-                        "SQI_final": df_out["SQI_final"].mean(),
-                        "HR_peak_Hz": df_out["HR_peak_Hz"].mean()
+                        **df_out.drop(columns=["file", "ch"]).mean().to_dict()
                     }
 
-                parent_folder = os.path.basename(os.path.dirname(ppg_file))
-                save_dir = os.path.join(out_dir, parent_folder)
-                os.makedirs(save_dir, exist_ok=True)
-
                 out_csv = os.path.join(save_dir, "PPG_SQIs.csv")
                 df_out.to_csv(out_csv, index=False, encoding="utf-8-sig")
+
+                # Per-beat and per-window HRV
+                if hrv_results:
+                    beats_out = pd.concat([pd.DataFrame({
+                        "ch": ch_name,
+                        "Beat_Time_s": hrv["rr_times_s"],
+                        "RR_ms": hrv["rr_ms"],
+                        "HR_inst_bpm": hrv["hr_inst_bpm"],
+                        "Valid": hrv["rr_valid"],
+                    }) for ch_name, hrv in hrv_results])
+                    windows_out = pd.concat([pd.DataFrame(hrv["windows"]).assign(ch=ch_name)
+                                             for ch_name, hrv in hrv_results])
+                    beats_out.to_csv(os.path.join(save_dir, "PPG_beats.csv"), index=False, encoding="utf-8-sig")
+                    windows_out.to_csv(os.path.join(save_dir, "PPG_HRV_windows.csv"), index=False, encoding="utf-8-sig")
+                if sqi_windows:
+                    pd.concat(sqi_windows).to_csv(os.path.join(save_dir, "PPG_SQI_windows.csv"),
+                                                  index=False, encoding="utf-8-sig")
+                if skip is not None:
+                    pd.DataFrame(session.motion).to_csv(os.path.join(save_dir, "motion_windows.csv"),
+                                                        index=False, encoding="utf-8-sig")
                 print(f"[OK] saved: {save_dir}")
 
             finally:
                 i = 0  # kept for compatibility with original structure
 
-        # The following block is kept commented as in the original code:
-        # # Calculate the mean SQI across all files
-        # if len(self.all_file_sqi) > 0:
-        #     sqi_mean = float(np.mean(self.all_file_sqi))
-        #     print("\n==================== Results: ====================")
-        #     for (r, s) in self.file_sqi_records:
-        #         print(f"{r}  ->  SQI={s:.4f}")
-        #     print(f"\nTotal: {len(self.all_file_sqi)} Files, The mean of SQI  = {sqi_mean:.4f}")
-        # else:
-        #     print("\nNo SQI was successfully calculated for any file.")
-
+        if renderer is not None:
+            renderer.close()
+        if os.path.isdir(out_dir):
+            print(f"[OK] report index: {write_report_index(out_dir)}")
+
+        # Calculate the mean SQI / HR / HRV across all files, overall and per test condition
+        if len(self.all_file_sqi) > 0:
+            summary = aggregator.save(out_dir)
+            print("\n==================== Results: ====================")
+            for (r, s) in self.file_sqi_records:
+                print(f"{r}  ->  SQI={s:.4f}")
+            overall = summary[summary["group"] == "all"].set_index("metric")
+            print(f"\nTotal: {len(self.all_file_sqi)} Files, The mean of SQI  = {overall.loc['SQI_final', 'mean']:.4f}")
+            by_condition = summary[(summary["group"] == "condition") & (summary["metric"] == "SQI_final")]
+            for _, row in by_condition.iterrows():
+                print(f"  {row['value']}: {row['sessions']} files, SQI mean {row['mean']:.4f} (std {row['std']:.4f})")
+            print(f"[OK] dataset summary: {os.path.join(out_dir, 'dataset_summary.csv')}")
+        else:
+            print("\nNo SQI was successfully calculated for any file.")
 
 if __name__ == "__main__":
     processor = PhotoplethysmographyProcessor()
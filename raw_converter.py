@@ -0,0 +1,213 @@
+"""
+Raw Recording Converter
+
+Converts a raw recording (Camera.record with storage='raw') into image files, a
+video, or ROI traces. Frames are read by random access through the memory-mapped
+frames.npy, so image encoding and ROI extraction are split into frame ranges
+that run in parallel worker processes.
+
+Usage:
+python raw_converter.py --input_folder ./data/video/<folder> --to png
+python raw_converter.py --input_folder ./data/video/<folder> --to video --output ./data/video/<folder>.mp4
+python raw_converter.py --input_folder ./data/video/<folder> --to roi --workers 4
+"""
+
+import os
+import time
+import argparse
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.raw_recorder import RawRecording
+
+# Per-process analyzers for ROI extraction (Face Mesh is created once per worker)
+_worker_state = {}
+
+
+def _frame_ranges(n_frames, workers, chunks_per_worker=4):
+    """Split [0, n_frames) into contiguous ranges, a few per worker for load balancing."""
+    n_chunks = max(1, min(n_frames, workers * chunks_per_worker))
+    edges = np.linspace(0, n_frames, n_chunks + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def _run_ranges(func, args_list, workers):
+    """Run func(*args) for every range, in worker processes when workers > 1, in order."""
+    if workers <= 1:
+        return [func(*args) for args in args_list]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(func, *args) for args in args_list]
+        return [f.result() for f in futures]
+
+
+def _write_images(input_folder, output_folder, start, stop, image_format, params):
+    rec = RawRecording(input_folder)
+    timestamps = rec.timestamp_ms
+    n_bytes = 0
+    for i in range(start, stop):
+        ok, encoded = cv2.imencode('.' + image_format, rec[i], params)
+        if not ok:
+            print(f"Converter: Warning: cannot encode frame {i}, skipping")
+            continue
+        with open(os.path.join(output_folder, f"{timestamps[i]}.{image_format}"), 'wb') as f:
+            f.write(encoded)
+        n_bytes += encoded.nbytes
+    return stop - start, n_bytes
+
+
+def convert_to_images(input_folder, output_folder=None, image_format='png', workers=None,
+                      png_compression=1, jpeg_quality=95):
+    """
+    Write every frame as <timestamp_ms>.<format>, the layout Camera.record produces in
+    'images' mode (so video_converter.py and the analysis scripts work unchanged).
+
+    Args:
+        input_folder: Raw recording folder.
+        output_folder: Destination folder (defaults to input_folder).
+        image_format: 'png', 'jpg', 'webp' or 'bmp'.
+        workers: Number of worker processes (defaults to the CPU count).
+        png_compression: PNG compression level 0-9.
+        jpeg_quality: JPEG / WebP quality 0-100.
+
+    Returns:
+        Number of frames written.
+    """
+    rec = RawRecording(input_folder)
+    output_folder = output_folder or input_folder
+    os.makedirs(output_folder, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    params = {
+        'png': [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)],
+        'jpg': [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)],
+        'webp': [cv2.IMWRITE_WEBP_QUALITY, int(jpeg_quality)],
+        'bmp': [],
+    }[image_format]
+
+    t0 = time.perf_counter()
+    ranges = _frame_ranges(len(rec), workers)
+    results = _run_ranges(_write_images,
+                          [(input_folder, output_folder, a, b, image_format, params) for a, b in ranges],
+                          workers)
+    n_frames = sum(r[0] for r in results)
+    n_bytes = sum(r[1] for r in results)
+    elapsed = time.perf_counter() - t0
+    print(f"Converter: {n_frames} frames -> {output_folder} ({image_format}, {n_bytes / 1e6:.1f} MB) "
+          f"in {elapsed:.1f}s ({n_frames / max(elapsed, 1e-9):.1f} frames/s, {workers} workers)")
+    return n_frames
+
+
+def convert_to_video(input_folder, output_video, fps=None):
+    """
+    Write the frames to a video file (mp4v). Frames come straight from the memmap,
+    so there is no image decoding step.
+
+    Args:
+        input_folder: Raw recording folder.
+        output_video: Output video file path.
+        fps: Video frame rate (defaults to the fps in the raw header, or 50).
+
+    Returns:
+        Number of frames written.
+    """
+    rec = RawRecording(input_folder)
+    if len(rec) == 0:
+        raise ValueError(f"Converter: No frames in {input_folder}")
+    fps = fps or rec.fps or 50
+    height, width = rec.shape[:2]
+
+    out = cv2.VideoWriter(output_video, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not out.isOpened():
+        raise ValueError("Converter: Cannot create video writer")
+
+    t0 = time.perf_counter()
+    for i in range(len(rec)):
+        out.write(np.ascontiguousarray(rec[i]))
+        if (i + 1) % 500 == 0:
+            print(f"Converter: Processed {i + 1}/{len(rec)} frames")
+    out.release()
+
+    elapsed = time.perf_counter() - t0
+    print(f"Converter: Video created: {output_video} ({len(rec)} frames at {fps} FPS, "
+          f"{len(rec) / max(elapsed, 1e-9):.1f} frames/s)")
+    return len(rec)
+
+
+def _extract_roi_range(input_folder, start, stop):
+    if not _worker_state:
+        from utils.pixel_counter import FacePixelCounter
+        from utils.roi_tracer import FaceROITracer
+        _worker_state['counter'] = FacePixelCounter()
+        _worker_state['tracer'] = FaceROITracer()
+    counter = _worker_state['counter']
+    tracer = _worker_state['tracer']
+
+    rec = RawRecording(input_folder)
+    tracer.reset(capacity=stop - start)
+    for i in range(start, stop):
+        frame = np.ascontiguousarray(rec[i])
+        pixel_info = counter.count_face_pixels(frame)
+        tracer.extract(frame, int(rec.frame_number[i]), int(rec.timestamp_ms[i]),
+                       pixel_info['face_landmarks'] if pixel_info else None)
+    return tracer.records[:tracer.count].copy()
+
+
+def extract_roi_traces(input_folder, output_file=None, workers=None):
+    """
+    Run Face Mesh and FaceROITracer over every frame and save roi_traces.npy, the same
+    file Camera.record writes when analyzing online.
+
+    Args:
+        input_folder: Raw recording folder.
+        output_file: Output .npy path (defaults to <input_folder>/roi_traces.npy).
+        workers: Number of worker processes (defaults to the CPU count).
+
+    Returns:
+        The structured trace array.
+    """
+    rec = RawRecording(input_folder)
+    output_file = output_file or os.path.join(input_folder, "roi_traces.npy")
+    workers = workers or os.cpu_count() or 1
+
+    t0 = time.perf_counter()
+    ranges = _frame_ranges(len(rec), workers)
+    parts = _run_ranges(_extract_roi_range, [(input_folder, a, b) for a, b in ranges], workers)
+    records = np.concatenate(parts) if parts else np.zeros(0)
+    np.save(output_file, records)
+
+    elapsed = time.perf_counter() - t0
+    print(f"Converter: ROI traces saved: {output_file} ({len(records)} frames in {elapsed:.1f}s, "
+          f"{len(records) / max(elapsed, 1e-9):.1f} frames/s, {workers} workers)")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Converter: Convert a raw recording to images, video or ROI traces')
+    parser.add_argument('--input_folder', type=str, required=True,
+                        help='Raw recording folder (contains raw_header.json)')
+    parser.add_argument('--to', type=str, nargs='+', default=['png'],
+                        choices=['png', 'jpg', 'webp', 'bmp', 'video', 'roi'],
+                        help='Output(s) to produce (default: png)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Output folder (images), video file or .npy file; defaults next to the input')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--fps', type=int, default=None,
+                        help='Video frame rate (default: from the raw header)')
+    args = parser.parse_args()
+
+    if not RawRecording.is_raw_recording(args.input_folder):
+        raise ValueError(f"Converter: Not a raw recording folder: {args.input_folder}")
+
+    for target in args.to:
+        if target == 'video':
+            output_video = args.output or os.path.normpath(args.input_folder) + ".mp4"
+            convert_to_video(args.input_folder, output_video, args.fps)
+        elif target == 'roi':
+            extract_roi_traces(args.input_folder, args.output, args.workers)
+        else:
+            convert_to_images(args.input_folder, args.output, target, args.workers)
+
+
+if __name__ == "__main__":
+    main()
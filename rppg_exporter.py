@@ -0,0 +1,278 @@
+"""
+rPPG-Toolbox Dataset Exporter
+
+Turns recorded sessions into the preprocessed chunk format of the rPPG-Toolbox
+(https://github.com/ubicomplab/rPPG-Toolbox), so training does not need to decode
+video, detect faces or align labels again:
+
+    <output_dir>/<session>_input<i>.npy   (chunk_length, size, size, C) float32, RGB
+    <output_dir>/<session>_label<i>.npy   (chunk_length,) float32 PPG at the frame times
+    <output_dir>/export_manifest.csv      one row per chunk ('input_files' like the toolbox file lists)
+    <output_dir>/export_config.json       the preprocessing parameters
+
+For every video session matched with a PPG session (see session_aligner.py):
+1. the PPG is interpolated at the frame times (align_ppg_to_frames),
+2. runs of frames with a valid label (and, with --skip_motion, outside the windows
+   flagged for head motion, see utils/motion.py) are cut into non-overlapping chunks,
+3. each frame is face-cropped with the stabilized FaceCropTracker (Face Mesh every
+   --detect_every frames; crop recordings are already face crops) and resized,
+4. frames and labels are normalized per chunk ('Raw', 'DiffNormalized',
+   'Standardized'; several data types are concatenated on the channel axis like
+   the toolbox does) and saved as .npy, readable with np.load(mmap_mode='r').
+
+The toolbox normalizes a whole video before chunking; here every chunk is
+normalized on its own so an hour-long session never has to be held in memory.
+
+Sessions are processed in parallel (--jobs processes, each decoding with threads).
+
+Usage:
+python rppg_exporter.py --output_dir ./data/rppg_toolbox
+python rppg_exporter.py --chunk_length 180 --size 72 --data_types DiffNormalized Standardized --label_type DiffNormalized
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.face_crop import FaceCropTracker
+from utils.session import Session
+from session_aligner import match_all, load_frame_session, load_ppg_timeline, align_ppg_to_frames
+
+MANIFEST_FILE = "export_manifest.csv"
+CONFIG_FILE = "export_config.json"
+NORMALIZATIONS = ('Raw', 'DiffNormalized', 'Standardized')
+
+
+# ===== Normalization (rPPG-Toolbox definitions, applied per chunk) =====
+
+def diff_normalize_data(data):
+    """Normalized frame difference (x[t+1] - x[t]) / (x[t+1] + x[t]), scaled to unit std, zero-padded."""
+    data = data.astype(np.float32)
+    diff = (data[1:] - data[:-1]) / (data[1:] + data[:-1] + 1e-7)
+    std = np.std(diff)
+    diff = diff / std if std > 0 else diff
+    out = np.concatenate([diff, np.zeros((1,) + data.shape[1:], dtype=np.float32)], axis=0)
+    return np.nan_to_num(out, copy=False)
+
+
+def standardized_data(data):
+    data = data.astype(np.float32)
+    std = np.std(data)
+    out = (data - np.mean(data)) / std if std > 0 else data - np.mean(data)
+    return np.nan_to_num(out, copy=False)
+
+
+def diff_normalize_label(label):
+    diff = np.diff(label.astype(np.float32))
+    std = np.std(diff)
+    diff = diff / std if std > 0 else diff
+    return np.nan_to_num(np.append(diff, np.float32(0)).astype(np.float32), copy=False)
+
+
+def standardized_label(label):
+    label = label.astype(np.float32)
+    std = np.std(label)
+    out = (label - np.mean(label)) / std if std > 0 else label - np.mean(label)
+    return np.nan_to_num(out, copy=False)
+
+
+def normalize_chunk(frames, label, data_types, label_type):
+    """frames: (L, H, W, 3) uint8 RGB, label: (L,) -> float32 input (L, H, W, 3 * len(data_types)) and label."""
+    data_fn = {'Raw': lambda x: x.astype(np.float32), 'DiffNormalized': diff_normalize_data,
+               'Standardized': standardized_data}
+    label_fn = {'Raw': lambda x: x.astype(np.float32), 'DiffNormalized': diff_normalize_label,
+                'Standardized': standardized_label}
+    data = np.concatenate([data_fn[t](frames) for t in data_types], axis=-1)
+    return data, label_fn[label_type](label)
+
+
+# ===== Chunking =====
+
+def valid_chunks(valid, chunk_length):
+    """
+    Non-overlapping chunks inside runs of consecutive valid frames.
+
+    Returns:
+        (K,) start indices; chunk k covers [start, start + chunk_length).
+    """
+    padded = np.concatenate([[False], np.asarray(valid, dtype=bool), [False]])
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    counts = (ends - starts) // chunk_length
+    if counts.sum() == 0:
+        return np.zeros(0, dtype=np.int64)
+    run_start = np.repeat(starts, counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return run_start + k * chunk_length
+
+
+def export_session(video_dir, ppg_dir, output_dir, name, chunk_length=180, size=72,
+                   data_types=('DiffNormalized', 'Standardized'), label_type='DiffNormalized',
+                   detect_every=10, crop_margin=0.25, crop_smoothing=0.2, decode_workers=2, max_gap_ms=100.0,
+                   skip_motion=False):
+    """
+    Export one session as toolbox chunks.
+
+    Args:
+        video_dir: Recording folder (images, raw or crop recording).
+        ppg_dir: Matching pulse_data.csv folder.
+        output_dir: Where the chunk files go.
+        name: File prefix of this session's chunks.
+        chunk_length: Frames per chunk.
+        size: Output frame side in pixels.
+        data_types: Input normalizations, concatenated on the channel axis.
+        label_type: Label normalization.
+        detect_every: Run Face Mesh every N frames (the crop window holds in between).
+        crop_margin, crop_smoothing: FaceCropTracker parameters.
+        decode_workers: Image decoding threads.
+        max_gap_ms: Frames across a PPG gap larger than this get no label (and no chunk).
+        skip_motion: Leave out the frames inside windows flagged for head motion.
+
+    Returns:
+        List of manifest rows (dicts), one per chunk.
+    """
+    session = Session(video_dir, ppg_dir, name=name, decode_workers=decode_workers)
+    frames = load_frame_session(video_dir)
+    ppg, ppg_times, _ = load_ppg_timeline(ppg_dir)
+    aligned, _ = align_ppg_to_frames(ppg_times, ppg, frames, max_gap_ms)
+
+    # A chunk must not span a frame whose image is missing on disk
+    valid = aligned['valid'] & session.frames.available
+    if skip_motion:
+        valid = valid & ~session.motion_mask(aligned['timestamp_ms'])
+    starts = valid_chunks(valid, chunk_length)
+    if len(starts) == 0:
+        print(f"[Export] {name}: no {chunk_length}-frame run with a valid PPG label, skipped")
+        return []
+
+    # Frames are only decoded for the chunks, in one ordered pass
+    index = (starts[:, None] + np.arange(chunk_length)[None, :]).ravel()
+    # (aligned rows follow session.frame_timestamps, the order of session.frames)
+    frame_iter = session.frames.iter_positions(index)
+
+    detect = not session.is_crop_recording
+    pixel_counter = None
+    if detect:
+        from utils.pixel_counter import FacePixelCounter
+        pixel_counter = FacePixelCounter()
+    cropper = FaceCropTracker(size, margin=crop_margin, smoothing=crop_smoothing)
+    chunk = np.empty((chunk_length, size, size, 3), dtype=np.uint8)
+
+    rows = []
+    os.makedirs(output_dir, exist_ok=True)
+    for k, start in enumerate(starts):
+        if k == 0 or starts[k - 1] + chunk_length != start:
+            cropper.reset()  # a new run of frames
+        for j in range(chunk_length):
+            frame = next(frame_iter)
+            if detect:
+                bbox = None
+                if (start + j) % detect_every == 0 or cropper.window is None:
+                    pixel_info = pixel_counter.count_face_pixels(frame)
+                    bbox = pixel_info['bbox'] if pixel_info else None
+                cropper.update(bbox, frame.shape)
+            else:
+                cropper.update((0, 0, frame.shape[1], frame.shape[0]), frame.shape)
+            cropper.crop(frame, out=chunk[j])
+
+        label = aligned['ppg'][start:start + chunk_length]
+        data, label = normalize_chunk(chunk[..., ::-1], label, data_types, label_type)  # BGR -> RGB
+        input_file = os.path.join(output_dir, f"{name}_input{k}.npy")
+        label_file = os.path.join(output_dir, f"{name}_label{k}.npy")
+        np.save(input_file, data)
+        np.save(label_file, label)
+
+        hr = aligned['hr'][start:start + chunk_length]
+        rows.append({
+            'input_files': input_file,
+            'label_files': label_file,
+            'session': name,
+            'chunk': k,
+            'start_frame': int(aligned['frame_number'][start]),
+            'end_frame': int(aligned['frame_number'][start + chunk_length - 1]),
+            'start_ms': float(aligned['timestamp_ms'][start]),
+            'end_ms': float(aligned['timestamp_ms'][start + chunk_length - 1]),
+            'hr_mean': float(np.nanmean(hr)) if np.any(np.isfinite(hr)) else np.nan,
+            'video_session': video_dir,
+            'ppg_session': ppg_dir,
+        })
+    print(f"[Export] {name}: {len(rows)} chunks of {chunk_length} frames")
+    return rows
+
+
+def export_dataset(ppg_root="./data/rawsignal", video_root="./data/video", output_dir="./data/rppg_toolbox",
+                   jobs=None, **options):
+    """
+    Export every matched session under video_root in parallel and write the manifest.
+
+    Args:
+        ppg_root, video_root: Session roots (see session_aligner.match_all).
+        output_dir: Output folder for the chunks and the manifest.
+        jobs: Sessions processed at the same time (default: CPU count).
+        **options: Passed to export_session (chunk_length, size, data_types, ...).
+
+    Returns:
+        The manifest as a DataFrame.
+    """
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    os.makedirs(output_dir, exist_ok=True)
+    sessions = [(video_dir, ppg_dir) for video_dir, ppg_dir, _ in match_all(ppg_root, video_root) if ppg_dir]
+    print(f"[Export] {len(sessions)} sessions with PPG -> {output_dir} ({jobs} jobs)")
+
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for video_dir, ppg_dir in sessions:
+            name = os.path.relpath(video_dir, video_root).replace(os.sep, '_')
+            futures[pool.submit(export_session, video_dir, ppg_dir, output_dir, name, **options)] = name
+        for future in as_completed(futures):
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print(f"[Export] {futures[future]} failed: {e}")
+
+    manifest = pd.DataFrame(rows, columns=['input_files', 'label_files', 'session', 'chunk', 'start_frame',
+                                           'end_frame', 'start_ms', 'end_ms', 'hr_mean',
+                                           'video_session', 'ppg_session'])
+    manifest = manifest.sort_values(['session', 'chunk']).reset_index(drop=True)
+    manifest.to_csv(os.path.join(output_dir, MANIFEST_FILE), index=False)
+    with open(os.path.join(output_dir, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump({key: list(value) if isinstance(value, tuple) else value for key, value in options.items()},
+                  f, indent=2)
+    print(f"[Export] {len(manifest)} chunks from {manifest['session'].nunique()} sessions "
+          f"in {time.perf_counter() - start:.1f}s -> {os.path.join(output_dir, MANIFEST_FILE)}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export recorded sessions as rPPG-Toolbox chunks')
+    parser.add_argument('--ppg_root', type=str, default='./data/rawsignal')
+    parser.add_argument('--video_root', type=str, default='./data/video')
+    parser.add_argument('--output_dir', type=str, default='./data/rppg_toolbox')
+    parser.add_argument('--chunk_length', type=int, default=180)
+    parser.add_argument('--size', type=int, default=72, help='output frame side in pixels')
+    parser.add_argument('--data_types', type=str, nargs='+', default=['DiffNormalized', 'Standardized'],
+                        choices=list(NORMALIZATIONS))
+    parser.add_argument('--label_type', type=str, default='DiffNormalized', choices=list(NORMALIZATIONS))
+    parser.add_argument('--detect_every', type=int, default=10, help='Face Mesh every N frames')
+    parser.add_argument('--jobs', type=int, default=None, help='sessions processed in parallel')
+    parser.add_argument('--decode_workers', type=int, default=2, help='image decoding threads per session')
+    parser.add_argument('--max_gap_ms', type=float, default=100.0)
+    parser.add_argument('--skip_motion', action='store_true',
+                        help='no chunks in windows flagged for head motion (geometric_data.csv)')
+    args = parser.parse_args()
+
+    export_dataset(args.ppg_root, args.video_root, args.output_dir, jobs=args.jobs,
+                   chunk_length=args.chunk_length, size=args.size, data_types=tuple(args.data_types),
+                   label_type=args.label_type, detect_every=args.detect_every,
+                   decode_workers=args.decode_workers, max_gap_ms=args.max_gap_ms,
+                   skip_motion=args.skip_motion)
+
+
+if __name__ == "__main__":
+    main()
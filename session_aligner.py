@@ -0,0 +1,298 @@
+"""
+PPG / Video Session Alignment
+
+pulse_data.csv (./data/rawsignal/<timestamp>/) and the recording folders
+(./data/video/vid_.../, one subfolder per camera for multi-camera sessions) share
+no key except time: both are stamped in wall-clock milliseconds from the same
+SessionClock (PC_Timestamp_ms / frame timestamp_ms). This script
+
+1. finds every PPG and video session and matches each video session with the PPG
+   session it overlaps most in time,
+2. maps the PPG samples onto a clean time base: the Arduino's millis() counter fitted
+   linearly to the PC read times, which removes the serial read jitter and reports
+   the clock drift between the two,
+3. resamples the PPG onto the frame timestamps (ppg_to_frames, default), or finds
+   the nearest frame for every PPG sample (frames_to_ppg), with vectorized
+   np.interp / searchsorted,
+4. writes one typed structured array per video session (aligned.npy) plus
+   alignment.json with the overlap, the residual PPG-to-frame offsets and the
+   clock fit.
+
+Frame times come from frame_timestamps.npy (every recording mode writes it), or
+geometric_data.csv / the image filenames for older recordings. Loading, session
+discovery, matching and the clock fit live in utils.session.
+
+Usage:
+python session_aligner.py
+python session_aligner.py --direction frames_to_ppg --output_root ./data/aligned
+python session_aligner.py --video_session ./data/video/vid_... --ppg_session ./data/rawsignal/20250101_120000
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+from utils.raw_recorder import TIMESTAMPS_FILE
+from utils.session import Session, Dataset, FrameStore, GEOMETRIC_FILE, load_frame_timestamps
+
+ALIGNED_FILE = "aligned.npy"
+REPORT_FILE = "alignment.json"
+DIRECTIONS = ('ppg_to_frames', 'frames_to_ppg')
+
+# One row per video frame (ppg_to_frames)
+FRAME_ALIGNED_DTYPE = np.dtype([
+    ('frame_number', '<i4'),
+    ('timestamp_ms', '<f8'),      # frame time (wall clock ms)
+    ('ppg', '<f4'),               # PPG interpolated at the frame time
+    ('hr', '<f4'),                # Arduino HR of the nearest sample
+    ('ppg_offset_ms', '<f4'),     # frame time - nearest PPG sample time
+    ('valid', '?'),               # inside the PPG recording, no sample gap > max_gap_ms, frame image saved
+])
+
+# One row per PPG sample (frames_to_ppg)
+PPG_ALIGNED_DTYPE = np.dtype([
+    ('timestamp_ms', '<f8'),      # sample time on the fitted clock (wall clock ms)
+    ('pc_timestamp_ms', '<i8'),   # PC read time as logged
+    ('arduino_millis', '<i8'),
+    ('ppg', '<f4'),
+    ('hr', '<f4'),
+    ('frame_number', '<i4'),      # nearest frame
+    ('frame_offset_ms', '<f4'),   # sample time - nearest frame time
+    ('valid', '?'),               # inside the video, nearest frame within max_gap_ms
+])
+
+
+# ===== Loading =====
+
+def load_frame_session(folder):
+    """
+    Frame numbers and timestamps (ms) of one recording, sorted by time.
+
+    Returns:
+        dict with frame_number (int32), timestamp_ms (float64), has_image (bool, False
+        where the frame's image is missing on disk) and the source used.
+    """
+    ts = load_frame_timestamps(folder)
+    if os.path.exists(os.path.join(folder, TIMESTAMPS_FILE)):
+        source = TIMESTAMPS_FILE
+    elif os.path.exists(os.path.join(folder, GEOMETRIC_FILE)):
+        source = GEOMETRIC_FILE
+    else:
+        source = 'filenames'
+    return {
+        'frame_number': ts['frame_number'].astype(np.int32),
+        'timestamp_ms': ts['timestamp_ms'].astype(np.float64),
+        'has_image': FrameStore(folder, ts['timestamp_ms']).available,
+        'source': source,
+    }
+
+
+def load_ppg_timeline(folder):
+    """
+    Load a PPG session in sample order and put it on the fitted sample clock.
+
+    Returns:
+        (ppg dict with pc_ms (int64), arduino_ms (int64, -1 where missing) and signal / hr
+        (float32) in sample order, sample times in ms, clock report)
+    """
+    session = Session(ppg_dir=folder)
+    ppg = session.ppg
+    return ({'pc_ms': ppg['pc_timestamp_ms'], 'arduino_ms': ppg['arduino_millis'],
+             'signal': ppg['signal'], 'hr': ppg['hr']},
+            session.ppg_times, session.ppg_clock_report)
+
+
+def match_all(ppg_root="./data/rawsignal", video_root="./data/video"):
+    """
+    Find all sessions and match every video session with a PPG session.
+
+    Returns:
+        List of (video_dir, ppg_dir or None, overlap_s), one per video session.
+    """
+    dataset = Dataset(video_root, ppg_root)
+    print(f"[Align] {len(dataset)} video sessions, {len(dataset.ppg_dirs)} PPG sessions")
+    return [(s.video_dir, s.ppg_dir, s.overlap_s or 0.0) for s in dataset]
+
+
+# ===== Alignment =====
+
+def nearest_index(times, query):
+    """Index of the nearest element of sorted `times` for every element of `query`."""
+    if len(times) == 1:
+        return np.zeros(len(query), dtype=np.int64)
+    right = np.clip(np.searchsorted(times, query), 1, len(times) - 1)
+    left = right - 1
+    return np.where(np.abs(times[left] - query) <= np.abs(times[right] - query), left, right)
+
+
+def _offset_stats(prefix, offset_ms, valid):
+    offset = offset_ms[valid]
+    if len(offset) == 0:
+        return {f'{prefix}_mean_ms': None}
+    abs_offset = np.abs(offset)
+    return {
+        f'{prefix}_mean_ms': float(offset.mean()),
+        f'{prefix}_median_ms': float(np.median(offset)),
+        f'{prefix}_abs_p95_ms': float(np.percentile(abs_offset, 95)),
+        f'{prefix}_abs_max_ms': float(abs_offset.max()),
+    }
+
+
+def align_ppg_to_frames(ppg_times, ppg, frames, max_gap_ms=100.0):
+    """
+    Interpolate the PPG at every frame time.
+
+    Args:
+        ppg_times: Sorted (N,) PPG sample times in ms.
+        ppg: dict from load_ppg_timeline.
+        frames: dict from load_frame_session.
+        max_gap_ms: Frames between two samples further apart than this are marked invalid
+            (as are frames without an image).
+
+    Returns:
+        (FRAME_ALIGNED_DTYPE array, report)
+    """
+    t = frames['timestamp_ms']
+    out = np.zeros(len(t), dtype=FRAME_ALIGNED_DTYPE)
+    out['frame_number'] = frames['frame_number']
+    out['timestamp_ms'] = t
+    out['ppg'] = np.interp(t, ppg_times, ppg['signal'])
+    nearest = nearest_index(ppg_times, t)
+    out['hr'] = ppg['hr'][nearest]
+    out['ppg_offset_ms'] = t - ppg_times[nearest]
+
+    right = np.clip(np.searchsorted(ppg_times, t), 1, len(ppg_times) - 1)
+    gap = ppg_times[right] - ppg_times[right - 1]
+    out['valid'] = (t >= ppg_times[0]) & (t <= ppg_times[-1]) & (gap <= max_gap_ms) & frames['has_image']
+
+    report = {'rows': int(len(out)), 'valid_rows': int(out['valid'].sum()),
+              **_offset_stats('ppg_offset', out['ppg_offset_ms'], out['valid'])}
+    return out, report
+
+
+def align_frames_to_ppg(ppg_times, ppg, frames, max_gap_ms=100.0):
+    """
+    Nearest frame for every PPG sample.
+
+    Returns:
+        (PPG_ALIGNED_DTYPE array, report)
+    """
+    t = frames['timestamp_ms']
+    out = np.zeros(len(ppg_times), dtype=PPG_ALIGNED_DTYPE)
+    out['timestamp_ms'] = ppg_times
+    out['pc_timestamp_ms'] = ppg['pc_ms']
+    out['arduino_millis'] = ppg['arduino_ms']
+    out['ppg'] = ppg['signal']
+    out['hr'] = ppg['hr']
+    nearest = nearest_index(t, ppg_times)
+    out['frame_number'] = frames['frame_number'][nearest]
+    out['frame_offset_ms'] = ppg_times - t[nearest]
+    out['valid'] = (ppg_times >= t[0]) & (ppg_times <= t[-1]) & (np.abs(out['frame_offset_ms']) <= max_gap_ms)
+
+    report = {'rows': int(len(out)), 'valid_rows': int(out['valid'].sum()),
+              **_offset_stats('frame_offset', out['frame_offset_ms'], out['valid'])}
+    return out, report
+
+
+def align_session(video_dir, ppg_dir, output_dir, direction='ppg_to_frames', max_gap_ms=100.0):
+    """
+    Align one video session with one PPG session and write aligned.npy / alignment.json.
+
+    Returns:
+        The alignment report (dict).
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Unknown direction: {direction}, expected one of {DIRECTIONS}")
+    t0 = time.perf_counter()
+    frames = load_frame_session(video_dir)
+    ppg, ppg_times, clock_report = load_ppg_timeline(ppg_dir)
+    if len(frames['timestamp_ms']) == 0 or len(ppg_times) == 0:
+        raise ValueError(f"No frames or PPG samples ({video_dir}, {ppg_dir})")
+
+    if direction == 'ppg_to_frames':
+        aligned, offset_report = align_ppg_to_frames(ppg_times, ppg, frames, max_gap_ms)
+    else:
+        aligned, offset_report = align_frames_to_ppg(ppg_times, ppg, frames, max_gap_ms)
+
+    t_frames = frames['timestamp_ms']
+    overlap_ms = min(t_frames[-1], ppg_times[-1]) - max(t_frames[0], ppg_times[0])
+    report = {
+        'video_session': video_dir,
+        'ppg_session': ppg_dir,
+        'direction': direction,
+        'frame_times_from': frames['source'],
+        'frames': int(len(t_frames)),
+        'ppg_samples': int(len(ppg_times)),
+        'overlap_s': float(max(overlap_ms, 0.0) / 1000.0),
+        'video_start_minus_ppg_start_ms': float(t_frames[0] - ppg_times[0]),
+        'video_end_minus_ppg_end_ms': float(t_frames[-1] - ppg_times[-1]),
+        'max_gap_ms': max_gap_ms,
+        **offset_report,
+        **clock_report,
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, ALIGNED_FILE), aligned)
+    report['seconds'] = time.perf_counter() - t0
+    with open(os.path.join(output_dir, REPORT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def align_all(ppg_root="./data/rawsignal", video_root="./data/video", output_root="./data/aligned",
+              direction='ppg_to_frames', max_gap_ms=100.0):
+    """
+    Match every video session under video_root with a PPG session and align it.
+    Output: <output_root>/<video session path relative to video_root>/aligned.npy
+
+    Returns:
+        List of alignment reports (unmatched sessions have 'ppg_session': None).
+    """
+    reports = []
+    for video_dir, ppg_dir, overlap_s in match_all(ppg_root, video_root):
+        rel = os.path.relpath(video_dir, video_root)
+        if ppg_dir is None:
+            print(f"[Align] {rel}: no overlapping PPG session, skipped")
+            reports.append({'video_session': video_dir, 'ppg_session': None})
+            continue
+        report = align_session(video_dir, ppg_dir, os.path.join(output_root, rel), direction, max_gap_ms)
+        reports.append(report)
+        offset_key = 'ppg_offset' if direction == 'ppg_to_frames' else 'frame_offset'
+        print(f"[Align] {rel} <-> {os.path.basename(ppg_dir)}: overlap {overlap_s:.1f}s | "
+              f"{report['valid_rows']}/{report['rows']} valid rows | "
+              f"residual offset median {report.get(offset_key + '_median_ms', float('nan')):+.2f} ms, "
+              f"|p95| {report.get(offset_key + '_abs_p95_ms', float('nan')):.2f} ms | "
+              f"clock {report['clock']}"
+              + (f" (drift {report['clock_drift_ppm']:+.0f} ppm)" if report['clock'] == 'arduino' else "")
+              + f" | {report['seconds'] * 1000:.0f} ms")
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Align PPG sessions with video recordings')
+    parser.add_argument('--ppg_root', type=str, default='./data/rawsignal')
+    parser.add_argument('--video_root', type=str, default='./data/video')
+    parser.add_argument('--output_root', type=str, default='./data/aligned')
+    parser.add_argument('--video_session', type=str, default=None, help='align one recording folder ...')
+    parser.add_argument('--ppg_session', type=str, default=None, help='... with this PPG folder')
+    parser.add_argument('--direction', type=str, default='ppg_to_frames', choices=list(DIRECTIONS),
+                        help='ppg_to_frames: PPG interpolated at every frame, '
+                             'frames_to_ppg: nearest frame for every PPG sample')
+    parser.add_argument('--max_gap_ms', type=float, default=100.0,
+                        help='rows further than this from the other stream are marked invalid')
+    args = parser.parse_args()
+
+    if args.video_session or args.ppg_session:
+        if not (args.video_session and args.ppg_session):
+            parser.error("--video_session and --ppg_session go together")
+        output_dir = os.path.join(args.output_root, os.path.basename(os.path.normpath(args.video_session)))
+        report = align_session(args.video_session, args.ppg_session, output_dir, args.direction, args.max_gap_ms)
+        print(json.dumps(report, indent=2))
+    else:
+        align_all(args.ppg_root, args.video_root, args.output_root, args.direction, args.max_gap_ms)
+
+
+if __name__ == "__main__":
+    main()
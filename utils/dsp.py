@@ -0,0 +1,128 @@
+"""
+DSP Plan Module
+
+Filter and resampler designs are pure functions of their parameters, but designing
+them (butter, sosfilt_zi, firwin, the rational resampling ratio) costs far more than
+filtering a few seconds of signal. The plans below are designed once per parameter
+set and memoized, so the batch, windowed and per-file paths only pay for the filtering.
+
+- bandpass_plan(fs, band, order): Butterworth SOS, its steady-state initial
+  conditions and the filtfilt edge padding; FilterPlan.filtfilt gives the same
+  result as scipy.signal.sosfiltfilt without redesigning anything per call.
+- resample_plan(fs_in, fs_out): up / down factors and the anti-aliasing FIR that
+  scipy.signal.resample_poly would design; ResamplePlan.apply is resample_poly.
+
+Both apply along an axis, so many signals or windows stacked in a 2-D array are
+processed in one call.
+"""
+
+from dataclasses import dataclass
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+from scipy.signal import butter, firwin, resample_poly, sosfilt, sosfilt_zi
+
+
+@dataclass(frozen=True, eq=False)
+class FilterPlan:
+    sos: np.ndarray         # (sections, 6); shared by every caller, do not modify (sosfilt needs it writable)
+    zi: np.ndarray          # (sections, 2) steady-state initial conditions for a unit step
+    padlen: int             # odd-extension length used by filtfilt (as scipy's default)
+
+    def filtfilt(self, x, axis=-1):
+        """
+        Zero-phase filtering, equal to scipy.signal.sosfiltfilt(sos, x, axis=axis).
+
+        Raises:
+            ValueError: if x is not longer than padlen along axis.
+        """
+        x = np.moveaxis(np.asarray(x, dtype=float), axis, -1)
+        n = x.shape[-1]
+        if n <= self.padlen:
+            raise ValueError(f"The length of the input vector x must be greater than padlen, which is {self.padlen}.")
+        p = self.padlen
+        if p > 0:
+            # Odd extension around both ends
+            left = 2.0 * x[..., :1] - x[..., p:0:-1]
+            right = 2.0 * x[..., -1:] - x[..., -2:-p - 2:-1]
+            ext = np.concatenate([left, x, right], axis=-1)
+        else:
+            ext = x
+
+        zi = self.zi.reshape((len(self.sos),) + (1,) * (ext.ndim - 1) + (2,))
+        y, _ = sosfilt(self.sos, ext, axis=-1, zi=zi * ext[None, ..., :1])
+        y, _ = sosfilt(self.sos, y[..., ::-1], axis=-1, zi=zi * y[None, ..., -1:])
+        y = y[..., ::-1]
+        if p > 0:
+            y = y[..., p:-p]
+        return np.moveaxis(y, -1, axis)
+
+
+@dataclass(frozen=True, eq=False)
+class ResamplePlan:
+    up: int
+    down: int
+    taps: np.ndarray        # unscaled Kaiser(5.0) low-pass FIR, as resample_poly designs it
+
+    @property
+    def identity(self):
+        return self.up == self.down
+
+    def output_length(self, n):
+        return -(-n * self.up // self.down)
+
+    def apply(self, x, axis=-1):
+        """Resample along axis, equal to scipy.signal.resample_poly(x, up, down, axis=axis)."""
+        x = np.asarray(x, dtype=float)
+        if self.identity:
+            return x
+        return resample_poly(x, self.up, self.down, axis=axis, window=self.taps)
+
+
+@lru_cache(maxsize=128)
+def bandpass_plan(fs, band, order=4):
+    """
+    Memoized Butterworth band-pass plan.
+
+    Args:
+        fs: Sampling rate in Hz.
+        band: (low, high) in Hz (a tuple, so it can be cached); clipped to (0.001, 0.999) x Nyquist.
+        order: Butterworth order.
+
+    Returns:
+        FilterPlan, or None when the clipped band is empty.
+    """
+    nyq = 0.5 * float(fs)
+    lo = max(0.001, band[0] / nyq)
+    hi = min(0.999, band[1] / nyq)
+    if hi <= lo:
+        return None
+    sos = butter(order, [lo, hi], btype='bandpass', output='sos')
+    ntaps = 2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum())
+    zi = sosfilt_zi(sos)
+    zi.flags.writeable = False
+    return FilterPlan(sos=sos, zi=zi, padlen=3 * int(ntaps))
+
+
+@lru_cache(maxsize=128)
+def resample_plan(fs_in, fs_out, max_denominator=1000):
+    """
+    Memoized polyphase resampling plan from fs_in to fs_out.
+
+    The ratio is approximated by a fraction with denominator <= max_denominator,
+    and the FIR is the one resample_poly would design for it.
+    """
+    frac = Fraction(float(fs_out) / float(fs_in)).limit_denominator(max_denominator)
+    up, down = frac.numerator, frac.denominator
+    if up == down:
+        return ResamplePlan(up=1, down=1, taps=np.ones(1))
+    max_rate = max(up, down)
+    taps = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    taps.flags.writeable = False
+    return ResamplePlan(up=up, down=down, taps=taps)
+
+
+def plan_cache_info():
+    """Hits / misses of the plan caches."""
+    return {'bandpass': bandpass_plan.cache_info(), 'resample': resample_plan.cache_info()}
@@ -1,21 +1,28 @@
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-from fractions import Fraction
 from pyprintf import sprintf
-from scipy.signal import resample_poly, butter, sosfiltfilt, savgol_filter, welch
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import savgol_filter, welch
 
+from utils.dsp import bandpass_plan, resample_plan
+from utils.motion import skipped_windows
 
-def normalize(x):
-    x_min = np.min(x)
-    x_max = np.max(x)
+# ---------- Band definitions (Hz), shared by the PPG and rPPG analyses ----------
+HR_BAND = (0.75, 4.0)      # Plausible heart-rate range: 45-240 bpm
+TOTAL_BAND = (0.0, 10.0)   # Band used as the SQI denominator
+BP_BAND = (0.5, 4.0)       # Band-pass applied before SQI / HR estimation
 
-    if x_max - x_min > 1e-9:  # Avoid division by zero
-        x_normalized = 2000 * (x - x_min) / (x_max - x_min) - 1000
-    else:
-        x_normalized = np.zeros_like(x)
 
-    return x_normalized
+def normalize(x, axis=None):
+    """Scale to [-1000, 1000] (over the whole array, or per slice along axis)."""
+    x_min = np.min(x, axis=axis, keepdims=axis is not None)
+    x_max = np.max(x, axis=axis, keepdims=axis is not None)
+    span = x_max - x_min
+
+    # Avoid division by zero
+    return np.where(span > 1e-9, 2000 * (x - x_min) / np.where(span > 1e-9, span, 1.0) - 1000, 0.0)
+
 # ---------- Plot helpers (PPG) ----------
 def paint_ppg_spectrum_freq_domain(f, Pxx, hr_band=(0.8, 3.0), f_hr=None):
     """
@@ -104,93 +111,178 @@ def preprocess_ppg(ppg, fs_in,
       2) Apply Butterworth band-pass filter (bp_band)
       3) Optionally apply median-filter-based detrending (to suppress slow baseline and part of motion artifacts)
     """
-    x = np.asarray(ppg, dtype=float)
-    fs_in = float(fs_in)
+    x_normalized, fs_out = preprocess_ppg_batch(np.asarray(ppg, dtype=float)[None, :], fs_in, target_fs,
+                                                bp_band, detrend_medwin, butter_order)
+    return x_normalized[0], fs_out
+
+
+def preprocess_ppg_batch(ppg, fs_in,
+                         target_fs=50,
+                         bp_band=(0.5, 8.0),
+                         detrend_medwin=0.5,
+                         butter_order=4):
+    """
+    preprocess_ppg for many signals or windows at once.
+
+    Args:
+        ppg: (signals, N) array, one signal / window per row.
+
+    Returns: (signals, M) ppg_filt, each row normalized on its own, fs_out = target_fs
+
+    The resample and band-pass plans are memoized (utils/dsp.py), so repeated calls
+    with the same rates and band only pay for the filtering.
+    """
+    x = np.atleast_2d(np.asarray(ppg, dtype=float))
     fs_out = float(target_fs)
 
     # 1) Normalize sampling rate
-    if abs(fs_in - fs_out) < 1e-9:
-        x_rs = x
-    else:
-        frac = Fraction(fs_out / fs_in).limit_denominator(1000)
-        up, down = frac.numerator, frac.denominator
-        x_rs = resample_poly(x, up, down)
+    x_rs = resample_plan(float(fs_in), fs_out).apply(x, axis=-1)
 
     # 2) Band-pass filtering
-    nyq = 0.5 * fs_out
-    lo = max(0.001, bp_band[0] / nyq)
-    hi = min(0.999, bp_band[1] / nyq)
-
-    if hi <= lo:  # Guard for extreme parameter settings
+    plan = bandpass_plan(fs_out, tuple(bp_band), butter_order)
+    if plan is None:  # Guard for extreme parameter settings
         return x_rs.astype(float), fs_out
 
-    sos = butter(butter_order, [lo, hi], btype='bandpass', output='sos')
-    x_bp = sosfiltfilt(sos, x_rs)
-    x_normalized = normalize(x_bp)
+    x_bp = plan.filtfilt(x_rs, axis=-1)
+    x_normalized = normalize(x_bp, axis=-1)
 
     return x_normalized.astype(float), fs_out
 
 
 # ---------- Core: compute SQI for PPG ----------
-def compute_ppg_sqi(ppg, file_path, fs_in, ch,
-                    hr_band=(0.75, 4.0),
-                    total_band=(0.0, 10.0),
-                    use_harmonic=False, harmonic_bw=0.3,
-                    bp_band=(0.5, 4.0),
-                    detrend_medwin=0.5,
-                    do_plot=True):
+def compute_ppg_sqi_batch(ppg, fs_in,
+                          hr_band=HR_BAND,
+                          total_band=TOTAL_BAND,
+                          use_harmonic=False, harmonic_bw=0.3,
+                          bp_band=BP_BAND,
+                          detrend_medwin=0.5):
     """
-    Compute signal quality index (SQI) for a PPG signal and estimate heart-rate frequency.
+    SQI and heart-rate frequency of many channels (or windows) in one vectorized pass.
+
+    Args:
+        ppg: (channels, N) array.
+
+    Returns:
+        dict with 'sqi' (C,), 'f_hr' (C,) in Hz, 'f' / 'Pxx' (C, F) Welch PSD,
+        'ppg_filt' (C, M) preprocessed signals and 'fs'.
     """
     # sample to 50 Hz
-    ppg_filt, fs = preprocess_ppg(
+    ppg_filt, fs = preprocess_ppg_batch(
         ppg, fs_in, target_fs=50,
         bp_band=bp_band,
         detrend_medwin=detrend_medwin
     )
+    n_ch = ppg_filt.shape[0]
+    result = {'sqi': np.zeros(n_ch), 'f_hr': np.zeros(n_ch), 'f': np.array([0.0]),
+              'Pxx': np.zeros((n_ch, 1)), 'ppg_filt': ppg_filt, 'fs': fs}
 
     # Welch PSD, do FFT
-    x = ppg_filt - np.mean(ppg_filt)
-    nperseg = min(1024, len(x)) if len(x) >= 16 else len(x)
-
+    x = ppg_filt - ppg_filt.mean(axis=-1, keepdims=True)
+    n = x.shape[-1]
+    nperseg = min(1024, n) if n >= 16 else n
     if nperseg < 8:
-        if do_plot:
-            paint_ppg_time_domain(ppg_filt, fs, sqi=0.0, tag="short")
-        return 0.0, 0.0, (np.array([0.0]), np.array([0.0]))
+        return result
 
-    f, Pxx = welch(x, fs, nperseg=nperseg)
+    f, Pxx = welch(x, fs, nperseg=nperseg, axis=-1)
+    result.update(f=f, Pxx=Pxx)
 
     # HR band
     m_hr = (f >= hr_band[0]) & (f <= hr_band[1])
-    # m_hr = (f >= hr_band[0]) & (f <= 2)
     if not np.any(m_hr):
-        if do_plot:
-            paint_ppg_time_domain(ppg_filt, fs, sqi=0.0, tag="no HR")
-            paint_ppg_spectrum_freq_domain(f, Pxx, hr_band=hr_band, f_hr=None)
-        return 0.0, 0.0, (f, Pxx)
+        return result
+
+    f_hr = f[m_hr][np.argmax(Pxx[:, m_hr], axis=-1)]
 
-    f_hr = f[m_hr][np.argmax(Pxx[m_hr])]
+    # Band power: integral of the PSD over [f1, f2] per channel, from its cumulative trapezoid
+    cum = np.concatenate([np.zeros((n_ch, 1)), np.cumsum(0.5 * (Pxx[:, 1:] + Pxx[:, :-1]) * np.diff(f), axis=-1)],
+                         axis=-1)
+    rows = np.arange(n_ch)
 
-    # Band power
     def band_power(f1, f2):
-        m = (f >= f1) & (f <= f2)
-        return np.trapezoid(Pxx[m], f[m]) if np.any(m) else 0.0
+        i0 = np.searchsorted(f, f1, side='left')
+        i1 = np.searchsorted(f, f2, side='right') - 1
+        i0, i1 = np.broadcast_to(i0, (n_ch,)), np.broadcast_to(i1, (n_ch,))
+        ok = i1 > i0
+        return np.where(ok, cum[rows, np.where(ok, i1, 0)] - cum[rows, np.where(ok, i0, 0)], 0.0)
 
-    P_main = band_power(max(hr_band[0], f_hr - 0.2), min(hr_band[1], f_hr + 0.2))
+    P_main = band_power(np.maximum(hr_band[0], f_hr - 0.2), np.minimum(hr_band[1], f_hr + 0.2))
     P_total = band_power(total_band[0], total_band[1])
     P = P_main
 
     if use_harmonic:
         f2 = 2.0 * f_hr
-        P += band_power(max(total_band[0], f2 - harmonic_bw),
-                        min(total_band[1], f2 + harmonic_bw))
+        P = P + band_power(np.maximum(total_band[0], f2 - harmonic_bw),
+                           np.minimum(total_band[1], f2 + harmonic_bw))
+
+    result['sqi'] = np.clip(np.divide(P, P_total, out=np.zeros(n_ch), where=P_total > 0), 0.0, 1.0)
+    result['f_hr'] = f_hr
+    return result
+
+
+def compute_ppg_sqi_windows(ppg, fs_in, window_s=10.0, step_s=5.0, skip=None, max_skipped=0.0, **sqi_kwargs):
+    """
+    SQI and heart-rate frequency of sliding windows of one PPG signal, all windows in one
+    compute_ppg_sqi_batch call.
+
+    Args:
+        ppg: (N,) signal sampled at fs_in.
+        window_s: Window length in seconds.
+        step_s: Hop between windows in seconds.
+        skip: Optional (N,) bool, samples to leave out (e.g. utils.motion.motion_mask);
+            windows with more than max_skipped of them are not analyzed.
+        max_skipped: Fraction of skipped samples a window may contain.
+        **sqi_kwargs: Passed to compute_ppg_sqi_batch.
+
+    Returns:
+        dict with 'start_s' (W,), 'sqi' and 'f_hr' (W,) (NaN for skipped windows) and 'skipped' (W,) bool.
+    """
+    x = np.asarray(ppg, dtype=float)
+    win = max(16, min(int(round(window_s * fs_in)), len(x)))
+    step = max(1, int(round(step_s * fs_in)))
+    result = {'start_s': np.zeros(0), 'sqi': np.zeros(0), 'f_hr': np.zeros(0), 'skipped': np.zeros(0, dtype=bool)}
+    if len(x) < win:
+        return result
+
+    windows = sliding_window_view(x, win)[::step]
+    skipped = skipped_windows(skip, win, step, max_skipped) if skip is not None \
+        else np.zeros(len(windows), dtype=bool)
+    result.update(start_s=np.arange(len(windows)) * step / float(fs_in), skipped=skipped,
+                  sqi=np.full(len(windows), np.nan), f_hr=np.full(len(windows), np.nan))
+    if np.all(skipped):
+        return result
+
+    batch = compute_ppg_sqi_batch(windows[~skipped], fs_in, **sqi_kwargs)
+    result['sqi'][~skipped] = batch['sqi']
+    result['f_hr'][~skipped] = batch['f_hr']
+    return result
+
 
-    sqi = float(np.clip(P / P_total if P_total > 0 else 0.0, 0.0, 1.0))
+def compute_ppg_sqi(ppg, file_path, fs_in, ch,
+                    hr_band=HR_BAND,
+                    total_band=TOTAL_BAND,
+                    use_harmonic=False, harmonic_bw=0.3,
+                    bp_band=BP_BAND,
+                    detrend_medwin=0.5,
+                    do_plot=True):
+    """
+    Compute signal quality index (SQI) for a PPG signal and estimate heart-rate frequency.
+    """
+    result = compute_ppg_sqi_batch(np.asarray(ppg, dtype=float)[None, :], fs_in,
+                                   hr_band=hr_band, total_band=total_band,
+                                   use_harmonic=use_harmonic, harmonic_bw=harmonic_bw,
+                                   bp_band=bp_band, detrend_medwin=detrend_medwin)
+    sqi, f_hr = float(result['sqi'][0]), float(result['f_hr'][0])
 
     # Plot (time domain shows only first 15 s, title includes SQI)
     if do_plot:
-        paint_ppg_spectrum_freq_domain(f, Pxx, hr_band=hr_band, f_hr=f_hr)
-        paint_ppg_time_domain(ppg_filt, fs, file_path=file_path, ch=ch, sqi=sqi, max_time=15)
-        # paint_ppg_time_domain(ppg, fs, file_path=file_path, ch=ch, sqi=sqi, max_time=15)
+        paint_ppg_channel(result, 0, file_path, ch, hr_band=hr_band)
+
+    return sqi, f_hr
+
 
-    return sqi, f_hr  # , (f, Pxx)
+def paint_ppg_channel(result, i, file_path, ch, hr_band=HR_BAND):
+    """Spectrum and time-domain plots of channel i of a compute_ppg_sqi_batch result."""
+    f_hr = result['f_hr'][i] if result['f_hr'][i] > 0 else None
+    paint_ppg_spectrum_freq_domain(result['f'], result['Pxx'][i], hr_band=hr_band, f_hr=f_hr)
+    paint_ppg_time_domain(result['ppg_filt'][i], result['fs'], file_path=file_path, ch=ch,
+                          sqi=float(result['sqi'][i]), max_time=15)
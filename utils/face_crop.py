@@ -0,0 +1,100 @@
+"""
+Face Crop Module
+
+Turns the per-frame face bounding box into a stabilized, fixed-size square crop,
+so a recording can store only the face region (what rPPG datasets use) instead of
+the whole frame. The crop window follows the face with exponential smoothing of
+its centre and side length, is kept inside the frame, and holds its last position
+while the face is briefly lost.
+"""
+
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+
+class FaceCropTracker:
+    """
+    Stabilized square face crop of a fixed output size.
+
+    Usage:
+        cropper = FaceCropTracker(crop_size=256)
+        x, y, side = cropper.update(pixel_info['bbox'] if pixel_info else None, frame.shape)
+        crop = cropper.crop(frame, out=crop_buffer)    # (256, 256, 3)
+    """
+
+    def __init__(self, crop_size=256, margin=0.25, smoothing=0.2):
+        """
+        Args:
+            crop_size: Side length of the saved crop in pixels.
+            margin: Extra border around the face bbox, as a fraction of its larger side (each way).
+            smoothing: EMA weight of the newest bbox (1.0 follows the face without smoothing).
+        """
+        self.crop_size = int(crop_size)
+        self.margin = float(margin)
+        self.smoothing = float(smoothing)
+        self.reset()
+
+    def reset(self):
+        """Forget the tracked face (the next bbox is taken as is)."""
+        self._center = None  # (cx, cy) float
+        self._side = None    # float, source pixels
+        self.window = None   # (x, y, side) int, last crop window
+
+    def update(self, bbox, frame_shape) -> Tuple[int, int, int]:
+        """
+        Move the crop window towards the face bbox of the current frame.
+
+        Args:
+            bbox: (x_min, y_min, x_max, y_max) of the face, or None if no face was found.
+            frame_shape: Shape of the frame the bbox refers to.
+
+        Returns:
+            (x, y, side): top-left corner and side length of the crop window in frame pixels.
+        """
+        h, w = frame_shape[:2]
+        if bbox is not None:
+            x_min, y_min, x_max, y_max = bbox
+            center = np.array([(x_min + x_max) / 2.0, (y_min + y_max) / 2.0])
+            side = max(x_max - x_min, y_max - y_min) * (1.0 + 2.0 * self.margin)
+            if self._center is None:
+                self._center, self._side = center, side
+            else:
+                a = self.smoothing
+                self._center = (1.0 - a) * self._center + a * center
+                self._side = (1.0 - a) * self._side + a * side
+        elif self._center is None:
+            # No face seen yet: centred square
+            self._center = np.array([w / 2.0, h / 2.0])
+            self._side = float(min(h, w))
+
+        side = int(round(min(max(self._side, 1.0), h, w)))
+        x = int(round(self._center[0] - side / 2.0))
+        y = int(round(self._center[1] - side / 2.0))
+        x = min(max(x, 0), w - side)
+        y = min(max(y, 0), h - side)
+        self.window = (x, y, side)
+        return self.window
+
+    def crop(self, frame, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Resample the current crop window to crop_size x crop_size.
+
+        Args:
+            frame: Input image frame (BGR).
+            out: Optional preallocated (crop_size, crop_size, 3) uint8 array to write into.
+
+        Returns:
+            The crop (the `out` array when given).
+        """
+        if self.window is None:
+            self.update(None, frame.shape)
+        x, y, side = self.window
+        roi = frame[y:y + side, x:x + side]
+        size = (self.crop_size, self.crop_size)
+        # INTER_AREA averages source pixels when shrinking, which keeps the skin colour signal
+        interpolation = cv2.INTER_AREA if side >= self.crop_size else cv2.INTER_LINEAR
+        if out is None:
+            return cv2.resize(roi, size, interpolation=interpolation)
+        cv2.resize(roi, size, dst=out, interpolation=interpolation)
+        return out
@@ -0,0 +1,136 @@
+"""
+Frame Buffer Pool Module
+
+A fixed set of preallocated frame buffers with reference counting, so the capture
+loop can read every frame in place (cap.read(image=buf)) and hand the same memory
+to the saver, the analyzers and the preview without copying.
+A buffer returns to the pool only when every holder has released it, which gives
+zero steady-state allocation in the capture loop and a flat memory profile.
+"""
+
+import threading
+import numpy as np
+
+
+class FrameBuffer:
+    """A pooled frame array with a reference count."""
+
+    def __init__(self, pool, shape, dtype=np.uint8):
+        self.pool = pool
+        self.array = np.empty(shape, dtype=dtype)
+        self.refs = 0
+
+    def retain(self):
+        """Add a holder; returns self so it can be chained."""
+        with self.pool.lock:
+            if self.refs <= 0:
+                raise RuntimeError("retain() on a buffer that is back in the pool")
+            self.refs += 1
+        return self
+
+    def release(self):
+        """Drop a holder; the last release returns the buffer to the pool."""
+        with self.pool.lock:
+            self.refs -= 1
+            if self.refs > 0:
+                return
+            if self.refs < 0:
+                raise RuntimeError("release() called more often than retain()")
+            self.pool.free.append(self)
+            self.pool.available.notify()
+
+
+class FrameBufferPool:
+    """
+    Fixed pool of FrameBuffer objects of one frame shape.
+
+    Usage:
+        pool = FrameBufferPool(size=16, shape=(720, 1280, 3))
+        buf = pool.acquire()                  # refs = 1 (the capture loop)
+        ret, frame = read_into(cap, buf)
+        saver.submit(path, buf.retain().array, on_done=buf.release)
+        buf.release()                         # capture loop is done with it
+    """
+
+    def __init__(self, size, shape, dtype=np.uint8):
+        """
+        Args:
+            size: Number of buffers (all allocated up front).
+            shape: Frame shape, e.g. (height, width, 3).
+            dtype: Frame dtype.
+        """
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.shape = tuple(shape)
+        self.buffers = [FrameBuffer(self, shape, dtype) for _ in range(int(size))]
+        # Used as a stack so the most recently released (cache-warm) buffer is reused first
+        self.free = list(self.buffers)
+
+        self.acquired = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.min_free = len(self.free)
+
+    @property
+    def size(self):
+        return len(self.buffers)
+
+    @property
+    def nbytes(self):
+        return sum(b.array.nbytes for b in self.buffers)
+
+    def acquire(self, timeout=None):
+        """
+        Take a free buffer (refs = 1), waiting up to `timeout` seconds if all are in use.
+
+        Returns:
+            FrameBuffer, or None on timeout.
+        """
+        with self.available:
+            if not self.free:
+                self.waits += 1
+                if not self.available.wait_for(lambda: self.free, timeout=timeout):
+                    self.timeouts += 1
+                    return None
+            buf = self.free.pop()
+            buf.refs = 1
+            self.acquired += 1
+            self.min_free = min(self.min_free, len(self.free))
+            return buf
+
+    def stats(self):
+        with self.lock:
+            return {
+                'buffers': self.size,
+                'buffer_mb': round(self.nbytes / 1e6, 1),
+                'free': len(self.free),
+                'min_free': self.min_free,
+                'acquired': self.acquired,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+            }
+
+
+def read_into(cap, buf):
+    """
+    Read the next frame into a pooled buffer (or any preallocated array).
+
+    cv2.VideoCapture.read(image=...) fills the array in place when its size and type
+    match; if the backend returned a different array anyway, the frame is copied in.
+
+    Args:
+        cap: cv2.VideoCapture or FrameSource.
+        buf: FrameBuffer, or a writable ndarray of the frame shape.
+
+    Returns:
+        (ret, frame) where frame is the target array on success.
+    """
+    target = buf.array if isinstance(buf, FrameBuffer) else buf
+    ret, frame = cap.read(image=target)
+    if not ret or frame is None:
+        return False, None
+    if frame is not target and not np.may_share_memory(frame, target):
+        if frame.shape != target.shape:
+            return False, frame
+        np.copyto(target, frame)
+    return True, target
@@ -0,0 +1,352 @@
+"""
+Frame Source Module
+
+Pluggable camera sources with the subset of the cv2.VideoCapture interface that
+Camera uses (read, isOpened, set, get, release), so the record / measure paths
+can run on any box:
+
+- Capture devices through OpenCV (DirectShow on Windows, V4L2 on Linux)
+- FileFrameSource: a video file or a folder of PNG frames (e.g. a previous recording),
+  replayed in real time or as fast as possible
+- SyntheticFaceSource: a rendered face-like pattern with a controllable pulsatile
+  skin color, for throughput tests and regression checks with a known heart rate
+
+Use create_frame_source(spec) to build a source from an int index or a spec string:
+    0, "dshow:0", "v4l2:0", "file:./data/video/vid_...", "./clip.mp4",
+    "synthetic", "synthetic:hr=72,width=1280,height=720,realtime=0"
+"""
+
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from abc import ABC, abstractmethod
+
+from utils.frame_writer import IMAGE_EXTENSIONS
+
+
+class FrameSource(ABC):
+    """Base class of the non-device sources, mirroring cv2.VideoCapture."""
+
+    def __init__(self, width, height, fps, realtime=True):
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = float(fps)
+        self.realtime = realtime
+        self.frame_index = 0
+        self._opened = True
+        self._start_time = None
+
+    def isOpened(self):
+        return self._opened
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frame_index)
+        return 0.0
+
+    def set(self, prop_id, value):
+        # Device properties (FOURCC, buffer size, ...) have no meaning here
+        return False
+
+    def release(self):
+        self._opened = False
+
+    def _pace(self, frame_time_s):
+        """In real-time mode, sleep until the frame's presentation time."""
+        if not self.realtime:
+            return
+        if self._start_time is None:
+            self._start_time = time.perf_counter() - frame_time_s
+        delay = self._start_time + frame_time_s - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    @abstractmethod
+    def _next_frame(self, image):
+        """
+        Fill image with the next frame.
+
+        Returns:
+            The frame's presentation time in seconds, or None at the end of the source.
+        """
+
+    def read(self, image=None):
+        """
+        Grab the next frame.
+
+        Args:
+            image: Optional preallocated (height, width, 3) uint8 array to fill in place.
+
+        Returns:
+            (ret, frame) like cv2.VideoCapture.read()
+        """
+        if not self._opened:
+            return False, None
+        if image is None or image.shape != (self.height, self.width, 3):
+            image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+        frame_time_s = self._next_frame(image)
+        if frame_time_s is None:
+            return False, None
+
+        self._pace(frame_time_s)
+        self.frame_index += 1
+        return True, image
+
+
+class FileFrameSource(FrameSource):
+    """
+    Replay a video file or a folder of image frames.
+
+    PNG folders written by Camera.record are named by millisecond timestamps; those
+    are used to reproduce the original timing in real-time mode. Other folders and
+    video files are paced at `fps` (or the file's own frame rate).
+    """
+
+    def __init__(self, path, realtime=True, fps=None, loop=False):
+        """
+        Args:
+            path: Video file, or folder containing image frames.
+            realtime: Pace frames at their original timing (False: as fast as possible).
+            fps: Frame rate override.
+            loop: Restart from the first frame at the end instead of reporting failure.
+        """
+        self.path = path
+        self.loop = loop
+        self._capture = None
+        self._files = None
+        self._times = None
+
+        if os.path.isdir(path):
+            self._files = sorted(os.path.join(path, f) for f in os.listdir(path)
+                                 if f.lower().endswith(IMAGE_EXTENSIONS))
+            if not self._files:
+                raise ValueError(f"No image files found in {path}")
+
+            stems = [os.path.splitext(os.path.basename(f))[0] for f in self._files]
+            if all(s.isdigit() for s in stems):
+                ms = np.array(stems, dtype=np.int64)
+                self._times = (ms - ms[0]) / 1000.0
+                if fps is None and len(ms) > 1:
+                    fps = 1000.0 / np.median(np.diff(ms))
+
+            first = cv2.imread(self._files[0])
+            if first is None:
+                raise ValueError(f"Cannot read image: {self._files[0]}")
+            height, width = first.shape[:2]
+            fps = fps or 50.0
+        else:
+            self._capture = cv2.VideoCapture(path)
+            if not self._capture.isOpened():
+                raise ValueError(f"Cannot open video file: {path}")
+            width = self._capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+            height = self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+            fps = fps or self._capture.get(cv2.CAP_PROP_FPS) or 50.0
+
+        super().__init__(width, height, fps, realtime)
+
+    def __len__(self):
+        if self._files is not None:
+            return len(self._files)
+        return int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def _rewind(self):
+        self.frame_index = 0
+        self._start_time = None
+        if self._capture is not None:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def _next_frame(self, image):
+        if self.frame_index >= len(self):
+            if not self.loop:
+                return None
+            self._rewind()
+
+        if self._files is not None:
+            frame = cv2.imread(self._files[self.frame_index])
+            if frame is None:
+                return None
+        else:
+            ret, frame = self._capture.read()
+            if not ret:
+                return None
+
+        if frame.shape != image.shape:
+            frame = cv2.resize(frame, (self.width, self.height))
+        np.copyto(image, frame)
+
+        if self._times is not None:
+            return float(self._times[self.frame_index])
+        return self.frame_index / self.fps
+
+    def release(self):
+        super().release()
+        if self._capture is not None:
+            self._capture.release()
+
+
+class SyntheticFaceSource(FrameSource):
+    """
+    Render a face-like pattern whose skin color pulses at a known heart rate.
+
+    The face (an elliptical skin patch with eyes, brows and a mouth, on a textured
+    background) is rendered once; each frame only rescales the skin color by
+        1 + amplitude * channel_gain * pulse(t)
+    and pastes the face at its (optionally moving) position.
+    """
+
+    # Relative pulsatile strength per BGR channel (green carries most of the pulse)
+    CHANNEL_GAIN = np.array([0.53, 1.0, 0.43], dtype=np.float32)
+
+    def __init__(self, width=640, height=480, fps=50.0, hr_bpm=72.0, amplitude=0.01,
+                 motion_px=0.0, noise=2.0, realtime=True, seed=0):
+        """
+        Args:
+            width, height: Frame size.
+            fps: Frame rate (also the pacing rate in real-time mode).
+            hr_bpm: Heart rate of the pulsatile signal.
+            amplitude: Relative amplitude of the skin-color modulation.
+            motion_px: Amplitude of a slow horizontal / vertical head sway, in pixels.
+            noise: Std of the static skin / background texture, in gray levels.
+            realtime: Pace frames at `fps` (False: as fast as possible).
+            seed: Seed of the texture noise.
+        """
+        super().__init__(width, height, fps, realtime)
+        self.hr_bpm = float(hr_bpm)
+        self.amplitude = float(amplitude)
+        self.motion_px = float(motion_px)
+
+        rng = np.random.default_rng(seed)
+
+        # Background: bluish-gray vertical gradient with texture
+        ramp = np.linspace(0.8, 1.1, self.height, dtype=np.float32)[:, None, None]
+        background = np.array([175, 115, 130], dtype=np.float32) * ramp
+        background = background + rng.normal(0, noise, (self.height, self.width, 3))
+        self._background = np.clip(background, 0, 255).astype(np.uint8)
+
+        # Face patch: skin ellipse with darker features, kept as float for fine color steps
+        face_h = int(self.height * 0.55)
+        face_w = int(face_h * 0.75)
+        self._face_size = (face_w, face_h)
+        mask = np.zeros((face_h, face_w), dtype=np.uint8)
+        cv2.ellipse(mask, (face_w // 2, face_h // 2), (face_w // 2 - 1, face_h // 2 - 1), 0, 0, 360, 255, -1)
+
+        skin = np.empty((face_h, face_w, 3), dtype=np.float32)
+        skin[:] = (120, 145, 195)
+        shade = np.linspace(1.05, 0.9, face_h, dtype=np.float32)[:, None, None]
+        skin = skin * shade + rng.normal(0, noise, skin.shape).astype(np.float32)
+        feature = (60.0, 60.0, 70.0)
+        for cx in (0.32, 0.68):
+            cv2.ellipse(skin, (int(face_w * cx), int(face_h * 0.40)),
+                        (face_w // 10, face_h // 28), 0, 0, 360, feature, -1)
+            cv2.line(skin, (int(face_w * (cx - 0.12)), int(face_h * 0.32)),
+                     (int(face_w * (cx + 0.12)), int(face_h * 0.31)), feature, max(2, face_h // 60))
+        cv2.ellipse(skin, (face_w // 2, int(face_h * 0.74)), (face_w // 6, face_h // 30),
+                    0, 0, 360, (90.0, 90.0, 150.0), -1)
+
+        self._face_tex = skin + 0.5  # +0.5 so truncation to uint8 rounds
+        self._face_mask = mask
+        self._face_float = np.empty_like(self._face_tex)
+        self._face_u8 = np.empty((face_h, face_w, 3), dtype=np.uint8)
+
+    def pulse_at(self, t_s):
+        """Ground-truth pulse waveform (systolic peak plus a dicrotic component) at time t."""
+        phase = 2 * np.pi * self.hr_bpm / 60.0 * np.asarray(t_s)
+        return np.sin(phase) + 0.3 * np.sin(2 * phase + 0.8)
+
+    def face_bbox(self, frame_index=None):
+        """(x_min, y_min, x_max, y_max) of the face patch in a frame."""
+        t = (self.frame_index if frame_index is None else frame_index) / self.fps
+        face_w, face_h = self._face_size
+        x = (self.width - face_w) // 2 + int(round(self.motion_px * np.sin(2 * np.pi * 0.2 * t)))
+        y = (self.height - face_h) // 2 + int(round(0.5 * self.motion_px * np.sin(2 * np.pi * 0.13 * t)))
+        x = min(max(x, 0), self.width - face_w)
+        y = min(max(y, 0), self.height - face_h)
+        return x, y, x + face_w - 1, y + face_h - 1
+
+    def _next_frame(self, image):
+        t = self.frame_index / self.fps
+        gain = 1.0 + self.amplitude * self.CHANNEL_GAIN * float(self.pulse_at(t))
+
+        np.multiply(self._face_tex, gain, out=self._face_float)
+        np.clip(self._face_float, 0, 255, out=self._face_float)
+        np.copyto(self._face_u8, self._face_float, casting='unsafe')
+
+        np.copyto(image, self._background)
+        x0, y0, x1, y1 = self.face_bbox()
+        cv2.copyTo(self._face_u8, self._face_mask, image[y0:y1 + 1, x0:x1 + 1])
+        return t
+
+
+def _parse_options(text):
+    """Parse 'key=value,key=value' into a dict of ints / floats / strings."""
+    options = {}
+    for item in filter(None, text.split(',')):
+        key, _, value = item.partition('=')
+        try:
+            options[key.strip()] = int(value)
+        except ValueError:
+            try:
+                options[key.strip()] = float(value)
+            except ValueError:
+                options[key.strip()] = value.strip()
+    return options
+
+
+def open_capture_device(index, backend=None):
+    """
+    Open a capture device with the platform's preferred OpenCV backend.
+
+    Args:
+        index: Device index.
+        backend: 'dshow', 'v4l2', 'msmf', 'avfoundation' or None (platform default).
+    """
+    backends = {
+        'dshow': cv2.CAP_DSHOW,
+        'v4l2': cv2.CAP_V4L2,
+        'msmf': cv2.CAP_MSMF,
+        'avfoundation': cv2.CAP_AVFOUNDATION,
+    }
+    if backend is None:
+        if sys.platform.startswith('win'):
+            backend = 'dshow'
+        elif sys.platform.startswith('linux'):
+            backend = 'v4l2'
+    api = backends.get(backend, cv2.CAP_ANY)
+    return cv2.VideoCapture(int(index), api)
+
+
+def create_frame_source(spec):
+    """
+    Build a frame source from a device index or a spec string.
+
+    Args:
+        spec: int device index, "<backend>:<index>", "file:<path>[?realtime=0]",
+              a path to a video file / frame folder, or "synthetic[:key=value,...]".
+
+    Returns:
+        A cv2.VideoCapture (devices) or a FrameSource.
+    """
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return open_capture_device(int(spec))
+
+    kind, _, rest = spec.partition(':')
+    if kind == 'synthetic':
+        return SyntheticFaceSource(**_parse_options(rest))
+    if kind in ('dshow', 'v4l2', 'msmf', 'avfoundation'):
+        return open_capture_device(int(rest or 0), backend=kind)
+    if kind == 'file':
+        path, _, query = rest.partition('?')
+        return FileFrameSource(path, **_parse_options(query.replace('&', ',')))
+    if os.path.exists(spec):
+        return FileFrameSource(spec)
+
+    raise ValueError(f"Unknown frame source: {spec}")
@@ -0,0 +1,229 @@
+"""
+Frame Save Pipeline Module
+
+Bounded, multi-threaded image encoding for recorded frames.
+cv2.imencode releases the GIL, so a small pool of encoder threads scales PNG / JPEG
+encoding across cores without copying frames into other processes.
+
+The queue is bounded; what happens when it is full is an explicit policy:
+- 'block':       the producer waits for a free slot (no frame is lost)
+- 'drop_oldest': the oldest queued frame is discarded to make room
+- 'degrade':     while the queue is at least half full, encoders switch to the faster
+                 `degrade_format`; the producer only blocks when the queue is completely full
+
+Live counters (queue depth, encode latency, bytes written, drops) are available from stats().
+"""
+
+import os
+import time
+import queue
+import threading
+import cv2
+import numpy as np
+
+# Extensions of the frame images FrameSavePipeline can write (FORMATS), for every reader of recordings
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+
+
+class FrameSavePipeline:
+    """
+    Encode and write frames with a pool of encoder threads behind a bounded queue.
+
+    Usage:
+        saver = FrameSavePipeline(workers=2, max_queue=64, image_format='png')
+        saver.start()
+        saver.submit("./out/1700000000000.png", frame)   # takes ownership of `frame`
+        ...
+        saver.close()
+        print(saver.stats())
+    """
+
+    POLICIES = ('block', 'drop_oldest', 'degrade')
+    FORMATS = ('png', 'jpg', 'webp', 'bmp')
+
+    def __init__(self, workers=2, max_queue=64, image_format='png', png_compression=1,
+                 jpeg_quality=95, full_policy='block', degrade_format='jpg'):
+        """
+        Args:
+            workers: Number of encoder threads.
+            max_queue: Maximum number of frames waiting to be encoded.
+            image_format: 'png', 'jpg', 'webp' or 'bmp'; replaces the extension of submitted filenames.
+            png_compression: PNG compression level 0-9 (0 fastest / largest).
+            jpeg_quality: JPEG / WebP quality 0-100.
+            full_policy: 'block', 'drop_oldest' or 'degrade' (see module docstring).
+            degrade_format: Format used by the 'degrade' policy under backpressure.
+        """
+        if full_policy not in self.POLICIES:
+            raise ValueError(f"Unknown full_policy: {full_policy}, expected one of {self.POLICIES}")
+        for fmt in (image_format, degrade_format):
+            if fmt not in self.FORMATS:
+                raise ValueError(f"Unknown image format: {fmt}, expected one of {self.FORMATS}")
+
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.image_format = image_format
+        self.degrade_format = degrade_format
+        self.full_policy = full_policy
+        self._params = {
+            'png': [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)],
+            'jpg': [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)],
+            'webp': [cv2.IMWRITE_WEBP_QUALITY, int(jpeg_quality)],
+            'bmp': [],
+        }
+
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+
+        # Counters
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.degraded = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.max_depth = 0
+        self._latency_ms = np.zeros(1024, dtype=np.float64)  # ring of recent encode+write times
+        self._latency_count = 0
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def start(self):
+        """Start the encoder threads."""
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._encode_worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, filename, frame, on_done=None):
+        """
+        Queue a frame for encoding. The pipeline takes ownership of `frame`.
+
+        Args:
+            filename: Output path; its extension is replaced by the configured format.
+            frame: BGR uint8 image.
+            on_done: Optional callback, called once the frame is written or dropped.
+
+        Returns:
+            True if queued, False if an older frame had to be dropped to make room.
+        """
+        item = (filename, frame, on_done)
+        self.submitted += 1
+        accepted = True
+
+        if self.full_policy == 'drop_oldest':
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        _, _, old_done = self._queue.get_nowait()
+                    except queue.Empty:
+                        continue
+                    self._queue.task_done()
+                    with self._lock:
+                        self.dropped += 1
+                    if old_done is not None:
+                        old_done()
+                    accepted = False
+        else:
+            self._queue.put(item)
+
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return accepted
+
+    def _encode_worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+
+            filename, frame, on_done = item
+            image_format = self.image_format
+            if self.full_policy == 'degrade' and self._queue.qsize() >= self.max_queue // 2:
+                image_format = self.degrade_format
+
+            t0 = time.perf_counter()
+            try:
+                ok, encoded = cv2.imencode('.' + image_format, frame, self._params[image_format])
+                if not ok:
+                    raise ValueError("imencode failed")
+                path = os.path.splitext(filename)[0] + '.' + image_format
+                with open(path, 'wb') as f:
+                    f.write(encoded)
+                size = encoded.nbytes
+            except Exception as e:
+                print(f"[Saver] Failed to write {filename}: {e}")
+                size = None
+            latency_ms = (time.perf_counter() - t0) * 1000.0
+
+            with self._lock:
+                if size is None:
+                    self.failed += 1
+                else:
+                    self.written += 1
+                    self.bytes_written += size
+                    if image_format != self.image_format:
+                        self.degraded += 1
+                self._latency_ms[self._latency_count % len(self._latency_ms)] = latency_ms
+                self._latency_count += 1
+
+            if on_done is not None:
+                on_done()
+            self._queue.task_done()
+
+    def join(self):
+        """Wait until every queued frame has been written (or dropped)."""
+        self._queue.join()
+
+    def close(self):
+        """Drain the queue and stop the encoder threads."""
+        self._queue.join()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
+    def stats(self):
+        """Snapshot of the live counters."""
+        with self._lock:
+            n = min(self._latency_count, len(self._latency_ms))
+            latency = self._latency_ms[:n].copy()
+            result = {
+                'workers': self.workers,
+                'format': self.image_format,
+                'full_policy': self.full_policy,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self.max_queue,
+                'max_queue_depth': self.max_depth,
+                'submitted': self.submitted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'degraded': self.degraded,
+                'failed': self.failed,
+                'bytes_written': self.bytes_written,
+            }
+        if n:
+            result.update({
+                'encode_latency_mean_ms': float(latency.mean()),
+                'encode_latency_p95_ms': float(np.percentile(latency, 95)),
+                'encode_latency_max_ms': float(latency.max()),
+            })
+        return result
+
+    def status_line(self):
+        """One-line summary of stats() for console progress output."""
+        s = self.stats()
+        line = (f"[Saver] queue {s['queue_depth']}/{s['queue_capacity']} (max {s['max_queue_depth']}) | "
+                f"written {s['written']} | dropped {s['dropped']} | degraded {s['degraded']} | "
+                f"{s['bytes_written'] / 1e6:.1f} MB")
+        if 'encode_latency_mean_ms' in s:
+            line += f" | encode {s['encode_latency_mean_ms']:.1f} ms (p95 {s['encode_latency_p95_ms']:.1f})"
+        return line
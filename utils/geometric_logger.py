@@ -0,0 +1,116 @@
+"""
+Geometric Data Logger Module
+
+Writes geometric_data.csv, one row per recorded frame (frame number, timestamp,
+face distance / pose from FaceDistanceMeasurement and the face pixel count from
+FacePixelCounter). Used by Camera.record and by the analysis process of the
+process-based acquisition runtime, so both produce the same file.
+"""
+
+import os
+import csv
+import numpy as np
+from datetime import datetime
+
+CSV_FILE = "geometric_data.csv"
+
+CSV_COLUMNS = [
+    'Frame_Number',
+    'Timestamp_ms',
+    'Timestamp_DateTime',
+    'Distance_cm',
+    'Roll_deg',
+    'Yaw_deg',
+    'Pitch_deg',
+    'Angle_Camera_Object_deg',
+    'ROI_Pixels'
+]
+CROP_COLUMNS = ['Crop_X', 'Crop_Y', 'Crop_Side_px', 'Is_Keyframe']
+
+
+class GeometricDataLogger:
+    """
+    geometric_data.csv writer.
+
+    Usage:
+        logger = GeometricDataLogger(output_dir)
+        logger.log(frame_number, ts_ms, measurement, pixel_info)
+        logger.close()
+    """
+
+    def __init__(self, output_dir, crop_columns=False):
+        """
+        Args:
+            output_dir: Directory where the CSV will be saved
+            crop_columns: Add the face crop window / keyframe columns (crop recording)
+        """
+        self.path = os.path.join(output_dir, CSV_FILE)
+        self.crop_columns = crop_columns
+        self.rows = 0
+        self.file = open(self.path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(CSV_COLUMNS + (CROP_COLUMNS if crop_columns else []))
+        print(f"CSV file initialized: {self.path}")
+
+    def log(self, frame_number, timestamp_ms, measurement, pixel_info,
+            crop_window=None, keyframe=False):
+        """
+        Log geometric data for a single frame to CSV.
+
+        Args:
+            frame_number: Current frame index
+            timestamp_ms: Timestamp in milliseconds
+            measurement: Dictionary from FaceDistanceMeasurement
+            pixel_info: Dictionary from FacePixelCounter
+            crop_window: (x, y, side) of the saved face crop in frame pixels (crop recording)
+            keyframe: Whether the full frame was saved as well (crop recording)
+        """
+        # Get timestamp as datetime string
+        timestamp_dt = datetime.fromtimestamp(timestamp_ms / 1000.0).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+        # Extract values or use NaN if face not detected
+        if measurement is not None:
+            distance = measurement['distance_cm']
+            roll = measurement['roll_degrees']
+            yaw = measurement['yaw_degrees']
+            pitch = measurement['pitch_degrees']
+            angle_camera_object = measurement['position_azimuth']
+        else:
+            distance = np.nan
+            roll = np.nan
+            yaw = np.nan
+            pitch = np.nan
+            angle_camera_object = np.nan
+
+        # Extract pixel count
+        if pixel_info is not None:
+            roi_pixels = pixel_info['total_pixels']
+        else:
+            roi_pixels = np.nan
+
+        row = [
+            frame_number,
+            timestamp_ms,
+            timestamp_dt,
+            distance,
+            roll,
+            yaw,
+            pitch,
+            angle_camera_object,
+            roi_pixels
+        ]
+        if self.crop_columns:
+            row += list(crop_window) if crop_window is not None else [np.nan] * 3
+            row.append(int(keyframe))
+        self.writer.writerow(row)
+        self.rows += 1
+
+        # Flush to ensure data is written immediately
+        self.file.flush()
+
+    def close(self):
+        """Close the CSV file."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            print("CSV file closed successfully")
@@ -0,0 +1,265 @@
+"""
+Beat Detection / HRV Module
+
+Time-domain beat detection on a preprocessed PPG (preprocess_ppg output) and the
+heart-rate-variability metrics derived from the beat-to-beat (RR) intervals:
+
+- systolic peaks (sub-sample, parabolic interpolation) and pulse onsets (the foot
+  before every peak), found with scipy.signal.find_peaks
+- RR intervals, instantaneous HR and a validity mask (out-of-band or ectopic beats)
+- SDNN, RMSSD, pNN50 and LF/HF, for the whole session and per sliding window
+
+Every step is vectorized: the windowed time-domain metrics come from cumulative
+sums and the windowed LF/HF from one batched Welch PSD over all windows.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.ndimage import median_filter, maximum_filter1d
+from scipy.signal import find_peaks, welch
+
+from utils.evaluate_ppg import HR_BAND
+
+LF_BAND = (0.04, 0.15)     # Hz, low-frequency HRV band
+HF_BAND = (0.15, 0.40)     # Hz, high-frequency HRV band
+TACHOGRAM_FS = 4.0         # Hz, resampling rate of the RR series for the spectral metrics
+MIN_SPECTRAL_S = 60.0      # Shorter series / windows get no LF/HF
+
+# One row per HRV window
+HRV_WINDOW_DTYPE = np.dtype([
+    ('start_s', '<f8'),
+    ('end_s', '<f8'),
+    ('beats', '<i4'),          # valid RR intervals ending in the window
+    ('coverage', '<f4'),       # fraction of the window covered by valid RR intervals
+    ('hr_bpm', '<f4'),
+    ('sdnn_ms', '<f4'),
+    ('rmssd_ms', '<f4'),
+    ('pnn50', '<f4'),          # percent
+    ('lf_hf', '<f4'),
+])
+
+
+# ---------- Beats ----------
+
+def detect_beats(ppg, fs, hr_band=HR_BAND, prominence=0.5, neighbour_peaks=9):
+    """
+    Find systolic peaks and pulse onsets.
+
+    Args:
+        ppg: (N,) band-passed PPG (e.g. from preprocess_ppg), any scale.
+        fs: Sampling rate in Hz.
+        hr_band: Plausible HR range in Hz; its upper end sets the minimum peak distance.
+        prominence: Minimum peak prominence relative to the largest of the neighbour_peaks
+            surrounding candidates; rejects dicrotic peaks and noise whatever the amplitude.
+        neighbour_peaks: Candidate peaks the reference prominence is taken over.
+
+    Returns:
+        dict with 'peaks' (K,) sample indices, 'peak_times_s' (K,) refined peak times,
+        'onsets' (K,) index of the foot before each peak (-1: none) and 'onset_times_s'.
+    """
+    x = np.asarray(ppg, dtype=float)
+    empty = np.zeros(0, dtype=np.int64)
+    if len(x) < 3:
+        return {'peaks': empty, 'peak_times_s': np.zeros(0), 'onsets': empty, 'onset_times_s': np.zeros(0)}
+
+    z = (x - x.mean()) / (x.std() or 1.0)
+    min_distance = max(1, int(fs / hr_band[1]))
+    peaks, props = find_peaks(z, distance=min_distance, prominence=0.05)
+    reference = maximum_filter1d(props['prominences'], size=neighbour_peaks, mode='nearest') if len(peaks) else 0
+    peaks = peaks[props['prominences'] >= prominence * reference]
+    troughs, _ = find_peaks(-z)
+
+    # Parabolic interpolation of each peak on its two neighbours
+    interior = (peaks > 0) & (peaks < len(z) - 1)
+    y0, y1, y2 = z[peaks[interior] - 1], z[peaks[interior]], z[peaks[interior] + 1]
+    denom = y0 - 2.0 * y1 + y2
+    curved = np.abs(denom) > 1e-12
+    shift = np.zeros(len(peaks))
+    shift[interior] = np.where(curved, 0.5 * (y0 - y2) / np.where(curved, denom, 1.0), 0.0)
+    peak_times_s = (peaks + np.clip(shift, -0.5, 0.5)) / fs
+
+    # Onset: the last trough before each peak, if it comes after the previous peak
+    k = np.searchsorted(troughs, peaks) - 1
+    onsets = np.where(k >= 0, troughs[np.maximum(k, 0)], -1) if len(troughs) else np.full(len(peaks), -1)
+    previous_peak = np.concatenate([[-1], peaks[:-1]])
+    onsets = np.where(onsets > previous_peak, onsets, -1)
+
+    return {
+        'peaks': peaks,
+        'peak_times_s': peak_times_s,
+        'onsets': onsets,
+        'onset_times_s': np.where(onsets >= 0, onsets / fs, np.nan),
+    }
+
+
+def rr_intervals(peak_times_s, hr_band=HR_BAND, max_deviation=0.2, median_beats=5):
+    """
+    RR intervals between consecutive peaks and their validity.
+
+    An interval is invalid when it is outside hr_band or deviates more than
+    max_deviation from the median of its median_beats neighbours (missed or extra beat).
+
+    Returns:
+        (rr_ms (K-1,), rr_times_s (K-1,) time of the closing beat, valid (K-1,) bool)
+    """
+    t = np.asarray(peak_times_s, dtype=float)
+    rr_ms = np.diff(t) * 1000.0
+    if len(rr_ms) == 0:
+        return rr_ms, t[1:], np.zeros(0, dtype=bool)
+    local = median_filter(rr_ms, size=median_beats, mode='nearest')
+    valid = ((rr_ms >= 1000.0 / hr_band[1]) & (rr_ms <= 1000.0 / hr_band[0])
+             & (np.abs(rr_ms - local) <= max_deviation * local))
+    return rr_ms, t[1:], valid
+
+
+# ---------- HRV ----------
+
+def _tachogram(rr_ms, rr_times_s, valid, start_s, n):
+    """Valid RR intervals linearly interpolated on a TACHOGRAM_FS grid of n points from start_s."""
+    grid = start_s + np.arange(n) / TACHOGRAM_FS
+    if valid.sum() < 2:
+        return grid, np.full(n, np.nan)
+    return grid, np.interp(grid, rr_times_s[valid], rr_ms[valid])
+
+
+def _band_powers(f, pxx):
+    lf_mask = (f >= LF_BAND[0]) & (f < LF_BAND[1])
+    hf_mask = (f >= HF_BAND[0]) & (f < HF_BAND[1])
+    lf = np.trapezoid(pxx[..., lf_mask], f[lf_mask], axis=-1)
+    hf = np.trapezoid(pxx[..., hf_mask], f[hf_mask], axis=-1)
+    return lf, hf
+
+
+def hrv_metrics(rr_ms, rr_times_s, valid):
+    """
+    Session HRV from the valid RR intervals.
+
+    Returns:
+        dict with beats, hr_bpm, sdnn_ms, rmssd_ms, pnn50 (%), lf_power / hf_power (ms^2)
+        and lf_hf. Spectral values are NaN for series shorter than MIN_SPECTRAL_S.
+    """
+    nn = rr_ms[valid]
+    pair = valid[1:] & valid[:-1]                   # successive differences of two valid intervals
+    d = np.diff(rr_ms)[pair]
+    metrics = {
+        'beats': int(len(nn)),
+        'hr_bpm': float(60000.0 / nn.mean()) if len(nn) else np.nan,
+        'sdnn_ms': float(nn.std(ddof=1)) if len(nn) > 1 else np.nan,
+        'rmssd_ms': float(np.sqrt(np.mean(d ** 2))) if len(d) else np.nan,
+        'pnn50': float(np.mean(np.abs(d) > 50.0) * 100.0) if len(d) else np.nan,
+        'lf_power': np.nan, 'hf_power': np.nan, 'lf_hf': np.nan,
+    }
+
+    if len(nn) > 2:
+        start_s, end_s = rr_times_s[valid][0], rr_times_s[valid][-1]
+        n = int((end_s - start_s) * TACHOGRAM_FS)
+        if n / TACHOGRAM_FS >= MIN_SPECTRAL_S:
+            _, rr_grid = _tachogram(rr_ms, rr_times_s, valid, start_s, n)
+            f, pxx = welch(rr_grid - rr_grid.mean(), TACHOGRAM_FS, nperseg=min(n, 256), detrend='linear')
+            lf, hf = _band_powers(f, pxx)
+            metrics.update(lf_power=float(lf), hf_power=float(hf), lf_hf=float(lf / hf) if hf > 0 else np.nan)
+    return metrics
+
+
+def windowed_hrv(rr_ms, rr_times_s, valid, duration_s, window_s=60.0, step_s=30.0, min_beats=3):
+    """
+    HRV per sliding window, all windows at once.
+
+    Args:
+        rr_ms, rr_times_s, valid: From rr_intervals.
+        duration_s: Length of the recording in seconds.
+        window_s: Window length in seconds.
+        step_s: Hop between windows in seconds.
+        min_beats: Windows with fewer valid intervals get NaN metrics.
+
+    Returns:
+        HRV_WINDOW_DTYPE array, one row per window (an RR interval belongs to the
+        window its closing beat falls in).
+    """
+    if duration_s < window_s:
+        return np.zeros(0, dtype=HRV_WINDOW_DTYPE)
+    starts = np.arange(0.0, duration_s - window_s + 1e-9, step_s)
+    lo = np.searchsorted(rr_times_s, starts, side='left')
+    hi = np.searchsorted(rr_times_s, starts + window_s, side='left')
+
+    def window_sum(values):
+        c = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+        return c[hi] - c[lo]
+
+    nn = np.where(valid, rr_ms, 0.0)
+    count = window_sum(valid)
+    total = window_sum(nn)
+    sum_sq = window_sum(nn ** 2)
+
+    # Successive differences: pair i (intervals i, i + 1) is in the window when both are
+    pair = (valid[1:] & valid[:-1]).astype(float)
+    d = np.where(pair > 0, np.diff(rr_ms), 0.0)
+    hi_pair = np.maximum(hi - 1, lo)
+
+    def pair_sum(values):
+        c = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+        return c[hi_pair] - c[lo]
+
+    pairs = pair_sum(pair)
+    d_sq = pair_sum(d ** 2)
+    nn50 = pair_sum((np.abs(d) > 50.0) & (pair > 0))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        enough = count >= min_beats
+        out = np.zeros(len(starts), dtype=HRV_WINDOW_DTYPE)
+        out['start_s'] = starts
+        out['end_s'] = starts + window_s
+        out['beats'] = count
+        out['coverage'] = np.minimum(total / (window_s * 1000.0), 1.0)
+        out['hr_bpm'] = np.where(enough, 60000.0 / mean, np.nan)
+        out['sdnn_ms'] = np.where(enough, np.sqrt(np.maximum(sum_sq - count * mean ** 2, 0.0) / (count - 1)), np.nan)
+        out['rmssd_ms'] = np.where(enough & (pairs > 0), np.sqrt(d_sq / pairs), np.nan)
+        out['pnn50'] = np.where(enough & (pairs > 0), nn50 / pairs * 100.0, np.nan)
+    out['lf_hf'] = np.nan
+
+    # LF/HF: one tachogram for the session, one batched Welch PSD over its windows
+    win = int(window_s * TACHOGRAM_FS)
+    step = max(1, int(step_s * TACHOGRAM_FS))
+    n = int(duration_s * TACHOGRAM_FS)
+    if window_s >= MIN_SPECTRAL_S and valid.sum() >= 2 and n >= win:
+        _, rr_grid = _tachogram(rr_ms, rr_times_s, valid, 0.0, n)
+        segments = sliding_window_view(rr_grid, win)[::step][:len(starts)]
+        f, pxx = welch(segments - segments.mean(axis=-1, keepdims=True), TACHOGRAM_FS,
+                       nperseg=min(win, 256), detrend='linear', axis=-1)
+        lf, hf = _band_powers(f, pxx)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            lf_hf = np.where(hf > 0, lf / hf, np.nan)
+        # The tachogram is interpolated across gaps; only trust well-covered windows
+        m = len(segments)
+        out['lf_hf'][:m] = np.where(enough[:m] & (out['coverage'][:m] >= 0.8), lf_hf, np.nan)
+    return out
+
+
+def analyze_ppg(ppg, fs, window_s=60.0, step_s=30.0, hr_band=HR_BAND):
+    """
+    Beats, RR intervals and HRV of one preprocessed PPG.
+
+    Args:
+        ppg: (N,) band-passed PPG (preprocess_ppg output).
+        fs: Sampling rate in Hz.
+        window_s, step_s: Sliding HRV window.
+        hr_band: Plausible HR range in Hz.
+
+    Returns:
+        dict with 'beats' (detect_beats), 'rr_ms', 'rr_times_s', 'rr_valid', 'hr_inst_bpm',
+        'summary' (hrv_metrics) and 'windows' (HRV_WINDOW_DTYPE array).
+    """
+    beats = detect_beats(ppg, fs, hr_band=hr_band)
+    rr_ms, rr_times_s, valid = rr_intervals(beats['peak_times_s'], hr_band=hr_band)
+    with np.errstate(divide='ignore'):
+        hr_inst = 60000.0 / rr_ms
+    return {
+        'beats': beats,
+        'rr_ms': rr_ms,
+        'rr_times_s': rr_times_s,
+        'rr_valid': valid,
+        'hr_inst_bpm': hr_inst,
+        'summary': hrv_metrics(rr_ms, rr_times_s, valid),
+        'windows': windowed_hrv(rr_ms, rr_times_s, valid, len(ppg) / fs, window_s, step_s),
+    }
@@ -0,0 +1,186 @@
+"""
+Motion Artifact Module
+
+Head motion from geometric_data.csv (see utils/geometric_logger.py), summarized per
+sliding time window so PPG and rPPG windows recorded while the subject moved can be
+skipped:
+
+- motion_energy:      mean squared head rotation speed (deg^2/s^2, roll / yaw / pitch together)
+- pose_rate_dps:      mean head rotation speed (deg/s)
+- distance_rate_cms:  mean speed towards / away from the camera (cm/s)
+- roi_change:         mean relative change of the face pixel count per second (1/s)
+- face_lost:          fraction of the window's frames without a face
+
+All windows are computed at once from cumulative sums over the per-frame arrays, so a
+session costs a few array passes however long it is.
+
+Usage:
+    windows = motion_windows(session.geometric)            # MOTION_WINDOW_DTYPE, 'flagged' set
+    skip = motion_mask(windows, ppg_times_ms)              # True for samples inside a flagged window
+    sqi = compute_ppg_sqi_windows(ppg, fs, skip=skip)      # utils/evaluate_ppg.py
+"""
+
+import numpy as np
+
+# A window is flagged when any metric exceeds its threshold
+MOTION_THRESHOLDS = {
+    'motion_energy': 900.0,     # (deg/s)^2, i.e. 30 deg/s RMS rotation speed
+    'pose_rate_dps': 20.0,
+    'distance_rate_cms': 10.0,
+    'roi_change': 0.3,
+    'face_lost': 0.2,
+}
+
+MOTION_WINDOW_DTYPE = np.dtype([
+    ('start_ms', '<f8'),
+    ('end_ms', '<f8'),
+    ('frames', '<i8'),
+    ('motion_energy', '<f4'),
+    ('pose_rate_dps', '<f4'),
+    ('distance_rate_cms', '<f4'),
+    ('roi_change', '<f4'),
+    ('face_lost', '<f4'),
+    ('flagged', '?'),
+])
+
+
+def frame_motion(geometric):
+    """
+    Per-frame motion speeds from consecutive geometric_data.csv rows.
+
+    Args:
+        geometric: Structured array with Timestamp_ms, Distance_cm, Roll_deg, Yaw_deg,
+            Pitch_deg and ROI_Pixels (load_geometric_table / Session.geometric).
+
+    Returns:
+        dict of (N,) arrays: 'timestamp_ms', 'pose_rate_dps', 'distance_rate_cms',
+        'roi_change' (NaN where this or the previous frame has no face; the first
+        frame is always NaN) and 'face_lost' (bool).
+    """
+    t = np.asarray(geometric['Timestamp_ms'], dtype=float)
+    distance = np.asarray(geometric['Distance_cm'], dtype=float)
+    pose = np.stack([np.asarray(geometric[c], dtype=float) for c in ('Roll_deg', 'Yaw_deg', 'Pitch_deg')], axis=-1)
+    pixels = np.asarray(geometric['ROI_Pixels'], dtype=float)
+    face_lost = ~(np.isfinite(distance) & np.all(np.isfinite(pose), axis=-1))
+
+    dt = np.diff(t) / 1000.0
+    dt = np.where(dt > 0, dt, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Angle differences wrapped into [-180, 180)
+        d_pose = (np.diff(pose, axis=0) + 180.0) % 360.0 - 180.0
+        pose_rate = np.sqrt((d_pose ** 2).sum(axis=-1)) / dt
+        distance_rate = np.abs(np.diff(distance)) / dt
+        log_pixels = np.log(np.where(pixels > 0, pixels, np.nan))
+        roi_change = np.abs(np.diff(log_pixels)) / dt
+
+    head = np.full(1, np.nan)
+    return {
+        'timestamp_ms': t,
+        'pose_rate_dps': np.concatenate([head, pose_rate]),
+        'distance_rate_cms': np.concatenate([head, distance_rate]),
+        'roi_change': np.concatenate([head, roi_change]),
+        'face_lost': face_lost,
+    }
+
+
+def _window_mean(values, lo, hi):
+    """NaN-ignoring mean of values[lo:hi] for every (lo, hi) pair, from cumulative sums."""
+    ok = np.isfinite(values)
+    total = np.concatenate([[0.0], np.cumsum(np.where(ok, values, 0.0))])
+    count = np.concatenate([[0], np.cumsum(ok)])
+    n = count[hi] - count[lo]
+    return np.divide(total[hi] - total[lo], n, out=np.full(len(lo), np.nan), where=n > 0)
+
+
+def motion_windows(geometric, window_s=10.0, step_s=5.0, thresholds=None):
+    """
+    Motion metrics of sliding time windows over a session's geometric data.
+
+    Args:
+        geometric: geometric_data.csv structured array (see frame_motion).
+        window_s: Window length in seconds.
+        step_s: Hop between window starts in seconds.
+        thresholds: {metric: limit} overriding MOTION_THRESHOLDS.
+
+    Returns:
+        MOTION_WINDOW_DTYPE array, one row per window (empty without geometric rows).
+        'flagged' is set where any metric exceeds its threshold.
+    """
+    if geometric is None or len(geometric) == 0:
+        return np.zeros(0, dtype=MOTION_WINDOW_DTYPE)
+    motion = frame_motion(geometric)
+    t = motion['timestamp_ms']
+
+    window_ms, step_ms = window_s * 1000.0, step_s * 1000.0
+    n_windows = max(1, int(np.floor((t[-1] - t[0] - window_ms) / step_ms)) + 1)
+    starts = t[0] + np.arange(n_windows) * step_ms
+    lo = np.searchsorted(t, starts, side='left')
+    hi = np.searchsorted(t, starts + window_ms, side='left')
+
+    windows = np.zeros(n_windows, dtype=MOTION_WINDOW_DTYPE)
+    windows['start_ms'] = starts
+    windows['end_ms'] = starts + window_ms
+    windows['frames'] = hi - lo
+    windows['motion_energy'] = _window_mean(motion['pose_rate_dps'] ** 2, lo, hi)
+    windows['pose_rate_dps'] = _window_mean(motion['pose_rate_dps'], lo, hi)
+    windows['distance_rate_cms'] = _window_mean(motion['distance_rate_cms'], lo, hi)
+    windows['roi_change'] = _window_mean(motion['roi_change'], lo, hi)
+    windows['face_lost'] = _window_mean(motion['face_lost'].astype(float), lo, hi)
+    windows['flagged'] = flag_windows(windows, thresholds)
+    return windows
+
+
+def flag_windows(windows, thresholds=None):
+    """
+    Windows whose motion exceeds a threshold (NaN metrics never do; windows without
+    any frame are flagged as face lost).
+
+    Returns:
+        (W,) bool array.
+    """
+    limits = {**MOTION_THRESHOLDS, **(thresholds or {})}
+    flagged = windows['frames'] == 0
+    for metric, limit in limits.items():
+        with np.errstate(invalid='ignore'):
+            flagged |= np.asarray(windows[metric]) > limit
+    return flagged
+
+
+def motion_mask(windows, times_ms):
+    """
+    Which times fall inside a flagged window.
+
+    Args:
+        windows: motion_windows result.
+        times_ms: (N,) sample or frame times on the same wall clock (ms).
+
+    Returns:
+        (N,) bool array, True inside [start_ms, end_ms) of any flagged window.
+        Times outside the geometric recording are not flagged.
+    """
+    times = np.asarray(times_ms, dtype=float)
+    flagged = windows[windows['flagged']]
+    if len(flagged) == 0:
+        return np.zeros(times.shape, dtype=bool)
+    started = np.searchsorted(np.sort(flagged['start_ms']), times, side='right')
+    ended = np.searchsorted(np.sort(flagged['end_ms']), times, side='right')
+    return started > ended
+
+
+def skipped_windows(skip, win, step, max_skipped=0.0):
+    """
+    Which sliding windows of (win, step) samples to skip given a per-sample skip mask.
+
+    Args:
+        skip: (N,) bool, e.g. motion_mask at the sample times.
+        win, step: Window length and hop in samples.
+        max_skipped: Fraction of skipped samples a window may contain and still be used.
+
+    Returns:
+        (W,) bool array for the windows starting at 0, step, 2 * step, ...
+    """
+    skip = np.asarray(skip, dtype=bool)
+    count = np.concatenate([[0], np.cumsum(skip)])
+    starts = np.arange(0, max(1, len(skip) - win + 1), step)
+    ends = np.minimum(starts + win, len(skip))
+    return (count[ends] - count[starts]) > max_skipped * win
@@ -39,16 +39,49 @@ class FacePixelCounter:
             min_detection_confidence=0.7,
             min_tracking_confidence=0.7
         )
+
+        # Scratch mask reused across frames. Only the polygon's bounding box is
+        # rasterized into it, so it grows to the largest face seen and stays there.
+        self._mask_buffer = np.zeros((0, 0), dtype=np.uint8)
         print("✓ Face Pixel Counter initialized")
 
+    def _rasterize_polygon(self, points: np.ndarray,
+                           bbox: Tuple[int, int, int, int]) -> np.ndarray:
+        """
+        Fill the polygon into the reused scratch buffer, restricted to its bounding box.
+
+        Args:
+            points: Polygon vertices in frame coordinates, shape (N, 2), int32.
+            bbox: (x_min, y_min, x_max, y_max) of the polygon (inclusive).
+
+        Returns:
+            A view into the scratch buffer covering the bounding box (255 inside the face).
+            The view is overwritten by the next call.
+        """
+        x_min, y_min, x_max, y_max = bbox
+        box_w = x_max - x_min + 1
+        box_h = y_max - y_min + 1
+
+        buf_h, buf_w = self._mask_buffer.shape
+        if box_h > buf_h or box_w > buf_w:
+            self._mask_buffer = np.zeros((max(box_h, buf_h), max(box_w, buf_w)), dtype=np.uint8)
+
+        local_mask = self._mask_buffer[:box_h, :box_w]
+        local_mask.fill(0)
+        cv2.fillPoly(local_mask, [points], 255, offset=(-int(x_min), -int(y_min)))
+        return local_mask
+
     def count_face_pixels(self, frame: np.ndarray,
-                          face_landmarks=None) -> Optional[Dict]:
+                          face_landmarks=None,
+                          return_mask: bool = False) -> Optional[Dict]:
         """
         Count the total number of pixels inside the face region.
 
         Args:
             frame: Input image frame (BGR).
             face_landmarks: Optional pre-detected face landmarks (from an external detector).
+            return_mask: If True, also return a full-frame uint8 mask under 'mask'.
+                         Building it costs one frame-sized allocation, so it is off by default.
 
         Returns:
             A dictionary with pixel statistics, or None if no face is detected.
@@ -85,13 +118,6 @@ class FacePixelCounter:
 
         face_oval_points = np.array(face_oval_points, dtype=np.int32)
 
-        # Create a binary mask for the face region
-        mask = np.zeros((h, w), dtype=np.uint8)
-        cv2.fillPoly(mask, [face_oval_points], 255)
-
-        # Count the number of face pixels
-        total_pixels = cv2.countNonZero(mask)
-
         # Compute bounding box of the face polygon
         x_min, y_min = face_oval_points.min(axis=0)
         x_max, y_max = face_oval_points.max(axis=0)
@@ -99,11 +125,15 @@ class FacePixelCounter:
         bbox_height = y_max - y_min
         bbox_area = bbox_width * bbox_height
 
+        # Rasterize only inside the bounding box and count the face pixels there
+        local_mask = self._rasterize_polygon(face_oval_points, (x_min, y_min, x_max, y_max))
+        total_pixels = cv2.countNonZero(local_mask)
+
         # Compute ratio of face pixels to total frame pixels
         frame_total_pixels = h * w
         face_ratio = (total_pixels / frame_total_pixels) * 100
 
-        return {
+        result = {
             'total_pixels': total_pixels,
             'bbox': (x_min, y_min, x_max, y_max),
             'bbox_width': bbox_width,
@@ -111,9 +141,16 @@ class FacePixelCounter:
             'bbox_area': bbox_area,
             'face_ratio_percent': face_ratio,
             'face_contour_points': face_oval_points,
-            'mask': mask
+            'face_landmarks': face_landmarks
         }
 
+        if return_mask:
+            mask = np.zeros((h, w), dtype=np.uint8)
+            mask[y_min:y_max + 1, x_min:x_max + 1] = local_mask
+            result['mask'] = mask
+
+        return result
+
     def draw_pixel_info(self, frame: np.ndarray,
                         pixel_info: Optional[Dict],
                         show_contour: bool = True,
@@ -0,0 +1,236 @@
+"""
+PPG Cleaning Module
+
+Raw pulse sensor samples can carry three kinds of defects that the band-pass in
+preprocess_ppg does not remove:
+
+- spikes:     single corrupted serial readings, replaced by the Hampel filter (a sample
+              further than n_sigmas x 1.4826 x MAD from the median of its centered
+              window is replaced by that median)
+- saturation: ADC readings at the ends of its range (0 / 1023 for the 10-bit Arduino ADC)
+- flat lines: runs of identical readings (sensor detached, ADC stuck) of at least flat_s
+
+Two forms with the same results:
+
+- clean_ppg: the whole signal (or a (channels, samples) array) at once, vectorized
+- StreamingPPGCleaner: one sample at a time, for the collector while it records. Each
+  sample costs a fixed amount of work (one window of HAMPEL_WINDOW values); the
+  cleaned value of a sample is available HAMPEL_WINDOW // 2 samples later.
+
+Usage:
+    result = clean_ppg(ppg, fs=50)          # result['ppg'], result['counts']
+    cleaner = StreamingPPGCleaner(fs=50)
+    for value in samples:
+        cleaner.update(value)
+    cleaner.flush()
+    save_quality_counts(cleaner.counts, session_dir)    # pulse_quality.csv
+"""
+
+import os
+import csv
+import bisect
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+HAMPEL_WINDOW = 7           # samples, centered (odd)
+HAMPEL_SIGMAS = 3.0
+MIN_DEVIATION = 2.0         # ADC counts; smaller deviations are never spikes (quantization in flat windows)
+ADC_RANGE = (0, 1023)       # 10-bit Arduino ADC
+FLAT_S = 0.5                # shortest run of identical readings counted as a flat line
+MAD_SCALE = 1.4826          # MAD -> standard deviation for Gaussian noise
+QUALITY_FILE = "pulse_quality.csv"
+COUNT_FIELDS = ('samples', 'spikes', 'saturated', 'flat_segments', 'flat_samples')
+
+
+def _flat_runs(x, min_length):
+    """Runs of at least min_length identical values along the last axis: (flat mask, segments per row)."""
+    n = x.shape[-1]
+    same = np.diff(x, axis=-1) == 0
+    # One False on both sides of every row, so runs never cross rows; row r starts at r * (n + 1)
+    padded = np.pad(same, [(0, 0)] * (same.ndim - 1) + [(1, 1)]).ravel()
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]     # a run of k equal neighbour pairs covers k + 1 samples
+    keep = ends - starts + 1 >= min_length
+    starts, length = starts[keep], ends[keep] - starts[keep] + 1
+    rows = starts // (n + 1)
+    first = starts - rows                       # index of the run's first sample in x.ravel()
+
+    marks = np.zeros(x.size + 1, dtype=np.int64)
+    np.add.at(marks, first, 1)
+    np.add.at(marks, first + length, -1)
+    mask = np.cumsum(marks[:-1]).astype(bool).reshape(x.shape)
+    segments = np.bincount(rows, minlength=x.size // max(n, 1)).reshape(x.shape[:-1])
+    return mask, segments
+
+
+def clean_ppg(ppg, fs=50.0, window=HAMPEL_WINDOW, n_sigmas=HAMPEL_SIGMAS, min_deviation=MIN_DEVIATION,
+              adc_range=ADC_RANGE, flat_s=FLAT_S):
+    """
+    Hampel spike filter, saturation and flat-line detection over whole signals.
+
+    Args:
+        ppg: (N,) signal or (channels, N) array of raw ADC readings.
+        fs: Sampling rate in Hz (for flat_s).
+        window: Hampel window in samples (odd, centered; the ends are padded with the edge value).
+        n_sigmas: Spike threshold in robust standard deviations.
+        min_deviation: Smallest deviation from the median counted as a spike.
+        adc_range: (low, high) ADC limits; readings at or beyond them are saturated.
+        flat_s: Shortest run of identical readings counted as a flat line, seconds.
+
+    Returns:
+        dict with 'ppg' (spikes replaced by the window median), the bool masks 'spike',
+        'saturated' and 'flat' (same shape as ppg), and 'counts': {'samples', 'spikes',
+        'saturated', 'flat_segments', 'flat_samples'} (ints, or (channels,) arrays).
+    """
+    x = np.asarray(ppg, dtype=float)
+    if x.shape[-1] == 0:
+        empty = np.zeros(x.shape, dtype=bool)
+        zeros = np.zeros(x.shape[:-1], dtype=np.int64)
+        return {'ppg': x, 'spike': empty, 'saturated': empty, 'flat': empty,
+                'counts': {'samples': 0, 'spikes': zeros, 'saturated': zeros,
+                           'flat_segments': zeros, 'flat_samples': zeros}}
+    half = window // 2
+    padded = np.pad(x, [(0, 0)] * (x.ndim - 1) + [(half, half)], mode='edge')
+    windows = sliding_window_view(padded, 2 * half + 1, axis=-1)
+    median = np.median(windows, axis=-1)
+    mad = np.median(np.abs(windows - median[..., None]), axis=-1)
+    deviation = np.abs(x - median)
+    spike = deviation > np.maximum(n_sigmas * MAD_SCALE * mad, min_deviation)
+
+    saturated = (x <= adc_range[0]) | (x >= adc_range[1])
+    flat, flat_segments = _flat_runs(x, max(2, int(round(flat_s * fs))))
+
+    return {
+        'ppg': np.where(spike, median, x),
+        'spike': spike,
+        'saturated': saturated,
+        'flat': flat,
+        'counts': {
+            'samples': x.shape[-1],
+            'spikes': spike.sum(axis=-1),
+            'saturated': saturated.sum(axis=-1),
+            'flat_segments': flat_segments,
+            'flat_samples': flat.sum(axis=-1),
+        },
+    }
+
+
+class StreamingPPGCleaner:
+    """
+    clean_ppg for one channel, one sample at a time (see the module docstring).
+
+    Usage:
+        cleaner = StreamingPPGCleaner(fs=50)
+        out = cleaner.update(value)   # None, or (cleaned value, is_spike) of the sample window // 2 back
+        cleaner.flush()               # the remaining samples at the end of the session
+    """
+
+    def __init__(self, fs=50.0, window=HAMPEL_WINDOW, n_sigmas=HAMPEL_SIGMAS, min_deviation=MIN_DEVIATION,
+                 adc_range=ADC_RANGE, flat_s=FLAT_S):
+        """
+        Args:
+            Same as clean_ppg.
+        """
+        self.half = window // 2
+        self.n_sigmas = n_sigmas
+        self.min_deviation = min_deviation
+        self.adc_range = adc_range
+        self.flat_samples = max(2, int(round(flat_s * fs)))
+        self.reset()
+
+    def reset(self):
+        """Start a new session (clears the window and the counts)."""
+        self.window = deque()           # the last 2 * half + 1 values in arrival order
+        self.sorted = []                # the same values, sorted
+        self.last = None
+        self.run_length = 0
+        self.counts = {'samples': 0, 'spikes': 0, 'saturated': 0, 'flat_segments': 0, 'flat_samples': 0}
+
+    def _push(self, value):
+        """Slide the Hampel window by one value; returns the (cleaned, is_spike) of its center once full."""
+        self.window.append(value)
+        bisect.insort(self.sorted, value)
+        if len(self.window) > 2 * self.half + 1:
+            old = self.window.popleft()
+            del self.sorted[bisect.bisect_left(self.sorted, old)]
+        if len(self.window) < 2 * self.half + 1:
+            return None
+
+        center = self.window[self.half]
+        median = self.sorted[self.half]
+        mad = sorted(abs(v - median) for v in self.window)[self.half]
+        spike = abs(center - median) > max(self.n_sigmas * MAD_SCALE * mad, self.min_deviation)
+        self.counts['spikes'] += spike
+        return (median if spike else center), spike
+
+    def _end_run(self):
+        if self.run_length >= self.flat_samples:
+            self.counts['flat_segments'] += 1
+            self.counts['flat_samples'] += self.run_length
+
+    def update(self, value):
+        """
+        Add one raw reading.
+
+        Returns:
+            None while the first window fills, else (cleaned value, is_spike) of the
+            reading window // 2 samples back.
+        """
+        value = float(value)
+        self.counts['samples'] += 1
+        self.counts['saturated'] += value <= self.adc_range[0] or value >= self.adc_range[1]
+
+        if value == self.last:
+            self.run_length += 1
+        else:
+            self._end_run()
+            self.run_length = 1
+        self.last = value
+
+        if not self.window:
+            # Pad the start with the first value, like clean_ppg
+            for _ in range(self.half):
+                self._push(value)
+        return self._push(value)
+
+    def flush(self):
+        """
+        End of the session: pad with the last value and return the (cleaned, is_spike)
+        of the readings still in the window. The counts are final afterwards.
+        """
+        self._end_run()
+        self.run_length = 0
+        out = []
+        if self.window:
+            last = self.window[-1]
+            for _ in range(self.half):
+                result = self._push(last)
+                if result is not None:
+                    out.append(result)
+        self.window.clear()
+        self.sorted.clear()
+        self.last = None
+        return out
+
+
+def format_counts(counts):
+    """One-line summary of clean_ppg / StreamingPPGCleaner counts (of one channel)."""
+    return (f"{int(counts['samples'])} samples: {int(counts['spikes'])} spikes, {int(counts['saturated'])} saturated, "
+            f"{int(counts['flat_segments'])} flat segments ({int(counts['flat_samples'])} samples)")
+
+
+def save_quality_counts(counts, output_dir):
+    """
+    Write one session's counts to <output_dir>/pulse_quality.csv (a header and one row).
+
+    Returns:
+        Path of the file.
+    """
+    path = os.path.join(output_dir, QUALITY_FILE)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COUNT_FIELDS)
+        writer.writerow([int(counts[field]) for field in COUNT_FIELDS])
+    return path
@@ -0,0 +1,243 @@
+"""
+Frame Preview Module
+
+Shows camera frames in an OpenCV window without slowing the record loop down.
+The record loop only offers frames; the preview keeps at most one pending frame
+and drops the rest, showing every Nth frame and at most `max_fps` frames per second.
+Frames from a FrameBufferPool are held by reference until shown instead of copied.
+
+HighGUI (namedWindow / imshow / waitKey) is only ever called from the main thread,
+which several backends require (Cocoa on macOS, Qt builds). The main thread is the
+display consumer and calls pump_previews() periodically:
+- run_with_previews(fn): when called on the main thread, fn (e.g. the record loop)
+  runs on a worker thread while the main thread pumps the previews until it returns
+- a GUI owning the main thread (GUI.py) pumps from its event loop with after()
+- MultiCameraRecorder pumps while it waits for its camera threads
+"""
+
+import cv2
+import time
+import threading
+import numpy as np
+
+# Previews started and not yet closed, shown by pump_previews()
+_active = []
+_active_lock = threading.Lock()
+_last_poll = 0.0
+
+POLL_INTERVAL_S = 0.05
+
+
+def _on_main_thread():
+    return threading.current_thread() is threading.main_thread()
+
+
+class FramePreview:
+    """
+    Decimated, non-blocking preview window.
+
+    Usage:
+        preview = FramePreview("Camera Preview", every_n=2, max_fps=15)
+        preview.start()
+        ...
+        preview.offer(frame)          # from the record loop, never blocks, never calls HighGUI
+        if preview.stop_requested:    # user closed the window or pressed q / Esc
+            ...
+        preview.stop()
+    """
+
+    def __init__(self, window_name, every_n=1, max_fps=15.0):
+        """
+        Args:
+            window_name: Title of the OpenCV window.
+            every_n: Offer only every Nth frame to the display.
+            max_fps: Upper bound on displayed frames per second (None or 0 for no limit).
+        """
+        self.window_name = window_name
+        self.every_n = max(1, int(every_n))
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+
+        self.stop_requested = False
+        self.shown_frames = 0
+        self.dropped_frames = 0
+
+        self._offered = 0
+        self._last_offer_time = 0.0
+        self._pending = None
+        self._pending_ref = None
+        self._buffer = None
+        self._display = None
+        self._lock = threading.Lock()
+        self._running = False
+        self._window_open = False
+
+    def start(self):
+        """Register the preview; its window opens on the next pump_previews() call."""
+        self._running = True
+        self.stop_requested = False
+        with _active_lock:
+            if self not in _active:
+                _active.append(self)
+
+    def offer(self, frame, buffer=None):
+        """
+        Offer a frame for display. Returns immediately.
+
+        Args:
+            frame: BGR image (copied unless `buffer` is given).
+            buffer: Optional pooled FrameBuffer holding `frame`; the preview retains it
+                    until the frame has been shown instead of copying it.
+
+        Returns:
+            True if the frame was taken for display, False if it was decimated or dropped.
+        """
+        self._offered += 1
+        if not self._running or (self._offered - 1) % self.every_n != 0:
+            return False
+
+        now = time.perf_counter()
+        if now - self._last_offer_time < self.min_interval:
+            return False
+
+        with self._lock:
+            if self._pending is not None:
+                # The main thread has not picked up the previous frame yet
+                self.dropped_frames += 1
+                return False
+            if buffer is not None:
+                self._pending = frame
+                self._pending_ref = buffer.retain()
+            else:
+                if self._buffer is None or self._buffer.shape != frame.shape:
+                    self._buffer = np.empty_like(frame)
+                np.copyto(self._buffer, frame)
+                self._pending = self._buffer
+
+        self._last_offer_time = now
+        return True
+
+    def _show_pending(self):
+        """imshow the pending frame, if any (main thread). Returns whether a frame was shown."""
+        frame, ref = None, None
+        with self._lock:
+            if self._pending is not None:
+                ref = self._pending_ref
+                if ref is not None:
+                    frame = self._pending
+                else:
+                    if self._display is None or self._display.shape != self._pending.shape:
+                        self._display = np.empty_like(self._pending)
+                    np.copyto(self._display, self._pending)
+                    frame = self._display
+                self._pending, self._pending_ref = None, None
+        if frame is not None:
+            # imshow keeps its own copy, so a pooled buffer can be released right after
+            cv2.imshow(self.window_name, frame)
+            self.shown_frames += 1
+        if ref is not None:
+            ref.release()
+        return frame is not None
+
+    def _release_pending(self):
+        with self._lock:
+            if self._pending_ref is not None:
+                self._pending_ref.release()
+            self._pending, self._pending_ref = None, None
+
+    def _close_window(self):
+        """Destroy the window (main thread)."""
+        if self._window_open:
+            cv2.destroyWindow(self.window_name)
+            self._window_open = False
+
+    def stop(self):
+        """
+        Stop taking frames and release a held buffer. The window is closed right away
+        on the main thread, else by the next pump_previews() call.
+        """
+        self._running = False
+        self._release_pending()
+        if _on_main_thread():
+            with _active_lock:
+                if self in _active:
+                    _active.remove(self)
+            self._close_window()
+
+
+def pump_previews():
+    """
+    Show the pending frames of all active previews and handle their window events.
+    Call it periodically from the main thread only. Events are polled after a frame
+    was shown and otherwise at most every POLL_INTERVAL_S.
+
+    Returns:
+        Number of previews still active.
+    """
+    global _last_poll
+    with _active_lock:
+        previews = list(_active)
+        _active[:] = [p for p in previews if p._running]
+
+    shown = False
+    for preview in previews:
+        if not preview._running:
+            preview._close_window()
+            continue
+        if not preview._window_open:
+            cv2.namedWindow(preview.window_name, cv2.WINDOW_NORMAL)
+            preview._window_open = True
+        shown |= preview._show_pending()
+
+    now = time.perf_counter()
+    open_previews = [p for p in previews if p._running and p._window_open]
+    if open_previews and (shown or now - _last_poll >= POLL_INTERVAL_S):
+        _last_poll = now
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q') or key == 27:
+            print("Exit by key")
+            for preview in open_previews:
+                preview.stop_requested = True
+        for preview in open_previews:
+            if preview.shown_frames and cv2.getWindowProperty(preview.window_name, cv2.WND_PROP_VISIBLE) < 1:
+                print("Window closed by user (X).")
+                preview.stop_requested = True
+    return len(open_previews)
+
+
+def run_with_previews(fn, *args, **kwargs):
+    """
+    Call fn so that the previews it starts are shown. On the main thread, fn runs on a
+    worker thread while this thread pumps the previews until fn returns; elsewhere fn is
+    called directly and the main thread's owner pumps (see the module docstring).
+
+    Returns:
+        fn's result (its exception is re-raised).
+    """
+    if not _on_main_thread():
+        return fn(*args, **kwargs)
+
+    outcome = {}
+
+    def worker():
+        try:
+            outcome['result'] = fn(*args, **kwargs)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    while thread.is_alive():
+        try:
+            pump_previews()
+            thread.join(timeout=0.005)
+        except KeyboardInterrupt:
+            # Let the loop finish its recording instead of abandoning the worker
+            print("\nUser interrupted (Ctrl+C), stopping")
+            with _active_lock:
+                for preview in _active:
+                    preview.stop_requested = True
+    pump_previews()     # close the windows of previews stopped on the worker
+
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('result')
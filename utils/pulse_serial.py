@@ -0,0 +1,104 @@
+"""
+Pulse Sensor Serial Module
+
+Serial connection and line parsing for the Arduino pulse sensor, shared by the
+threaded collector (main.py PulseSensorCollector) and the serial process of the
+process runtime (acquisition.py). Imports nothing but pyserial, so the serial
+process starts without the GUI and camera stacks.
+
+Line formats:
+- [COLLECT] TIMESTAMP_REQUEST | 5234 | 512 | 128 | 72      (millis | signal | LED | HR)
+- [SENSOR] Signal: 512 | LED Output: 128 | Package Number: 0%
+- [SYSTEM] PAUSED / STARTED / COLLECTION COMPLETED
+"""
+
+import re
+import time
+import serial
+
+
+def connect(port, baudrate=115200):
+    """
+    Open the serial port and wait for the Arduino reset.
+
+    Returns:
+        The open serial.Serial, or None if the port cannot be opened.
+    """
+    try:
+        ser = serial.Serial(port, baudrate, timeout=1)
+        time.sleep(2)  # Wait for Arduino reset
+        print(f"Connected to {port} (Baudrate: {baudrate})")
+        return ser
+    except serial.SerialException as e:
+        print(f"Serial connection failed: {e}")
+        print(f"Please check if port name is correct")
+        return None
+
+
+def send_command(ser, command):
+    """Send command to Arduino"""
+    if ser and ser.is_open:
+        ser.write(f"{command}\n".encode())
+        print(f"Sent command: {command}")
+    else:
+        print("Serial not connected")
+
+
+def parse_collect_line(line, clock, t_ns=None):
+    """
+    Parse data line during collection
+
+    Parameters:
+        line: Decoded serial line
+        clock: SessionClock the PC timestamp is taken from
+        t_ns: Session clock reading taken when the line was read (default: now)
+
+    Returns:
+        [PC_Timestamp_ms, PC_DateTime, Arduino_millis, Signal_Value, Package_Num, HR]
+        (pulse_data.csv row), or None if the line is not a collection sample.
+    """
+    if t_ns is None:
+        t_ns = clock.now_ns()
+    try:
+        # Format: [COLLECT] TIMESTAMP_REQUEST | 5234 | 512 | 128
+        if "TIMESTAMP_REQUEST" in line:
+            parts = line.split("|")
+            if len(parts) >= 4:
+                arduino_millis = parts[1].strip()
+                signal_value = parts[2].strip()
+                led_output = parts[3].strip()
+                heart_rate = parts[4].strip()
+
+                pc_timestamp_ms = clock.to_wall_ms(t_ns)
+                pc_datetime = clock.to_datetime_str(t_ns)
+
+                return [pc_timestamp_ms, pc_datetime, arduino_millis, signal_value, led_output, heart_rate]
+    except Exception as e:
+        print(f"Parse error: {e}")
+    return None
+
+
+def parse_signal_from_line(line):
+    """
+    Extract signal value from serial data line for real-time monitoring.
+
+    Supported formats:
+    - [COLLECT] TIMESTAMP_REQUEST | 5234 | 512 | 128
+    - [SENSOR] Signal: 512 | LED Output: 128 | Package Number: 0%
+    """
+    try:
+        if "[COLLECT]" in line and "TIMESTAMP_REQUEST" in line:
+            parts = line.split("|")
+            if len(parts) >= 3:
+                signal = int(parts[2].strip())
+                return signal
+
+        elif "[SENSOR]" in line:
+            match = re.search(r'Signal:\s*(\d+)', line)
+            if match:
+                return int(match.group(1))
+
+    except Exception:
+        pass
+
+    return None
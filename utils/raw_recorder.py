@@ -0,0 +1,188 @@
+"""
+Raw Frame Recording Module
+
+For short high-fps recordings, where even fast image encoding cannot keep up.
+Frames are written uncompressed, in capture order, into one preallocated
+memory-mapped .npy file sized from the resolution and the maximum frame count,
+so recording a frame costs a single memcpy (or nothing, when the camera reads
+straight into the next slot). Per-frame timestamps go into a second .npy file
+and a small JSON header describes the recording.
+
+Layout of a raw recording folder:
+    raw_header.json        shape, dtype, frame count, fps, clock anchor
+    frames.npy             (capacity, H, W, 3) uint8 BGR, only the first frame_count are valid
+    frame_timestamps.npy   structured (frame_number, timestamp_ms, grab_ns) per frame
+
+RawRecording opens such a folder for random frame access through the memmap;
+raw_converter.py turns it into PNGs, a video or ROI traces afterwards.
+"""
+
+import os
+import json
+import numpy as np
+from datetime import datetime
+from typing import Optional
+
+HEADER_FILE = "raw_header.json"
+FRAMES_FILE = "frames.npy"
+TIMESTAMPS_FILE = "frame_timestamps.npy"
+
+TIMESTAMP_DTYPE = np.dtype([('frame_number', '<i4'), ('timestamp_ms', '<i8'), ('grab_ns', '<i8')])
+
+
+def save_frame_timestamps(output_dir, frame_numbers, grab_ns, clock):
+    """
+    Write frame_timestamps.npy (frame_number, timestamp_ms, grab_ns per frame) for
+    recordings that store images, so every recording can be aligned on grab_ns.
+
+    Args:
+        output_dir: Recording folder.
+        frame_numbers: (N,) frame numbers as logged in geometric_data.csv.
+        grab_ns: (N,) grab times on the session clock.
+        clock: SessionClock the grab times were taken on.
+    """
+    timestamps = np.zeros(len(grab_ns), dtype=TIMESTAMP_DTYPE)
+    timestamps['frame_number'] = frame_numbers
+    timestamps['grab_ns'] = grab_ns
+    timestamps['timestamp_ms'] = clock.to_wall_ms(np.asarray(grab_ns, dtype=np.int64))
+    np.save(os.path.join(output_dir, TIMESTAMPS_FILE), timestamps)
+    return timestamps
+
+
+class RawFrameRecorder:
+    """
+    Sequential writer of raw frames into a preallocated memory-mapped file.
+
+    Usage:
+        recorder = RawFrameRecorder(output_dir, shape=(720, 1280, 3), capacity=2501, fps=50)
+        ret, frame = cap.read(image=recorder.slot())   # read in place into the next slot
+        recorder.write(frame, frame_number, ts_ms, grab_ns)
+        recorder.close()
+    """
+
+    def __init__(self, output_dir, shape, capacity, fps=None, dtype=np.uint8, clock=None):
+        """
+        Args:
+            output_dir: Folder for the raw files (created if needed).
+            shape: Frame shape, e.g. (height, width, 3).
+            capacity: Maximum number of frames (the file is preallocated for all of them).
+            fps: Nominal frame rate, stored in the header.
+            dtype: Frame dtype.
+            clock: Optional SessionClock; its anchor is stored in the header.
+        """
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.shape = tuple(int(s) for s in shape)
+        self.capacity = int(capacity)
+        self.fps = fps
+        self.count = 0
+
+        self.frames = np.lib.format.open_memmap(os.path.join(output_dir, FRAMES_FILE), mode='w+',
+                                                dtype=dtype, shape=(self.capacity,) + self.shape)
+        self.timestamps = np.lib.format.open_memmap(os.path.join(output_dir, TIMESTAMPS_FILE), mode='w+',
+                                                    dtype=TIMESTAMP_DTYPE, shape=(self.capacity,))
+        self.header = {
+            'format': 'raw-frames-v1',
+            'shape': list(self.shape),
+            'dtype': np.dtype(dtype).str,
+            'color': 'BGR',
+            'capacity': self.capacity,
+            'frame_count': 0,
+            'fps': fps,
+            'created': datetime.now().isoformat(timespec='seconds'),
+        }
+        if clock is not None:
+            self.header['clock_anchor_wall_ns'] = clock.anchor_wall_ns
+            self.header['clock_anchor_mono_ns'] = clock.anchor_mono_ns
+        self._write_header()
+
+        print(f"Raw recorder: {self.capacity} x {self.shape} preallocated "
+              f"({self.frames.nbytes / 1e6:.0f} MB) in {output_dir}")
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def slot(self) -> Optional[np.ndarray]:
+        """The next free frame slot (a view into the memmap), or None when full."""
+        if self.full:
+            return None
+        return self.frames[self.count]
+
+    def write(self, frame, frame_number, timestamp_ms, grab_ns=0) -> bool:
+        """
+        Commit a frame to the next slot. If `frame` was read into slot() already,
+        nothing is copied.
+
+        Returns:
+            False if the recording is full.
+        """
+        if self.full:
+            return False
+        target = self.frames[self.count]
+        if not np.may_share_memory(frame, target):
+            target[...] = frame
+        self.timestamps[self.count] = (frame_number, timestamp_ms, grab_ns)
+        self.count += 1
+        return True
+
+    def _write_header(self):
+        with open(os.path.join(self.output_dir, HEADER_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.header, f, indent=2)
+
+    def close(self):
+        """Flush the memmaps and write the final frame count into the header."""
+        if self.frames is None:
+            return
+        self.frames.flush()
+        self.timestamps.flush()
+        self.header['frame_count'] = self.count
+        self._write_header()
+        self.frames = None
+        self.timestamps = None
+        print(f"Raw recording closed: {self.count}/{self.capacity} frames")
+
+
+class RawRecording:
+    """
+    Read-only random access to a raw recording folder.
+
+    Usage:
+        rec = RawRecording("./data/video/<folder>")
+        frame = rec[120]                 # memmapped view, no copy
+        ts = rec.timestamp_ms            # (N,) int64
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, HEADER_FILE), 'r', encoding='utf-8') as f:
+            self.header = json.load(f)
+        count = int(self.header['frame_count'])
+        self.frames = np.load(os.path.join(folder, FRAMES_FILE), mmap_mode='r')[:count]
+        self.timestamps = np.load(os.path.join(folder, TIMESTAMPS_FILE), mmap_mode='r')[:count]
+
+    @staticmethod
+    def is_raw_recording(folder) -> bool:
+        return os.path.isfile(os.path.join(folder, HEADER_FILE))
+
+    @property
+    def shape(self):
+        return tuple(self.header['shape'])
+
+    @property
+    def fps(self):
+        return self.header.get('fps')
+
+    @property
+    def frame_number(self) -> np.ndarray:
+        return self.timestamps['frame_number']
+
+    @property
+    def timestamp_ms(self) -> np.ndarray:
+        return self.timestamps['timestamp_ms']
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
@@ -0,0 +1,171 @@
+"""
+Dataset Report Aggregator Module
+
+Dataset-wide statistics of the per-session PPG results, built in one streaming pass:
+every session is added as soon as it is analyzed and only running statistics are
+kept, never the sessions' samples.
+
+For every metric and every group the aggregator keeps a Welford running mean /
+variance with min / max, and a fixed-bin histogram for the distribution. Groups are
+the whole dataset ('all') plus every value of every test-condition field of the
+session (camera, distance, illumination, motion, angle; see
+utils.session.parse_session_name) and the full condition combination.
+
+Usage:
+    aggregator = ReportAggregator()
+    aggregator.add_session(session_metadata)           # once per session
+    aggregator.add(session_metadata, {'SQI_final': 0.8, 'window_hr_bpm': hr_array})
+    aggregator.save("./data/ppg_reports")
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+SUMMARY_FILE = "dataset_summary.csv"
+DISTRIBUTIONS_FILE = "dataset_distributions.csv"
+GROUP_FIELDS = ('camera', 'distance_m', 'illumination_lux', 'motion', 'angle_deg')
+
+# Histogram range and bin count per metric; values outside are counted in the end bins
+HISTOGRAM_BINS = {
+    'SQI_final': (0.0, 1.0, 20),
+    'Beats': (0.0, 1000.0, 50),
+    'HR_peak_Hz': (0.5, 4.0, 35),
+    'HR_beats_bpm': (40.0, 200.0, 32),
+    'SDNN_ms': (0.0, 300.0, 30),
+    'RMSSD_ms': (0.0, 300.0, 30),
+    'pNN50': (0.0, 100.0, 20),
+    'LF_HF': (0.0, 10.0, 20),
+    'window_hr_bpm': (40.0, 200.0, 32),
+    'window_rmssd_ms': (0.0, 300.0, 30),
+    'SQI_window_mean': (0.0, 1.0, 20),
+    'Motion_skipped': (0.0, 1.0, 20),
+    'window_sqi': (0.0, 1.0, 20),
+    'Spikes': (0.0, 500.0, 50),
+    'Saturated': (0.0, 5000.0, 50),
+    'Flat_segments': (0.0, 50.0, 50),
+    'Flat_samples': (0.0, 5000.0, 50),
+}
+DEFAULT_BINS = (0.0, 1.0, 20)
+
+
+class RunningStats:
+    """Count, mean, variance (Welford / Chan), min, max and a fixed-bin histogram of a stream of values."""
+
+    def __init__(self, low=0.0, high=1.0, bins=20):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def update(self, values):
+        """Add one value or an array of values (NaNs are ignored)."""
+        x = np.asarray(values, dtype=float).ravel()
+        x = x[np.isfinite(x)]
+        if x.size == 0:
+            return
+        # Chan et al.: combine the batch's mean / M2 with the running ones
+        n_b, mean_b = x.size, x.mean()
+        m2_b = ((x - mean_b) ** 2).sum()
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta ** 2 * self.n * n_b / n
+        self.n = n
+        self.min = min(self.min, x.min())
+        self.max = max(self.max, x.max())
+        self.counts += np.histogram(np.clip(x, self.edges[0], self.edges[-1]), bins=self.edges)[0]
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else np.nan
+
+    def quantile(self, q):
+        """Approximate quantile from the histogram (linear within the bin, kept within min / max)."""
+        if self.n == 0:
+            return np.nan
+        cum = np.cumsum(self.counts)
+        i = int(np.searchsorted(cum, q * self.n))
+        i = min(i, len(self.counts) - 1)
+        before = cum[i - 1] if i > 0 else 0
+        frac = (q * self.n - before) / self.counts[i] if self.counts[i] else 0.0
+        return float(np.clip(self.edges[i] + frac * (self.edges[i + 1] - self.edges[i]), self.min, self.max))
+
+
+class ReportAggregator:
+    """Running statistics per metric and metadata group; see the module docstring."""
+
+    def __init__(self, group_fields=GROUP_FIELDS, histogram_bins=None):
+        """
+        Args:
+            group_fields: Metadata fields to group by (each on its own and all together).
+            histogram_bins: {metric: (low, high, bins)} overriding HISTOGRAM_BINS.
+        """
+        self.group_fields = tuple(group_fields)
+        self.histogram_bins = {**HISTOGRAM_BINS, **(histogram_bins or {})}
+        self.stats = {}        # (group, value, metric) -> RunningStats
+        self.sessions = {}     # (group, value) -> sessions added
+
+    def _groups(self, metadata):
+        yield 'all', 'all'
+        if not metadata:
+            yield 'condition', 'unknown'
+            return
+        for field in self.group_fields:
+            yield field, metadata.get(field, 'unknown')
+        yield 'condition', "_".join(str(metadata.get(field, '?')) for field in self.group_fields)
+
+    def add_session(self, metadata):
+        """Count one session in its groups (call once per session, however often add is called for it)."""
+        for group in self._groups(metadata):
+            self.sessions[group] = self.sessions.get(group, 0) + 1
+
+    def add(self, metadata, values):
+        """
+        Add results of one session (or one channel of it; may be called several times per session).
+
+        Args:
+            metadata: Test condition of the session (Session.metadata), {} if unknown.
+            values: {metric: scalar or array}, e.g. the PPG_SQIs.csv row and per-window HRV values.
+        """
+        for group in self._groups(metadata):
+            for metric, value in values.items():
+                key = group + (metric,)
+                if key not in self.stats:
+                    self.stats[key] = RunningStats(*self.histogram_bins.get(metric, DEFAULT_BINS))
+                self.stats[key].update(value)
+
+    def summary(self):
+        """One row per group and metric: sessions, n, mean, std, min, median, p5, p95, max."""
+        rows = []
+        for (group, value, metric), st in sorted(self.stats.items(), key=lambda kv: tuple(map(str, kv[0]))):
+            rows.append({
+                'group': group, 'value': value, 'metric': metric,
+                'sessions': self.sessions.get((group, value), 0), 'n': st.n,
+                'mean': st.mean if st.n else np.nan, 'std': st.std,
+                'min': st.min if st.n else np.nan,
+                'p5': st.quantile(0.05), 'median': st.quantile(0.5), 'p95': st.quantile(0.95),
+                'max': st.max if st.n else np.nan,
+            })
+        return pd.DataFrame(rows)
+
+    def distributions(self):
+        """Histogram counts: one row per group, metric and bin."""
+        frames = []
+        for (group, value, metric), st in self.stats.items():
+            frames.append(pd.DataFrame({
+                'group': group, 'value': value, 'metric': metric,
+                'bin_low': st.edges[:-1], 'bin_high': st.edges[1:], 'count': st.counts,
+            }))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def save(self, out_dir):
+        """Write dataset_summary.csv and dataset_distributions.csv. Returns the summary table."""
+        os.makedirs(out_dir, exist_ok=True)
+        summary = self.summary()
+        summary.to_csv(os.path.join(out_dir, SUMMARY_FILE), index=False, encoding="utf-8-sig")
+        self.distributions().to_csv(os.path.join(out_dir, DISTRIBUTIONS_FILE), index=False, encoding="utf-8-sig")
+        return summary
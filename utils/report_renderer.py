@@ -0,0 +1,238 @@
+"""
+PPG Report Renderer Module
+
+Renders the PPG report figures off the analysis path:
+
+- Agg canvases only (no pyplot, no windows, nothing blocks on plt.show())
+- one figure per plot kind per worker, cleared and redrawn for every report
+- configurable DPI and format: 'png', 'svg' or compact 'webp'
+- a worker pool (processes by default: Agg rasterization holds the GIL), so the
+  numeric analysis only pays for handing the plot data over
+- a small PNG thumbnail per figure and an index.html over all report folders
+
+Usage:
+    renderer = ReportRenderer(fmt='webp', dpi=150, workers=2)
+    renderer.ppg_channel(sqi_result, 0, save_dir, ch=0)   # returns immediately
+    ...
+    renderer.close()                                      # wait for all figures
+    write_report_index("./data/ppg_reports")
+"""
+
+import os
+import html
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+FORMATS = ('png', 'svg', 'webp')
+THUMB_DIR = "thumbs"
+INDEX_FILE = "index.html"
+SQI_FILE = "PPG_SQIs.csv"
+
+_local = threading.local()
+
+
+# ===== Worker side =====
+
+def _figure(kind, size):
+    """This worker's figure for a plot kind, cleared for reuse."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figures = getattr(_local, 'figures', None)
+    if figures is None:
+        figures = _local.figures = {}
+    if kind not in figures:
+        fig = Figure(figsize=size)
+        FigureCanvasAgg(fig)
+        figures[kind] = (fig, fig.add_subplot())
+    fig, ax = figures[kind]
+    ax.cla()
+    return fig, ax
+
+
+def _save(fig, path, fmt, dpi, thumb_path, thumb_dpi):
+    fig.tight_layout()
+    options = {'pil_kwargs': {'quality': 80}} if fmt == 'webp' else {}
+    fig.savefig(path, format=fmt, dpi=dpi, **options)
+    if thumb_path is not None:
+        fig.savefig(thumb_path, format='png', dpi=thumb_dpi)
+    return path
+
+
+def render_time_domain(path, ppg, fs, title, fmt='png', dpi=150, thumb_path=None, thumb_dpi=30):
+    """Draw a PPG time series (as paint_ppg_time_domain) and save it to path."""
+    fig, ax = _figure('time', (10, 4))
+    t = np.arange(len(ppg)) / float(fs)
+    ax.plot(t, ppg, lw=2, label="PPG")
+    ax.set_xlabel("Time [s]")
+    ax.set_ylabel("PPG [a.u.]")
+    ax.set_title(title)
+    if len(t) > 0:
+        ax.set_xlim(t[0], t[-1])
+    ax.legend()
+    return _save(fig, path, fmt, dpi, thumb_path, thumb_dpi)
+
+
+def render_spectrum(path, f, Pxx, hr_band, f_hr=None, fmt='png', dpi=150, thumb_path=None, thumb_dpi=30):
+    """Draw a PPG spectrum (as paint_ppg_spectrum_freq_domain) and save it to path."""
+    fig, ax = _figure('spectrum', (10, 5))
+    ax.plot(f, Pxx, lw=2, label="PPG spectrum")
+    ax.axvspan(hr_band[0], hr_band[1], color='orange', alpha=0.3, label="HR band")
+    if f_hr is not None:
+        ax.axvline(f_hr, color='red', linestyle='--', label=f'Peak: {f_hr:.2f} Hz')
+        ax.set_xlabel(f"Frequency [Hz], HR = {f_hr * 60:.1f} bpm")
+    else:
+        ax.set_xlabel("Frequency [Hz]")
+    ax.set_ylabel("PSD [a.u./Hz]")
+    ax.set_title("PPG Frequency Spectrum")
+    ax.set_xlim(0, 10)  # Effective PPG bandwidth is usually < 10 Hz
+    ax.legend()
+    return _save(fig, path, fmt, dpi, thumb_path, thumb_dpi)
+
+
+# ===== Caller side =====
+
+class ReportRenderer:
+    """Submits report figures to a worker pool; see the module docstring."""
+
+    def __init__(self, fmt='png', dpi=150, workers=2, executor='process', thumbnails=True, thumb_dpi=30):
+        """
+        Args:
+            fmt: 'png', 'svg' or 'webp'.
+            dpi: Resolution of the saved figures (ignored by svg).
+            workers: Rendering threads / processes.
+            executor: 'process' or 'thread'.
+            thumbnails: Also save a small PNG per figure into thumbs/ for the HTML index.
+            thumb_dpi: Resolution of the thumbnails.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown figure format: {fmt}, expected one of {FORMATS}")
+        self.fmt = fmt
+        self.dpi = dpi
+        self.thumbnails = thumbnails
+        self.thumb_dpi = thumb_dpi
+        pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+        self.pool = pool_class(max_workers=max(1, workers))
+        self.futures = []
+        self.saved = []
+        self.failed = 0
+
+    def _paths(self, save_dir, stem):
+        os.makedirs(save_dir, exist_ok=True)
+        thumb_path = None
+        if self.thumbnails:
+            os.makedirs(os.path.join(save_dir, THUMB_DIR), exist_ok=True)
+            thumb_path = os.path.join(save_dir, THUMB_DIR, stem + ".png")
+        return os.path.join(save_dir, f"{stem}.{self.fmt}"), thumb_path
+
+    def _submit(self, fn, *args, save_dir, stem):
+        path, thumb_path = self._paths(save_dir, stem)
+        future = self.pool.submit(fn, path, *args, fmt=self.fmt, dpi=self.dpi,
+                                  thumb_path=thumb_path, thumb_dpi=self.thumb_dpi)
+        self.futures.append(future)
+        return future
+
+    def time_domain(self, ppg, fs, save_dir, stem, title, max_time=15):
+        """Queue a time-domain figure (only the first max_time seconds are sent to the worker)."""
+        ppg = np.asarray(ppg, dtype=float)
+        if max_time is not None:
+            ppg = ppg[:int(max_time * fs) + 1]
+        return self._submit(render_time_domain, ppg, fs, title, save_dir=save_dir, stem=stem)
+
+    def spectrum(self, f, Pxx, save_dir, stem, hr_band, f_hr=None):
+        """Queue a spectrum figure."""
+        f = np.asarray(f)
+        keep = f <= 10.0
+        return self._submit(render_spectrum, f[keep], np.asarray(Pxx)[keep], hr_band, f_hr,
+                            save_dir=save_dir, stem=stem)
+
+    def ppg_channel(self, result, i, save_dir, ch, hr_band=None, max_time=15):
+        """
+        Queue the spectrum and time-domain figures of channel i of a compute_ppg_sqi_batch result
+        (PPG_Spectrum_channel<ch> / PPG_Time_Domain_channel<ch>).
+        """
+        from utils.evaluate_ppg import HR_BAND
+        f_hr = float(result['f_hr'][i]) if result['f_hr'][i] > 0 else None
+        sqi = float(result['sqi'][i])
+        title = f"PPG Time Series (SQI = {sqi:.3f}), whose channel is {ch}"
+        return [
+            self.spectrum(result['f'], result['Pxx'][i], save_dir, f"PPG_Spectrum_channel{ch}",
+                          hr_band or HR_BAND, f_hr),
+            self.time_domain(result['ppg_filt'][i], result['fs'], save_dir, f"PPG_Time_Domain_channel{ch}",
+                             title, max_time),
+        ]
+
+    def wait(self):
+        """Wait for all queued figures. Returns the paths saved so far."""
+        futures, self.futures = self.futures, []
+        for future in futures:
+            try:
+                self.saved.append(future.result())
+            except Exception as e:
+                self.failed += 1
+                print(f"[Report] figure failed: {e}")
+        return self.saved
+
+    def close(self):
+        self.wait()
+        self.pool.shutdown()
+        print(f"[Report] {len(self.saved)} figures saved ({self.fmt}, {self.dpi} dpi)"
+              + (f", {self.failed} failed" if self.failed else ""))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _sqi_table(folder):
+    path = os.path.join(folder, SQI_FILE)
+    if not os.path.exists(path):
+        return ""
+    df = pd.read_csv(path, encoding="utf-8-sig")
+    columns = [c for c in ('ch', 'SQI_final', 'HR_peak_Hz', 'HR_beats_bpm', 'SDNN_ms', 'RMSSD_ms', 'LF_HF')
+               if c in df.columns]
+    df = df[columns]
+    if 'HR_peak_Hz' in df.columns:
+        df = df.assign(HR_peak_Hz=df['HR_peak_Hz'] * 60.0).rename(columns={'HR_peak_Hz': 'HR_spectral_bpm'})
+    return df.to_html(index=False, float_format=lambda v: f"{v:.3f}", border=0, classes="sqi", na_rep="")
+
+
+def write_report_index(report_root="./data/ppg_reports", title="PPG reports"):
+    """
+    Write <report_root>/index.html: one section per report folder with its SQI / HRV
+    table and the figure thumbnails, each linking to the full-size figure.
+
+    Returns:
+        Path of the index file.
+    """
+    sections = []
+    for folder in sorted(d for d in os.listdir(report_root) if os.path.isdir(os.path.join(report_root, d))):
+        path = os.path.join(report_root, folder)
+        thumb_dir = os.path.join(path, THUMB_DIR)
+        thumbs = sorted(os.listdir(thumb_dir)) if os.path.isdir(thumb_dir) else []
+        figures = {os.path.splitext(f)[0]: f for f in os.listdir(path)
+                   if os.path.splitext(f)[1].lstrip('.') in FORMATS}
+        items = []
+        for thumb in thumbs:
+            stem = os.path.splitext(thumb)[0]
+            target = f"{folder}/{figures.get(stem, f'{THUMB_DIR}/{thumb}')}"
+            items.append(f'<a href="{html.escape(target)}"><img src="{html.escape(f"{folder}/{THUMB_DIR}/{thumb}")}" '
+                         f'title="{html.escape(stem)}" loading="lazy"></a>')
+        table = _sqi_table(path)
+        if not items and not table:
+            continue
+        sections.append(f'<section><h2>{html.escape(folder)}</h2>{table}<div>{"".join(items)}</div></section>')
+
+    page = (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title><style>'
+            'body{font-family:sans-serif;margin:1em}section{border-bottom:1px solid #ccc;padding:.5em 0}'
+            'img{height:120px;margin:2px;border:1px solid #ddd}table.sqi{border-collapse:collapse;font-size:90%}'
+            'table.sqi td,table.sqi th{padding:2px 8px;text-align:right}</style></head><body>'
+            f'<h1>{html.escape(title)}</h1><p>{len(sections)} sessions</p>{"".join(sections)}</body></html>')
+    index_path = os.path.join(report_root, INDEX_FILE)
+    with open(index_path, 'w', encoding='utf-8') as f:
+        f.write(page)
+    return index_path
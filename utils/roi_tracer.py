@@ -0,0 +1,188 @@
+"""
+Face ROI Trace Module
+
+This module extracts per-frame RGB statistics (mean and variance of R, G, B) over
+several landmark-defined skin regions, so that rPPG analyses can work on compact
+traces instead of the saved full frames.
+It reuses the Face Mesh landmarks already computed in the record loop and writes
+one row per logged frame, aligned with geometric_data.csv.
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from utils.pixel_counter import FacePixelCounter
+
+
+class FaceROITracer:
+    """
+    Extract mean / variance of R, G, B over landmark-defined ROIs.
+
+    Steps:
+    1. Convert the needed Face Mesh landmarks to pixel coordinates.
+    2. Build each ROI as the convex hull of its landmarks and rasterize it into
+       a reused scratch mask restricted to the ROI's bounding box.
+    3. Compute per-channel mean / standard deviation inside the mask.
+    4. Append the values to a preallocated record array, saved as one .npy file.
+    """
+
+    # MediaPipe Face Mesh landmark indices of each ROI (the convex hull is used)
+    ROI_INDICES = {
+        'forehead': [10, 338, 297, 332, 333, 334, 296, 336, 9, 107, 66, 105, 104, 103, 67, 109],
+        'left_cheek': [347, 348, 329, 355, 429, 279, 358, 423, 425, 280, 352, 345, 346],
+        'right_cheek': [118, 119, 100, 126, 209, 49, 129, 203, 205, 50, 123, 116, 117],
+        'face_oval': FacePixelCounter.FACE_OVAL_INDICES,
+    }
+
+    def __init__(self, roi_names=None, capacity=3000):
+        """
+        Initialize the ROI tracer.
+
+        Args:
+            roi_names: ROIs to extract (keys of ROI_INDICES). Defaults to all of them.
+            capacity: Initial number of rows to preallocate; grows if exceeded.
+        """
+        self.roi_names = list(roi_names) if roi_names is not None else list(self.ROI_INDICES)
+        self.dtype = self.record_dtype(self.roi_names)
+
+        # Landmark indices needed by all ROIs, and each ROI's positions within them
+        all_indices = sorted({i for name in self.roi_names for i in self.ROI_INDICES[name]})
+        self._landmark_indices = np.array(all_indices, dtype=np.int32)
+        position = {idx: k for k, idx in enumerate(all_indices)}
+        self._roi_positions = [np.array([position[i] for i in self.ROI_INDICES[name]], dtype=np.int32)
+                               for name in self.roi_names]
+
+        # Scratch mask reused across frames and ROIs
+        self._mask_buffer = np.zeros((0, 0), dtype=np.uint8)
+
+        self.records = np.zeros(capacity, dtype=self.dtype)
+        self.count = 0
+
+    @staticmethod
+    def record_dtype(roi_names) -> np.dtype:
+        """Structured dtype of one trace row: frame number, timestamp, then per-ROI stats (RGB order)."""
+        fields = [('frame_number', np.int32), ('timestamp_ms', np.int64)]
+        for name in roi_names:
+            fields += [(f'{name}_mean', np.float32, (3,)),
+                       (f'{name}_var', np.float32, (3,)),
+                       (f'{name}_pixels', np.int32)]
+        return np.dtype(fields)
+
+    def reset(self, capacity=None):
+        """Start a new recording, optionally resizing the preallocated rows."""
+        if capacity is not None and capacity != len(self.records):
+            self.records = np.zeros(capacity, dtype=self.dtype)
+        self.count = 0
+
+    def _landmark_points(self, face_landmarks, w: int, h: int) -> Optional[np.ndarray]:
+        """Return (N, 2) int32 pixel coordinates of the landmarks needed by the ROIs."""
+        landmarks = face_landmarks.landmark
+        if self._landmark_indices[-1] >= len(landmarks):
+            return None
+
+        coords = np.array([(landmarks[i].x, landmarks[i].y) for i in self._landmark_indices],
+                          dtype=np.float32)
+        points = (coords * (w, h)).astype(np.int32)
+        np.clip(points[:, 0], 0, w - 1, out=points[:, 0])
+        np.clip(points[:, 1], 0, h - 1, out=points[:, 1])
+        return points
+
+    def _roi_stats(self, frame: np.ndarray,
+                   points: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], int]:
+        """Mean, variance (both BGR) and pixel count of the convex hull of `points`."""
+        hull = cv2.convexHull(points)
+        x, y, box_w, box_h = cv2.boundingRect(hull)
+
+        buf_h, buf_w = self._mask_buffer.shape
+        if box_h > buf_h or box_w > buf_w:
+            self._mask_buffer = np.zeros((max(box_h, buf_h), max(box_w, buf_w)), dtype=np.uint8)
+
+        local_mask = self._mask_buffer[:box_h, :box_w]
+        local_mask.fill(0)
+        cv2.fillConvexPoly(local_mask, hull - (x, y), 255)
+
+        pixels = cv2.countNonZero(local_mask)
+        if pixels == 0:
+            return None, None, 0
+
+        mean, std = cv2.meanStdDev(frame[y:y + box_h, x:x + box_w], mask=local_mask)
+        return mean[:3, 0], std[:3, 0] ** 2, pixels
+
+    def extract(self, frame: np.ndarray, frame_number: int, timestamp_ms: int,
+                face_landmarks=None) -> np.void:
+        """
+        Append one trace row for the given frame.
+
+        A row is always written so that the trace file stays aligned with
+        geometric_data.csv; ROI statistics are NaN when no face is available.
+
+        Args:
+            frame: Input image frame (BGR).
+            frame_number: Frame index as logged in geometric_data.csv.
+            timestamp_ms: Timestamp in milliseconds as logged in geometric_data.csv.
+            face_landmarks: Face Mesh landmarks of this frame, or None if no face.
+
+        Returns:
+            The written row (a numpy structured record).
+        """
+        if self.count >= len(self.records):
+            grown = np.zeros(max(1, 2 * len(self.records)), dtype=self.dtype)
+            grown[:self.count] = self.records[:self.count]
+            self.records = grown
+
+        row = self.records[self.count]
+        row['frame_number'] = frame_number
+        row['timestamp_ms'] = timestamp_ms
+
+        h, w = frame.shape[:2]
+        points = self._landmark_points(face_landmarks, w, h) if face_landmarks is not None else None
+
+        for name, positions in zip(self.roi_names, self._roi_positions):
+            mean = var = None
+            pixels = 0
+            if points is not None:
+                mean, var, pixels = self._roi_stats(frame, points[positions])
+
+            if mean is None:
+                row[f'{name}_mean'] = np.nan
+                row[f'{name}_var'] = np.nan
+            else:
+                # OpenCV frames are BGR, traces are stored as RGB
+                row[f'{name}_mean'] = mean[::-1]
+                row[f'{name}_var'] = var[::-1]
+            row[f'{name}_pixels'] = pixels
+
+        self.count += 1
+        return row
+
+    def save(self, file_path: str):
+        """Save the recorded rows as a .npy structured array (memory-mappable)."""
+        np.save(file_path, self.records[:self.count])
+        print(f"ROI traces saved: {file_path} ({self.count} frames, "
+              f"{self.count * self.dtype.itemsize / 1024:.1f} KB)")
+
+
+def load_roi_traces(file_path: str, mmap_mode: Optional[str] = 'r') -> Dict:
+    """
+    Load a roi_traces.npy file written by FaceROITracer.
+
+    Args:
+        file_path: Path of the .npy file.
+        mmap_mode: Passed to np.load; 'r' maps the file instead of reading it.
+
+    Returns:
+        dict with 'frame_number' (N,), 'timestamp_ms' (N,), 'roi_names',
+        'mean' and 'var' (N, ROIs, 3) in RGB order, and 'pixels' (N, ROIs).
+    """
+    records = np.load(file_path, mmap_mode=mmap_mode)
+    roi_names = [name[:-len('_mean')] for name in records.dtype.names if name.endswith('_mean')]
+
+    return {
+        'frame_number': records['frame_number'],
+        'timestamp_ms': records['timestamp_ms'],
+        'roi_names': roi_names,
+        'mean': np.stack([records[f'{name}_mean'] for name in roi_names], axis=1),
+        'var': np.stack([records[f'{name}_var'] for name in roi_names], axis=1),
+        'pixels': np.stack([records[f'{name}_pixels'] for name in roi_names], axis=1),
+    }
@@ -0,0 +1,319 @@
+"""
+rPPG Algorithm Module
+
+Remote-PPG pulse extraction from per-frame RGB traces (see utils/roi_tracer.py).
+Every algorithm runs on all overlapping windows and all ROIs at once as batched
+NumPy operations, and the window outputs are recombined with Hann overlap-add.
+
+Algorithms:
+- GREEN: normalized green channel (Verkruysse et al., 2008)
+- CHROM: chrominance projection (de Haan & Jeanne, 2013)
+- POS:   plane-orthogonal-to-skin projection (Wang et al., 2017)
+- ICA:   FastICA on the normalized RGB traces (Poh et al., 2010)
+
+Traces have shape (N frames, ROIs, 3) in RGB order. Pulse signals have shape (N, ROIs).
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import welch
+
+from utils.evaluate_ppg import HR_BAND, BP_BAND
+from utils.dsp import bandpass_plan
+from utils.motion import skipped_windows
+
+# Default analysis window (seconds) per algorithm; ICA needs longer windows to separate sources
+DEFAULT_WINDOW_S = {
+    'GREEN': 1.6,
+    'CHROM': 1.6,
+    'POS': 1.6,
+    'ICA': 10.0,
+}
+
+
+# ---------- Helpers ----------
+
+def fill_missing(traces):
+    """
+    Linearly interpolate NaN frames (face not detected) in each ROI/channel.
+
+    Returns:
+        (filled traces as float64, valid mask of shape (N, ROIs))
+    """
+    x = np.array(traces, dtype=float)
+    n = x.shape[0]
+    flat = x.reshape(n, -1)
+    valid = np.isfinite(flat)
+    t = np.arange(n)
+
+    for col in np.flatnonzero(~valid.all(axis=0)):
+        ok = valid[:, col]
+        flat[:, col] = np.interp(t, t[ok], flat[ok, col]) if ok.any() else 0.0
+
+    return flat.reshape(x.shape), valid.reshape(x.shape).all(axis=-1)
+
+
+def window_traces(traces, win, step):
+    """
+    View the traces as overlapping windows. When the last hop does not reach the end,
+    one more window ending at the last frame is added, so every frame is covered (the
+    windows are then copied instead of viewed).
+
+    Args:
+        traces: (N, ROIs, 3) array.
+        win: Window length in frames (<= N).
+        step: Hop between windows in frames.
+
+    Returns:
+        (windows of shape (W, ROIs, 3, win), window start indices (W,))
+    """
+    view = sliding_window_view(traces, win, axis=0)
+    starts = np.arange(0, view.shape[0], step)
+    if starts[-1] != view.shape[0] - 1:
+        starts = np.append(starts, view.shape[0] - 1)
+        return view[starts], starts
+    return view[::step], starts
+
+
+def overlap_add(segments, starts, n):
+    """
+    Hann-weighted overlap-add of per-window segments back to a continuous signal.
+
+    Args:
+        segments: (W, ROIs, win) window outputs.
+        starts: (W,) window start indices.
+        n: Output length.
+
+    Returns:
+        (n, ROIs) signal, normalized by the summed window weight.
+    """
+    n_win, n_roi, win = segments.shape
+    taper = np.hanning(win + 2)[1:-1]
+
+    # Flat output index of every (window, roi, sample), laid out as out[frame, roi]
+    frames = starts[:, None, None] + np.arange(win)[None, None, :]
+    index = (frames * n_roi + np.arange(n_roi)[None, :, None]).ravel()
+
+    out = np.bincount(index, weights=(segments * taper).ravel(), minlength=n * n_roi)
+    weight = np.bincount((starts[:, None] + np.arange(win)).ravel(),
+                         weights=np.broadcast_to(taper, (n_win, win)).ravel(), minlength=n)
+
+    out = out.reshape(n, n_roi)
+    return np.divide(out, weight[:, None], out=np.zeros_like(out), where=weight[:, None] > 0)
+
+
+def _bandpass(fs, band=BP_BAND, order=4):
+    return bandpass_plan(float(fs), tuple(band), order)
+
+
+def _temporal_normalize(windows):
+    """Divide each window by its temporal mean (removes the DC skin tone / illumination level)."""
+    mean = windows.mean(axis=-1, keepdims=True)
+    return windows / np.where(np.abs(mean) > 1e-9, mean, 1.0)
+
+
+def _std_ratio(a, b):
+    sb = b.std(axis=-1, keepdims=True)
+    return a.std(axis=-1, keepdims=True) / np.where(sb > 1e-12, sb, 1.0)
+
+
+# ---------- Algorithms (all operate on windows of shape (W, ROIs, 3, L)) ----------
+
+def green(windows, fs):
+    """GREEN: normalized green channel, zero-mean per window."""
+    g = _temporal_normalize(windows)[:, :, 1, :]
+    return g - g.mean(axis=-1, keepdims=True)
+
+
+def chrom(windows, fs, band=BP_BAND):
+    """CHROM: X = 3R - 2G, Y = 1.5R + G - 1.5B, band-passed, S = Xf - alpha * Yf."""
+    cn = _temporal_normalize(windows)
+    r, g, b = cn[:, :, 0, :], cn[:, :, 1, :], cn[:, :, 2, :]
+    xs = 3.0 * r - 2.0 * g
+    ys = 1.5 * r + g - 1.5 * b
+
+    plan = _bandpass(fs, band)
+    xf = plan.filtfilt(xs, axis=-1)
+    yf = plan.filtfilt(ys, axis=-1)
+
+    s = xf - _std_ratio(xf, yf) * yf
+    return s - s.mean(axis=-1, keepdims=True)
+
+
+# POS projection onto the plane orthogonal to the skin tone
+_POS_PROJECTION = np.array([[0.0, 1.0, -1.0],
+                            [-2.0, 1.0, 1.0]])
+
+
+def pos(windows, fs):
+    """POS: project normalized RGB onto the skin-orthogonal plane, h = S1 + alpha * S2."""
+    cn = _temporal_normalize(windows)
+    s = np.einsum('pc,wrcl->wrpl', _POS_PROJECTION, cn)
+    h = s[:, :, 0, :] + _std_ratio(s[:, :, 0, :], s[:, :, 1, :]) * s[:, :, 1, :]
+    return h - h.mean(axis=-1, keepdims=True)
+
+
+def _sym_decorrelate(w):
+    """Batched symmetric decorrelation W <- (W W^T)^(-1/2) W."""
+    vals, vecs = np.linalg.eigh(w @ np.swapaxes(w, -1, -2))
+    inv_sqrt = (vecs / np.sqrt(np.maximum(vals, 1e-12))[..., None, :]) @ np.swapaxes(vecs, -1, -2)
+    return inv_sqrt @ w
+
+
+def ica(windows, fs, hr_band=HR_BAND, n_iter=200, tol=1e-4):
+    """
+    ICA: batched symmetric FastICA (tanh non-linearity) on every window and ROI,
+    then the source with the strongest HR-band spectral peak is selected.
+    The sign is aligned with the green channel so overlap-add does not cancel windows.
+    """
+    cn = _temporal_normalize(windows)
+    x = cn - cn.mean(axis=-1, keepdims=True)                     # (W, R, 3, L)
+    n_samples = x.shape[-1]
+
+    # Whitening per (window, roi)
+    cov = x @ np.swapaxes(x, -1, -2) / n_samples                  # (W, R, 3, 3)
+    vals, vecs = np.linalg.eigh(cov)
+    whitening = np.swapaxes(vecs / np.sqrt(np.maximum(vals, 1e-12))[..., None, :], -1, -2)
+    z = whitening @ x
+
+    # FastICA iterations on a flat batch; converged (window, roi) pairs drop out of the update
+    batch_shape = z.shape[:-2]
+    z_flat = z.reshape(-1, 3, n_samples)
+    w = np.broadcast_to(np.eye(3), (z_flat.shape[0], 3, 3)).copy()
+    active = np.arange(z_flat.shape[0])
+    for _ in range(n_iter):
+        za, wa = z_flat[active], w[active]
+        wz = np.tanh(wa @ za)
+        w_new = (wz @ np.swapaxes(za, -1, -2)) / n_samples - (1.0 - wz ** 2).mean(axis=-1)[..., None] * wa
+        w_new = _sym_decorrelate(w_new)
+        w[active] = w_new
+
+        # Converged when every unmixing row keeps its direction (|<w_new, w>| -> 1)
+        change = np.abs(np.abs(np.einsum('bij,bij->bi', w_new, wa)) - 1.0).max(axis=-1)
+        active = active[change >= tol]
+        if active.size == 0:
+            break
+
+    sources = (w @ z_flat).reshape(*batch_shape, 3, n_samples)     # (W, R, 3, L)
+
+    # Pick the source with the largest HR-band peak relative to its total power
+    spec = np.abs(np.fft.rfft(sources, axis=-1)) ** 2
+    freqs = np.fft.rfftfreq(n_samples, d=1.0 / fs)
+    in_band = (freqs >= hr_band[0]) & (freqs <= hr_band[1])
+    score = spec[..., in_band].max(axis=-1) / np.maximum(spec[..., 1:].sum(axis=-1), 1e-12)
+    best = np.take_along_axis(sources, score.argmax(axis=-1)[..., None, None], axis=-2)[:, :, 0, :]
+
+    sign = np.sign(np.sum(best * x[:, :, 1, :], axis=-1, keepdims=True))
+    best = best * np.where(sign == 0, 1.0, sign)
+    return best - best.mean(axis=-1, keepdims=True)
+
+
+ALGORITHMS = {
+    'GREEN': green,
+    'CHROM': chrom,
+    'POS': pos,
+    'ICA': ica,
+}
+
+
+# ---------- Public API ----------
+
+def extract_pulse(traces, fs, method='POS', window_s=None, overlap=0.5, bandpass=True):
+    """
+    Extract the blood-volume pulse from RGB traces.
+
+    Args:
+        traces: (N, ROIs, 3) RGB means per frame (NaN where the face was lost).
+        fs: Frame rate in Hz.
+        method: One of ALGORITHMS ('GREEN', 'CHROM', 'POS', 'ICA').
+        window_s: Analysis window in seconds (default: DEFAULT_WINDOW_S[method]).
+        overlap: Fraction of overlap between consecutive windows (0 <= overlap < 1).
+        bandpass: Apply the BP_BAND band-pass to the recombined pulse.
+
+    Returns:
+        (pulse of shape (N, ROIs), valid mask of shape (N, ROIs))
+    """
+    method = method.upper()
+    if method not in ALGORITHMS:
+        raise ValueError(f"Unknown rPPG method: {method}, expected one of {list(ALGORITHMS)}")
+
+    x, valid = fill_missing(traces)
+    n = x.shape[0]
+
+    win = int(round((window_s or DEFAULT_WINDOW_S[method]) * fs))
+    win = max(8, min(win, n))
+    step = max(1, int(round(win * (1.0 - overlap))))
+
+    windows, starts = window_traces(x, win, step)
+    segments = ALGORITHMS[method](windows, fs)
+    pulse = overlap_add(segments, starts, n)
+
+    if bandpass and n > 30:
+        pulse = _bandpass(fs).filtfilt(pulse, axis=0)
+
+    return pulse, valid
+
+
+def estimate_hr(pulse, fs, window_s=10.0, step_s=1.0, hr_band=HR_BAND, nfft=2048, skip=None, max_skipped=0.0):
+    """
+    Estimate heart rate from the pulse per sliding window (batched FFT) and over the whole signal.
+
+    Args:
+        pulse: (N,) or (N, ROIs) pulse signal.
+        fs: Sampling rate in Hz.
+        window_s: HR window length in seconds.
+        step_s: Hop between HR windows in seconds.
+        hr_band: Search band in Hz (shared with compute_ppg_sqi).
+        nfft: Zero-padded FFT length (frequency resolution fs / nfft).
+        skip: Optional (N,) bool, frames to leave out (e.g. utils.motion.motion_mask at the
+            frame times); windows with more than max_skipped of them get no HR.
+        max_skipped: Fraction of skipped frames a window may contain.
+
+    Returns:
+        dict with 'times_s' (W,) window centers, 'hr_bpm' (W, ROIs) windowed HR (NaN where
+        skipped), 'skipped' (W,) and 'hr_bpm_global' (ROIs,) from the Welch PSD of the whole
+        signal, or from the mean spectrum of the windows kept when skip is given.
+    """
+    p = np.asarray(pulse, dtype=float)
+    if p.ndim == 1:
+        p = p[:, None]
+    n = p.shape[0]
+
+    win = max(8, min(int(round(window_s * fs)), n))
+    step = max(1, int(round(step_s * fs)))
+    nfft = max(nfft, win)
+
+    freqs = np.fft.rfftfreq(nfft, d=1.0 / fs)
+    in_band = (freqs >= hr_band[0]) & (freqs <= hr_band[1])
+    band_freqs = freqs[in_band]
+
+    windows = sliding_window_view(p, win, axis=0)[::step]        # (W, ROIs, win)
+    windows = (windows - windows.mean(axis=-1, keepdims=True)) * np.hanning(win)
+    spec = np.abs(np.fft.rfft(windows, n=nfft, axis=-1)[..., in_band]) ** 2
+    hr_windows = band_freqs[spec.argmax(axis=-1)] * 60.0
+
+    if skip is None:
+        skipped = np.zeros(windows.shape[0], dtype=bool)
+        f, pxx = welch(p - p.mean(axis=0), fs, nperseg=min(n, 1024), axis=0)
+        m_hr = (f >= hr_band[0]) & (f <= hr_band[1])
+        hr_global = f[m_hr][pxx[m_hr].argmax(axis=0)] * 60.0
+    else:
+        skipped = skipped_windows(skip, win, step, max_skipped)
+        hr_windows[skipped] = np.nan
+        hr_global = np.full(p.shape[1], np.nan)
+        if not np.all(skipped):
+            hr_global = band_freqs[spec[~skipped].mean(axis=0).argmax(axis=-1)] * 60.0
+
+    return {
+        'times_s': (np.arange(windows.shape[0]) * step + win / 2.0) / fs,
+        'hr_bpm': hr_windows,
+        'skipped': skipped,
+        'hr_bpm_global': hr_global,
+    }
+
+
+def fs_from_timestamps(timestamps_ms):
+    """Frame rate estimated from the median frame interval of a timestamp column (ms)."""
+    dt = np.diff(np.asarray(timestamps_ms, dtype=float))
+    dt = dt[dt > 0]
+    return 1000.0 / np.median(dt) if dt.size else 0.0
@@ -0,0 +1,630 @@
+"""
+Session / Dataset Loader Module
+
+Programmatic, lazy access to recorded sessions:
+
+    ds = Dataset("./data/video", "./data/rawsignal")
+    s = ds["vid_1m_300lux_Stationary_0deg_useiPhone"]
+    s.ppg['signal'], s.ppg_times            # PPG samples and their fitted times (ms)
+    s.frame_times, s.geometric, s.roi_traces
+    s.motion, s.motion_mask(s.ppg_times)    # head-motion windows and the samples they flag
+    frame = s.frames[120]                   # decoded on demand (LRU cached) or memmapped (raw)
+    part = s.between(t0_ms, t0_ms + 10_000) # the same, restricted to a time range
+
+Nothing is read until it is used, and everything that can be is memory-mapped:
+frame_timestamps.npy, roi_traces.npy and raw frames directly; pulse_data.csv and
+geometric_data.csv are parsed once into typed .npy caches next to them
+(<name>.cache.npy, rebuilt when the CSV is newer), so opening a session again costs
+no CSV parsing and datasets larger than RAM only page in what is touched.
+"""
+
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from functools import cached_property
+
+from config import data_settings as settings
+from utils.raw_recorder import TIMESTAMPS_FILE, TIMESTAMP_DTYPE, RawRecording
+from utils.frame_writer import IMAGE_EXTENSIONS
+from utils.geometric_logger import CSV_FILE as GEOMETRIC_FILE
+from utils.roi_tracer import load_roi_traces
+from utils.motion import motion_windows, motion_mask
+
+ROI_TRACES_FILE = "roi_traces.npy"
+KEYFRAME_DIR = "keyframes"
+CACHE_SUFFIX = ".cache.npy"
+# Video folder name written by nexigo_camera.session_folder_name
+SESSION_NAME_PATTERN = re.compile(r"^vid_(?P<distance_m>[\d.]+)m_(?P<illumination_lux>[\d.]+)lux_(?P<motion>.+)_"
+                                  r"(?P<angle_deg>-?[\d.]+)deg_use(?P<camera>[^_]+)(?:_(?P<take>\d+))?$")
+
+PPG_DTYPE = np.dtype([
+    ('pc_timestamp_ms', '<i8'),
+    ('arduino_millis', '<i8'),   # -1 where missing
+    ('signal', '<f4'),
+    ('led', '<f4'),
+    ('hr', '<f4'),
+])
+# pulse_data.csv column -> PPG_DTYPE field. Any other numeric column (a second pulse sensor,
+# a red / IR pair, ...) is kept as an extra '<f4' field under its own column name.
+PPG_COLUMNS = {
+    'PC_Timestamp_ms': 'pc_timestamp_ms',
+    'Arduino_millis': 'arduino_millis',
+    'Signal_Value': 'signal',
+    'Package_Num': 'led',
+    'HR': 'hr',
+}
+
+
+# ===== Typed caches of the CSV files =====
+
+def _cached_table(csv_path, build):
+    """Memory-mapped typed cache of a CSV file, (re)built by build(csv_path) when missing or stale."""
+    cache_path = os.path.splitext(csv_path)[0] + CACHE_SUFFIX
+    try:
+        if os.path.getmtime(cache_path) >= os.path.getmtime(csv_path):
+            return np.load(cache_path, mmap_mode='r')
+    except OSError:
+        pass
+    table = build(csv_path)
+    try:
+        np.save(cache_path, table)
+        return np.load(cache_path, mmap_mode='r')
+    except OSError:
+        return table  # read-only dataset: keep it in memory
+
+
+def _build_ppg_table(csv_path):
+    df = pd.read_csv(csv_path, usecols=lambda c: c != 'PC_DateTime')
+    df = df.dropna(subset=[c for c in ('PC_Timestamp_ms', 'Signal_Value') if c in df.columns])
+    extra = [c for c in df.columns if c not in PPG_COLUMNS]
+    table = np.zeros(len(df), dtype=np.dtype(PPG_DTYPE.descr + [(c, '<f4') for c in extra]))
+    table['arduino_millis'] = -1
+    for field in ('signal', 'led', 'hr'):
+        table[field] = np.nan
+    for column in df.columns:
+        values = pd.to_numeric(df[column], errors='coerce')
+        field = PPG_COLUMNS.get(column, column)
+        if field == 'arduino_millis':
+            values = values.fillna(-1)
+        table[field] = values.to_numpy()
+    return table
+
+
+def _build_geometric_table(csv_path):
+    df = pd.read_csv(csv_path).drop(columns=['Timestamp_DateTime'], errors='ignore')
+    ints = {'Frame_Number': '<i4', 'Timestamp_ms': '<i8'}
+    dtype = np.dtype([(c, ints.get(c, '<f4')) for c in df.columns])
+    table = np.zeros(len(df), dtype=dtype)
+    for c in df.columns:
+        table[c] = pd.to_numeric(df[c], errors='coerce').to_numpy()
+    return table
+
+
+def load_ppg_file(csv_path):
+    """
+    A pulse_data.csv file as a structured array in file order (memory-mapped from its cache):
+    the PPG_DTYPE fields, plus one '<f4' field per extra signal column.
+    """
+    return _cached_table(csv_path, _build_ppg_table)
+
+
+def load_ppg_table(folder):
+    """pulse_data.csv of a collection, see load_ppg_file."""
+    return load_ppg_file(os.path.join(folder, settings["ppg_input_file"]))
+
+
+def ppg_channels(table, columns):
+    """
+    Signal columns of a PPG table as one array.
+
+    Args:
+        table: From load_ppg_file / load_ppg_table.
+        columns: CSV column names, e.g. ['Signal_Value'] or ['Red', 'IR'].
+
+    Returns:
+        (channels, samples) float64 array.
+    """
+    missing = [c for c in columns if PPG_COLUMNS.get(c, c) not in table.dtype.names]
+    if missing:
+        raise KeyError(f"PPG channels not in the file: {missing}")
+    return np.stack([np.asarray(table[PPG_COLUMNS.get(c, c)], dtype=np.float64) for c in columns])
+
+
+def load_geometric_table(folder):
+    """geometric_data.csv as a structured array (Timestamp_DateTime dropped), memory-mapped from its cache."""
+    return _cached_table(os.path.join(folder, GEOMETRIC_FILE), _build_geometric_table)
+
+
+def list_frame_images(folder):
+    """Sorted file names of a recording's saved frame images (IMAGE_EXTENSIONS, any case)."""
+    return sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def load_frame_timestamps(folder):
+    """
+    TIMESTAMP_DTYPE array of a recording, sorted by time: frame_timestamps.npy (memory-mapped),
+    else geometric_data.csv, else the {timestamp_ms} image filenames of older recordings.
+    """
+    if RawRecording.is_raw_recording(folder):
+        # The raw timestamps file is preallocated; only the header's frame_count rows are filled
+        return RawRecording(folder).timestamps
+    timestamps_file = os.path.join(folder, TIMESTAMPS_FILE)
+    if os.path.exists(timestamps_file):
+        ts = np.load(timestamps_file, mmap_mode='r')
+        return ts if np.all(ts['timestamp_ms'][1:] >= ts['timestamp_ms'][:-1]) else np.sort(ts, order='timestamp_ms')
+
+    if os.path.exists(os.path.join(folder, GEOMETRIC_FILE)):
+        geometric = load_geometric_table(folder)
+        frame_number, timestamp_ms = geometric['Frame_Number'], geometric['Timestamp_ms']
+    else:
+        stems = [os.path.splitext(f)[0] for f in list_frame_images(folder)]
+        timestamp_ms = np.array(sorted(int(s) for s in stems if s.isdigit()), dtype=np.int64)
+        frame_number = np.arange(len(timestamp_ms))
+    ts = np.zeros(len(timestamp_ms), dtype=TIMESTAMP_DTYPE)
+    ts['frame_number'] = frame_number
+    ts['timestamp_ms'] = timestamp_ms
+    return np.sort(ts, order='timestamp_ms', kind='stable')
+
+
+def parse_session_name(video_dir):
+    """
+    Test condition encoded in a recording's folder name (vid_{distance}m_{illumination}lux_
+    {motion}_{angle}deg_use{camera}[_1]). For multi-camera sessions the camera folder's
+    parent carries the name and the camera folder is reported as camera_folder.
+
+    Returns:
+        dict with distance_m, illumination_lux, angle_deg (float), motion, camera, take (int)
+        and camera_folder, or {} if no folder on the path matches.
+    """
+    parts = os.path.normpath(os.path.abspath(video_dir)).split(os.sep)
+    for depth in range(len(parts) - 1, max(len(parts) - 3, 0), -1):
+        m = SESSION_NAME_PATTERN.match(parts[depth])
+        if m:
+            meta = m.groupdict()
+            for key in ('distance_m', 'illumination_lux', 'angle_deg'):
+                meta[key] = float(meta[key])
+            meta['take'] = int(meta['take'] or 0)
+            meta['camera_folder'] = os.sep.join(parts[depth + 1:]) or None
+            return meta
+    return {}
+
+
+# ===== Discovery / matching =====
+
+def find_ppg_sessions(ppg_root):
+    return sorted(root for root, _, files in os.walk(ppg_root) if settings["ppg_input_file"] in files)
+
+
+def find_video_sessions(video_root):
+    """Folders with frame timestamps, geometric data or frames (each camera folder of a multi-camera session)."""
+    sessions = []
+    for root, dirs, files in os.walk(video_root):
+        # keyframes/ of a crop recording belongs to its parent session
+        dirs[:] = sorted(d for d in dirs if d != KEYFRAME_DIR)
+        if TIMESTAMPS_FILE in files or GEOMETRIC_FILE in files or \
+                any(f.lower().endswith(IMAGE_EXTENSIONS) for f in files):
+            sessions.append(root)
+    return sessions
+
+
+def match_sessions(video_spans, ppg_spans):
+    """
+    Match every video session with the PPG session it overlaps most.
+
+    Args:
+        video_spans: (V, 2) [start_ms, end_ms] per video session.
+        ppg_spans: (P, 2) [start_ms, end_ms] per PPG session.
+
+    Returns:
+        (V,) index of the matched PPG session (-1: no overlap) and (V,) overlap in seconds.
+    """
+    video_spans = np.asarray(video_spans, dtype=np.float64).reshape(-1, 2)
+    ppg_spans = np.asarray(ppg_spans, dtype=np.float64).reshape(-1, 2)
+    if len(video_spans) == 0 or len(ppg_spans) == 0:
+        return np.full(len(video_spans), -1), np.zeros(len(video_spans))
+    overlap = (np.minimum(video_spans[:, None, 1], ppg_spans[None, :, 1])
+               - np.maximum(video_spans[:, None, 0], ppg_spans[None, :, 0]))
+    overlap = np.nan_to_num(overlap, nan=-1.0)
+    best = overlap.argmax(axis=1)
+    best_overlap = overlap[np.arange(len(video_spans)), best]
+    return np.where(best_overlap > 0, best, -1), np.maximum(best_overlap, 0) / 1000.0
+
+
+def _span(times):
+    return (float(times[0]), float(times[-1])) if len(times) else (np.nan, np.nan)
+
+
+# ===== PPG clock =====
+
+def fit_sample_clock(arduino_ms, pc_ms):
+    """
+    Sample times on the PC clock from the Arduino's millis(): a least-squares line
+    pc = a * millis + b, which keeps the Arduino's even sample spacing and removes the
+    jitter of the serial read times.
+
+    Returns:
+        (times_ms float64, report). Falls back to the PC read times when millis is
+        missing or not increasing (e.g. the Arduino was reset mid-collection).
+    """
+    pc = np.asarray(pc_ms, dtype=np.float64)
+    arduino_ms = np.asarray(arduino_ms)
+    if len(pc) < 3 or np.any(arduino_ms < 0) or np.any(np.diff(arduino_ms) <= 0):
+        return pc, {'clock': 'pc', 'reason': 'Arduino_millis missing or not increasing'}
+
+    x = (arduino_ms - arduino_ms[0]).astype(np.float64)
+    slope, intercept = np.polyfit(x, pc - pc[0], 1)
+    times = pc[0] + intercept + slope * x
+    residual = pc - times
+    return times, {
+        'clock': 'arduino',
+        'clock_drift_ppm': float((slope - 1.0) * 1e6),
+        'read_jitter_std_ms': float(residual.std()),
+        'read_jitter_p95_ms': float(np.percentile(np.abs(residual), 95)),
+        'read_jitter_max_ms': float(np.abs(residual).max()),
+    }
+
+
+# ===== Frames =====
+
+class FrameStore:
+    """
+    Frames of a recording by position (the order of Session.frame_timestamps).
+    Raw recordings are memory-mapped; image recordings are decoded on demand and the
+    most recently used frames are kept in an LRU cache.
+    """
+
+    def __init__(self, folder, timestamp_ms, cache_size=32, decode_workers=2):
+        """
+        Args:
+            folder: Recording folder.
+            timestamp_ms: (N,) frame times; image files are named after them.
+            cache_size: Decoded frames kept in memory.
+            decode_workers: Threads used to decode ranges of frames.
+        """
+        self.folder = folder
+        self.timestamp_ms = np.asarray(timestamp_ms)
+        self.cache_size = int(cache_size)
+        self.decode_workers = decode_workers
+        self.hits = self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._raw = RawRecording(folder) if RawRecording.is_raw_recording(folder) else None
+        self._paths = None
+
+    @property
+    def is_raw(self):
+        return self._raw is not None
+
+    def __len__(self):
+        return len(self.timestamp_ms)
+
+    def path(self, index):
+        """Image file of a frame (None if it was not saved, e.g. dropped by the saver)."""
+        if self._paths is None:
+            files = {}
+            for f in list_frame_images(self.folder):
+                stem = os.path.splitext(f)[0]
+                if stem.isdigit():
+                    files[int(stem)] = os.path.join(self.folder, f)
+            self._paths = [files.get(int(t)) for t in self.timestamp_ms]
+        return self._paths[index]
+
+    @property
+    def available(self):
+        """(N,) bool: whether each frame can be read (always True for raw recordings)."""
+        if self._raw is not None:
+            return np.ones(len(self), dtype=bool)
+        if len(self) == 0:
+            return np.zeros(0, dtype=bool)
+        self.path(0)
+        return np.array([p is not None for p in self._paths], dtype=bool)
+
+    def _decode(self, index):
+        import cv2
+        path = self.path(index)
+        return cv2.imread(path) if path is not None else None
+
+    def get(self, index):
+        """One frame (BGR); a memmapped view for raw recordings, cached otherwise."""
+        if self._raw is not None:
+            return self._raw[index]
+        index = range(len(self))[index]  # normalize negative indices
+        with self._lock:
+            if index in self._cache:
+                self._cache.move_to_end(index)
+                self.hits += 1
+                return self._cache[index]
+        frame = self._decode(index)
+        with self._lock:
+            self.misses += 1
+            self._cache[index] = frame
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return frame
+
+    def iter_frames(self, start=0, stop=None):
+        """Frames start..stop-1 in order (see iter_positions)."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        return self.iter_positions(range(start, stop))
+
+    def iter_positions(self, positions):
+        """
+        Frames at the given positions in order, decoded ahead in parallel. Not cached, so
+        a long sequential pass does not evict the frames used for random access.
+        """
+        if self._raw is not None:
+            return (self._raw[i] for i in positions)
+        from video_converter import iter_images_prefetched
+        # Missing images come back as None, like get()
+        paths = [self.path(i) or "" for i in positions]
+        return (frame for _, frame in iter_images_prefetched(paths, workers=self.decode_workers))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if self._raw is not None:
+                return self._raw[start:stop:step]
+            if step == 1:
+                return np.stack(list(self.iter_frames(start, stop))) if stop > start else None
+            return np.stack([self.get(i) for i in range(start, stop, step)])
+        return self.get(index)
+
+    def cache_info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self._cache), 'cache_size': self.cache_size}
+
+
+# ===== Session / Dataset =====
+
+class Session:
+    """
+    One recording (video folder) and the PPG collection recorded with it. Either may be
+    missing. Every attribute is loaded on first use.
+    """
+
+    def __init__(self, video_dir=None, ppg_dir=None, name=None, frame_cache_size=32, decode_workers=2):
+        """
+        Args:
+            video_dir: Recording folder under ./data/video (images, raw or crop recording).
+            ppg_dir: Collection folder under ./data/rawsignal containing pulse_data.csv.
+            name: Session name (defaults to the video folder name).
+            frame_cache_size: Decoded frames kept in the LRU cache.
+            decode_workers: Threads used to decode frame ranges.
+        """
+        if video_dir is None and ppg_dir is None:
+            raise ValueError("Session needs a video folder, a PPG folder or both")
+        self.video_dir = video_dir
+        self.ppg_dir = ppg_dir
+        self.name = name or os.path.basename(os.path.normpath(video_dir or ppg_dir))
+        self.frame_cache_size = frame_cache_size
+        self.decode_workers = decode_workers
+        self.overlap_s = None  # set by Dataset matching
+
+    def __repr__(self):
+        return f"Session({self.name!r}, video_dir={self.video_dir!r}, ppg_dir={self.ppg_dir!r})"
+
+    # ----- PPG -----
+
+    @cached_property
+    def ppg(self):
+        """PPG_DTYPE samples in sample order (None without a PPG folder)."""
+        if self.ppg_dir is None:
+            return None
+        table = load_ppg_table(self.ppg_dir)
+        # Arduino order when its counter is there (PC read times can swap neighbours)
+        key = table['arduino_millis'] if np.all(table['arduino_millis'] >= 0) else table['pc_timestamp_ms']
+        if np.all(key[1:] >= key[:-1]):
+            return table
+        return table[np.argsort(key, kind='stable')]
+
+    @cached_property
+    def _ppg_clock(self):
+        if self.ppg is None:
+            return None, None
+        return fit_sample_clock(self.ppg['arduino_millis'], self.ppg['pc_timestamp_ms'])
+
+    @property
+    def ppg_times(self):
+        """Sample times (ms, wall clock) on the fitted Arduino clock."""
+        return self._ppg_clock[0]
+
+    @property
+    def ppg_clock_report(self):
+        return self._ppg_clock[1]
+
+    # ----- Video -----
+
+    @cached_property
+    def frame_timestamps(self):
+        """TIMESTAMP_DTYPE (frame_number, timestamp_ms, grab_ns) per frame, sorted by time."""
+        return load_frame_timestamps(self.video_dir) if self.video_dir is not None else None
+
+    @property
+    def frame_times(self):
+        return self.frame_timestamps['timestamp_ms'] if self.frame_timestamps is not None else None
+
+    @cached_property
+    def geometric(self):
+        """geometric_data.csv as a structured array (None if absent)."""
+        if self.video_dir is None or not os.path.exists(os.path.join(self.video_dir, GEOMETRIC_FILE)):
+            return None
+        return load_geometric_table(self.video_dir)
+
+    @cached_property
+    def roi_traces(self):
+        """roi_traces.npy as returned by load_roi_traces (None if absent)."""
+        path = os.path.join(self.video_dir, ROI_TRACES_FILE) if self.video_dir is not None else None
+        return load_roi_traces(path) if path is not None and os.path.exists(path) else None
+
+    @cached_property
+    def frames(self):
+        """FrameStore over the frames in frame_timestamps order."""
+        if self.video_dir is None:
+            return None
+        return FrameStore(self.video_dir, self.frame_times, self.frame_cache_size, self.decode_workers)
+
+    @cached_property
+    def motion(self):
+        """Motion artifact windows of the geometric data (utils.motion.motion_windows), None if absent."""
+        if self.geometric is None:
+            return None
+        return motion_windows(self.geometric, settings.get("motion_window_s", 10.0),
+                              settings.get("motion_step_s", 5.0), settings.get("motion_thresholds"))
+
+    def motion_mask(self, times_ms):
+        """True for the times (ms) inside a window flagged for motion; all False without geometric data."""
+        if self.motion is None:
+            return np.zeros(np.shape(times_ms), dtype=bool)
+        return motion_mask(self.motion, times_ms)
+
+    @cached_property
+    def metadata(self):
+        """Test condition from the video folder name (see parse_session_name)."""
+        return parse_session_name(self.video_dir) if self.video_dir is not None else {}
+
+    @property
+    def is_crop_recording(self):
+        return self.geometric is not None and 'Crop_X' in self.geometric.dtype.names
+
+    # ----- Time ranges -----
+
+    @property
+    def span_ms(self):
+        """(start, end) of the video, else of the PPG."""
+        return _span(self.frame_times if self.video_dir is not None else self.ppg_times)
+
+    def frame_range(self, start_ms=None, end_ms=None):
+        """slice of frame positions with start_ms <= time < end_ms."""
+        return _time_slice(self.frame_times, start_ms, end_ms)
+
+    def ppg_range(self, start_ms=None, end_ms=None):
+        """slice of PPG samples with start_ms <= time < end_ms."""
+        return _time_slice(self.ppg_times, start_ms, end_ms)
+
+    def between(self, start_ms=None, end_ms=None):
+        """A SessionSlice of this session limited to [start_ms, end_ms)."""
+        return SessionSlice(self, start_ms, end_ms)
+
+
+def _time_slice(times, start_ms, end_ms):
+    if times is None:
+        return slice(0, 0)
+    lo = 0 if start_ms is None else int(np.searchsorted(times, start_ms, side='left'))
+    hi = len(times) if end_ms is None else int(np.searchsorted(times, end_ms, side='left'))
+    return slice(lo, max(lo, hi))
+
+
+class SessionSlice:
+    """Views of a Session's arrays restricted to a time range (no data is copied)."""
+
+    def __init__(self, session, start_ms, end_ms):
+        self.session = session
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.frame_slice = session.frame_range(start_ms, end_ms) if session.video_dir is not None else slice(0, 0)
+        self.ppg_slice = session.ppg_range(start_ms, end_ms) if session.ppg_dir is not None else slice(0, 0)
+
+    @property
+    def ppg(self):
+        return self.session.ppg[self.ppg_slice] if self.session.ppg is not None else None
+
+    @property
+    def ppg_times(self):
+        return self.session.ppg_times[self.ppg_slice] if self.session.ppg is not None else None
+
+    @property
+    def frame_timestamps(self):
+        ts = self.session.frame_timestamps
+        return ts[self.frame_slice] if ts is not None else None
+
+    @property
+    def frame_times(self):
+        ts = self.frame_timestamps
+        return ts['timestamp_ms'] if ts is not None else None
+
+    @property
+    def geometric(self):
+        # geometric rows follow the frames one to one; match on frame numbers to be safe
+        geometric, ts = self.session.geometric, self.frame_timestamps
+        if geometric is None or ts is None or len(ts) == 0:
+            return geometric[:0] if geometric is not None else None
+        lo, hi = np.searchsorted(geometric['Timestamp_ms'], [ts['timestamp_ms'][0], ts['timestamp_ms'][-1]],
+                                 side='left')
+        return geometric[lo:hi + 1]
+
+    @property
+    def roi_traces(self):
+        traces, ts = self.session.roi_traces, self.frame_timestamps
+        if traces is None or ts is None or len(ts) == 0:
+            return None
+        lo, hi = np.searchsorted(traces['timestamp_ms'], [ts['timestamp_ms'][0], ts['timestamp_ms'][-1]],
+                                 side='left')
+        return {key: value if key == 'roi_names' else value[lo:hi + 1] for key, value in traces.items()}
+
+    def frames(self):
+        """The frames of the range, decoded in order (generator)."""
+        return self.session.frames.iter_frames(self.frame_slice.start, self.frame_slice.stop)
+
+
+class Dataset:
+    """
+    All sessions under the data roots, each video session matched with the PPG
+    collection it overlaps most in time.
+
+    Usage:
+        ds = Dataset()
+        for session in ds: ...
+        session = ds[0] or ds["vid_..."]
+    """
+
+    def __init__(self, video_root="./data/video", ppg_root="./data/rawsignal", include_unmatched_ppg=False,
+                 frame_cache_size=32, decode_workers=2):
+        """
+        Args:
+            video_root: Searched recursively for recordings (one session per camera folder).
+            ppg_root: Searched recursively for pulse_data.csv.
+            include_unmatched_ppg: Also list PPG collections without a recording as PPG-only sessions.
+            frame_cache_size, decode_workers: Passed to every Session.
+        """
+        self.video_root = video_root
+        self.ppg_root = ppg_root
+        options = {'frame_cache_size': frame_cache_size, 'decode_workers': decode_workers}
+
+        video_dirs = find_video_sessions(video_root) if os.path.isdir(video_root) else []
+        ppg_dirs = find_ppg_sessions(ppg_root) if os.path.isdir(ppg_root) else []
+        ppg_sessions = [Session(ppg_dir=d, **options) for d in ppg_dirs]
+        video_sessions = [Session(video_dir=d, name=os.path.relpath(d, video_root).replace(os.sep, '_'), **options)
+                          for d in video_dirs]
+        # Spans come from the memory-mapped timestamp columns, so matching reads little data
+        ppg_spans = [_span(s.ppg['pc_timestamp_ms']) for s in ppg_sessions]
+        matches, overlaps = match_sessions([s.span_ms for s in video_sessions], ppg_spans)
+
+        self.sessions = []
+        for session, match, overlap_s in zip(video_sessions, matches, overlaps):
+            if match >= 0:
+                session.ppg_dir = ppg_dirs[match]
+                session.overlap_s = float(overlap_s)
+            self.sessions.append(session)
+        if include_unmatched_ppg:
+            matched = set(int(m) for m in matches if m >= 0)
+            self.sessions += [s for i, s in enumerate(ppg_sessions) if i not in matched]
+        self.ppg_dirs = ppg_dirs
+        self._by_name = {s.name: s for s in self.sessions}
+
+    @property
+    def names(self):
+        return [s.name for s in self.sessions]
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(self.sessions)
+
+    def __getitem__(self, key):
+        return self._by_name[key] if isinstance(key, str) else self.sessions[key]
+
+    def __repr__(self):
+        return f"Dataset({len(self)} sessions, video_root={self.video_root!r}, ppg_root={self.ppg_root!r})"
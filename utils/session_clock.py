@@ -0,0 +1,212 @@
+"""
+Session Clock Module
+
+A single time base for everything recorded in a session. All timestamps are taken
+from a monotonic nanosecond counter (time.perf_counter_ns, which is system-wide,
+so it is also consistent across processes) and converted to wall-clock time through
+one anchor taken when the clock is created. Camera frames and serial samples
+stamped with the same SessionClock can therefore be compared directly, without
+drift from wall-clock adjustments (NTP steps, DST, ...).
+
+Also contains FrameScheduler, which paces frame capture on that clock.
+"""
+
+import json
+import time
+import numpy as np
+from datetime import datetime
+
+
+class SessionClock:
+    """
+    Monotonic session clock with a single wall-clock anchor.
+
+    Usage:
+        clock = SessionClock()
+        t_ns = clock.now_ns()            # monotonic, for scheduling / intervals
+        ts_ms = clock.to_wall_ms(t_ns)   # wall-clock milliseconds, for filenames / CSV
+    """
+
+    def __init__(self):
+        # Bracket the wall-clock reading with two monotonic readings and anchor at the midpoint
+        before = time.perf_counter_ns()
+        wall = time.time_ns()
+        after = time.perf_counter_ns()
+
+        self.anchor_mono_ns = (before + after) // 2
+        self.anchor_wall_ns = wall
+        self.anchor_uncertainty_ns = after - before
+
+    @staticmethod
+    def now_ns() -> int:
+        """Current monotonic time in nanoseconds."""
+        return time.perf_counter_ns()
+
+    def to_wall_ns(self, mono_ns: int) -> int:
+        """Convert a monotonic reading of this clock to wall-clock nanoseconds since the epoch."""
+        return self.anchor_wall_ns + (mono_ns - self.anchor_mono_ns)
+
+    def to_wall_ms(self, mono_ns: int) -> int:
+        """Convert a monotonic reading of this clock to wall-clock milliseconds since the epoch."""
+        return self.to_wall_ns(mono_ns) // 1_000_000
+
+    def wall_ms(self) -> int:
+        """Current wall-clock time in milliseconds, derived from the monotonic counter."""
+        return self.to_wall_ms(self.now_ns())
+
+    def to_datetime_str(self, mono_ns: int) -> str:
+        """Format a monotonic reading as 'YYYY-mm-dd HH:MM:SS.mmm' local time."""
+        return datetime.fromtimestamp(self.to_wall_ns(mono_ns) / 1e9).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+class FrameScheduler:
+    """
+    Paces frame capture on a SessionClock grid of 1 / fps slots.
+
+    Every grabbed frame is passed to poll() with its grab time. A frame is captured
+    for the current slot once its grab time is within half an interval of the slot
+    start (so a camera running at the target rate is not pushed a whole slot back by
+    sub-millisecond jitter). When capture falls behind:
+    - 'catchup': each following frame fills the next missed slot until the schedule
+                 is caught up (no slots are lost, but frames are bunched together).
+    - 'drop':    missed slots are skipped and counted as dropped, and the frame fills
+                 the slot nearest to its grab time (timing stays on the grid).
+
+    A captured frame is counted as late when it was grabbed more than
+    `late_tolerance` of a frame interval after the start of the slot it was due for
+    (the next unfilled slot, also under 'drop' where it then fills a later one).
+    """
+
+    POLICIES = ('catchup', 'drop')
+
+    # Jitter histogram: deviation of the actual frame interval from the nominal one (ms);
+    # deviations outside the edges are counted as underflow / overflow (edges stay finite for JSON)
+    JITTER_BIN_EDGES_MS = np.arange(-20, 21, 1.0)
+
+    def __init__(self, clock: SessionClock, fps: float, max_frames: int,
+                 policy='drop', late_tolerance=0.5):
+        """
+        Args:
+            clock: Session clock providing the grab times.
+            fps: Target capture rate.
+            max_frames: Maximum number of frames to capture.
+            policy: 'catchup' or 'drop' (see class docstring).
+            late_tolerance: Lateness threshold as a fraction of the frame interval.
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown frame policy: {policy}, expected one of {self.POLICIES}")
+
+        self.clock = clock
+        self.fps = float(fps)
+        self.interval_ns = int(round(1e9 / self.fps))
+        self.max_frames = int(max_frames)
+        self.policy = policy
+        self.late_tolerance_ns = int(late_tolerance * self.interval_ns)
+
+        self.grab_ns = np.zeros(self.max_frames, dtype=np.int64)
+        self.slot_index = np.zeros(self.max_frames, dtype=np.int64)
+        self.frame_count = 0
+        self.late_frames = 0
+        self.dropped_slots = 0
+        self.start_ns = None
+        self._next_slot = 0
+
+    def start(self, t_ns=None):
+        """
+        Start the schedule; the first slot begins at t_ns.
+        With t_ns=None the grid is anchored on the first polled frame, so the camera's
+        own frame phase is not counted as lateness.
+        """
+        self.start_ns = t_ns
+        self.frame_count = 0
+        self.late_frames = 0
+        self.dropped_slots = 0
+        self._next_slot = 0
+
+    def elapsed_s(self, t_ns) -> float:
+        """Seconds since the first slot for a reading of the clock."""
+        if self.start_ns is None:
+            return 0.0
+        return (t_ns - self.start_ns) / 1e9
+
+    @property
+    def done(self) -> bool:
+        return self.frame_count >= self.max_frames
+
+    def poll(self, grab_ns: int) -> bool:
+        """
+        Decide whether a frame grabbed at grab_ns is captured.
+
+        Returns:
+            True if the frame fills a slot (its grab time is recorded), False otherwise.
+        """
+        if self.done:
+            return False
+        if self.start_ns is None:
+            self.start_ns = grab_ns
+
+        half_interval = self.interval_ns // 2
+        slot_start = self.start_ns + self._next_slot * self.interval_ns
+        if grab_ns < slot_start - half_interval:
+            return False
+
+        # Lateness against the slot this frame was due for, before 'drop' moves it to a later one
+        if grab_ns - slot_start > self.late_tolerance_ns:
+            self.late_frames += 1
+
+        slot = self._next_slot
+        if self.policy == 'drop':
+            # Slot nearest to the grab time; everything skipped in between is lost
+            slot = max(slot, (grab_ns - self.start_ns + half_interval) // self.interval_ns)
+            self.dropped_slots += slot - self._next_slot
+
+        self.grab_ns[self.frame_count] = grab_ns
+        self.slot_index[self.frame_count] = slot
+        self.frame_count += 1
+        self._next_slot = slot + 1
+        return True
+
+    def stats(self, skip_first=0) -> dict:
+        """
+        Timing statistics of the captured frames.
+
+        Args:
+            skip_first: Number of leading frames to exclude (e.g. a warm-up frame).
+        """
+        grab = self.grab_ns[skip_first:self.frame_count]
+        result = {
+            'policy': self.policy,
+            'target_fps': self.fps,
+            'frames': int(len(grab)),
+            'late_frames': int(self.late_frames),
+            'dropped_slots': int(self.dropped_slots),
+        }
+        if len(grab) < 2:
+            return result
+
+        intervals_ms = np.diff(grab) / 1e6
+        deviation_ms = intervals_ms - self.interval_ns / 1e6
+        counts, _ = np.histogram(deviation_ms, bins=self.JITTER_BIN_EDGES_MS)
+
+        result.update({
+            'achieved_fps': float((len(grab) - 1) / ((grab[-1] - grab[0]) / 1e9)),
+            'interval_mean_ms': float(intervals_ms.mean()),
+            'jitter_std_ms': float(intervals_ms.std()),
+            'interval_p95_ms': float(np.percentile(intervals_ms, 95)),
+            'interval_max_ms': float(intervals_ms.max()),
+            'jitter_histogram': {
+                'bin_edges_ms': [float(e) for e in self.JITTER_BIN_EDGES_MS],
+                'counts': [int(c) for c in counts],
+                'underflow': int((deviation_ms < self.JITTER_BIN_EDGES_MS[0]).sum()),
+                'overflow': int((deviation_ms > self.JITTER_BIN_EDGES_MS[-1]).sum()),
+            },
+        })
+        return result
+
+    def save_report(self, file_path, skip_first=0, **extra):
+        """Write stats() (plus any extra fields) as JSON and return the dictionary."""
+        report = self.stats(skip_first)
+        report.update(extra)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,288 @@
+"""
+Shared-Memory Ring Module
+
+Single-producer ring buffers in multiprocessing shared memory, used by the
+process-based acquisition runtime (acquisition.py) to pass frames and serial
+samples between processes without pickling them.
+
+Every slot holds one item (a frame, or one structured sample) plus its sequence
+number, a session clock time (t_ns) and an integer tag (e.g. the frame number).
+Readers come in two kinds:
+- registered readers (lossless): their cursor lives in shared memory and the
+  writer never overwrites a slot a registered reader has not released yet.
+  When the ring is full, claim() returns None and the producer decides what to
+  drop. Items are handed out as views into shared memory (no copy) and may be
+  released out of order.
+- lossy readers: do not hold the writer back; items they were too slow for are
+  skipped and counted as lost (e.g. the GUI monitor).
+
+Layout of the shared block:
+    control int64[64] | seq int64[slots] | t_ns int64[slots] | tag int64[slots] | items
+"""
+
+import time
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+_CONTROL_FIELDS = 64
+_WRITE_COUNT = 0
+_CLOSED = 1
+_CURSORS = 8  # registered reader cursors start here; -1 means unused
+
+
+class ShmRing:
+    """
+    Shared-memory ring of fixed-shape items.
+
+    Usage (producer, owner):
+        ring = ShmRing(slots=64, item_shape=(720, 1280, 3), dtype=np.uint8, max_readers=2)
+        slot = ring.claim()                        # None when registered readers are full
+        if slot is not None:
+            ret, frame = read_into(cap, slot)
+            ring.publish(t_ns=grab_ns, tag=frame_number)
+        ...
+        ring.close(); ring.unlink()
+
+    Usage (consumer, other process):
+        ring = ShmRing.attach(spec)               # spec = owner's ring.spec (picklable)
+        reader = RingReader(ring, lossless=True)
+        item = reader.get(timeout=0.1)            # (seq, t_ns, tag, view) or None
+        ...
+        reader.release(item[0])
+    """
+
+    def __init__(self, slots, item_shape, dtype, name=None, max_readers=4, create=True):
+        """
+        Args:
+            slots: Number of items the ring holds.
+            item_shape: Shape of one item (() for one structured sample).
+            dtype: Item dtype (may be structured).
+            name: Shared memory name (generated when creating, required when attaching).
+            max_readers: Number of registered (lossless) reader cursors.
+            create: Create (and own) the block, or attach to an existing one.
+        """
+        self.slots = int(slots)
+        self.item_shape = tuple(item_shape)
+        self.dtype = np.dtype(dtype)
+        self.max_readers = int(max_readers)
+        if _CURSORS + self.max_readers > _CONTROL_FIELDS:
+            raise ValueError(f"max_readers must be at most {_CONTROL_FIELDS - _CURSORS}")
+
+        item_bytes = int(np.prod(self.item_shape, dtype=np.int64)) * self.dtype.itemsize
+        meta_bytes = (_CONTROL_FIELDS + 3 * self.slots) * 8
+        size = meta_bytes + self.slots * item_bytes
+
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            # Processes started by multiprocessing share the owner's resource tracker,
+            # so attaching does not make this process responsible for unlinking
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.owner = create
+
+        buf = self.shm.buf
+        self.control = np.ndarray((_CONTROL_FIELDS,), dtype=np.int64, buffer=buf)
+        offset = _CONTROL_FIELDS * 8
+        self.seq = np.ndarray((self.slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += self.slots * 8
+        self.t_ns = np.ndarray((self.slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += self.slots * 8
+        self.tag = np.ndarray((self.slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += self.slots * 8
+        self.items = np.ndarray((self.slots,) + self.item_shape, dtype=self.dtype, buffer=buf, offset=offset)
+
+        if create:
+            self.control[:] = 0
+            self.control[_CURSORS:_CURSORS + self.max_readers] = -1
+            self.seq[:] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def spec(self):
+        """Picklable description for ShmRing.attach() in another process."""
+        return {'name': self.name, 'slots': self.slots, 'item_shape': self.item_shape,
+                'dtype': self.dtype.descr if self.dtype.names else self.dtype.str,
+                'max_readers': self.max_readers}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec['slots'], spec['item_shape'], np.dtype(spec['dtype']), name=spec['name'],
+                   max_readers=spec['max_readers'], create=False)
+
+    # ===== Producer side =====
+
+    @property
+    def write_count(self) -> int:
+        return int(self.control[_WRITE_COUNT])
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.control[_CLOSED])
+
+    def free_slots(self) -> int:
+        """Slots the producer may fill without overwriting unreleased items of registered readers."""
+        cursors = self.control[_CURSORS:_CURSORS + self.max_readers]
+        active = cursors[cursors >= 0]
+        if len(active) == 0:
+            return self.slots
+        return self.slots - (self.write_count - int(active.min()))
+
+    def claim(self):
+        """The next slot to fill (a view into shared memory), or None if registered readers are full."""
+        if self.free_slots() <= 0:
+            return None
+        # [i, ...] keeps a 0-d view for structured samples (items[i] would be a copy)
+        return self.items[self.write_count % self.slots, ...]
+
+    def publish(self, t_ns=0, tag=0):
+        """Make the claimed slot visible to readers."""
+        n = self.write_count
+        slot = n % self.slots
+        self.t_ns[slot] = t_ns
+        self.tag[slot] = tag
+        self.seq[slot] = n
+        self.control[_WRITE_COUNT] = n + 1
+
+    def write(self, item, t_ns=0, tag=0) -> bool:
+        """Copy an item into the ring. Returns False (nothing written) when the ring is full."""
+        slot = self.claim()
+        if slot is None:
+            return False
+        slot[...] = item
+        self.publish(t_ns, tag)
+        return True
+
+    def close(self):
+        """Mark the stream as finished; readers see it once they have drained the ring."""
+        self.control[_CLOSED] = 1
+
+    def unlink(self):
+        """Release the shared memory (owner only, after every process has detached)."""
+        self.release_views()
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def release_views(self):
+        # numpy views keep the buffer exported; drop them before closing the block
+        self.control = self.seq = self.t_ns = self.tag = self.items = None
+
+    def detach(self):
+        """Close this process's mapping (non-owners)."""
+        self.release_views()
+        self.shm.close()
+
+
+class RingReader:
+    """
+    Reader of a ShmRing. See the module docstring for lossless vs lossy readers.
+    """
+
+    def __init__(self, ring, lossless=True, from_start=False, cursor=None):
+        """
+        Args:
+            ring: ShmRing (usually attached in this process).
+            lossless: Register a cursor that holds the writer back.
+            from_start: Start at the oldest item still in the ring instead of the next new one.
+            cursor: Cursor index (0 .. max_readers-1) of a lossless reader; give each reader
+                    process its own index, or leave None to take the first free one.
+        """
+        self.ring = ring
+        self.lossless = lossless
+        self.lost = 0
+        self.read = 0
+        self._lock = threading.Lock()
+        self._released = set()
+
+        write_count = ring.write_count
+        self.next_seq = max(0, write_count - ring.slots) if from_start else write_count
+        self._cursor_index = None
+        if lossless:
+            if cursor is None:
+                cursors = ring.control[_CURSORS:_CURSORS + ring.max_readers]
+                free = np.flatnonzero(cursors < 0)
+                if len(free) == 0:
+                    raise RuntimeError("No free reader cursor in the ring (raise max_readers)")
+                cursor = int(free[0])
+            self._cursor_index = _CURSORS + int(cursor)
+            self._oldest_unreleased = self.next_seq
+            ring.control[self._cursor_index] = self.next_seq
+
+    def available(self) -> int:
+        return self.ring.write_count - self.next_seq
+
+    def get(self, timeout=None, copy_to=None):
+        """
+        Take the next item.
+
+        Args:
+            timeout: Seconds to wait for an item (None: return immediately).
+            copy_to: Optional array to copy the item into (lossy readers should copy,
+                     since the writer may overwrite the slot at any time).
+
+        Returns:
+            (seq, t_ns, tag, item) or None when nothing is available. `item` is a view into
+            shared memory unless copy_to is given. Lossless readers must release(seq) it.
+        """
+        ring = self.ring
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while ring.write_count <= self.next_seq:
+            if deadline is None or time.perf_counter() >= deadline:
+                return None
+            time.sleep(0.0005)
+
+        if not self.lossless and ring.write_count - self.next_seq > ring.slots:
+            # Overrun: the writer has lapped this reader
+            skip = ring.write_count - ring.slots - self.next_seq
+            self.lost += skip
+            self.next_seq += skip
+
+        seq = self.next_seq
+        slot = seq % ring.slots
+        t_ns, tag = int(ring.t_ns[slot]), int(ring.tag[slot])
+        item = ring.items[slot, ...]
+        if copy_to is not None:
+            copy_to[...] = item
+            item = copy_to
+            if not self.lossless and ring.seq[slot] != seq:
+                # Overwritten while copying
+                self.lost += 1
+                self.next_seq += 1
+                return self.get(timeout=0, copy_to=copy_to)
+        self.next_seq += 1
+        self.read += 1
+        return seq, t_ns, tag, item
+
+    def release(self, seq):
+        """
+        Hand an item back to the writer (lossless readers). Items may be released in any
+        order; the shared cursor advances over the contiguous released prefix.
+        """
+        if not self.lossless:
+            return
+        with self._lock:
+            self._released.add(seq)
+            advanced = False
+            while self._oldest_unreleased in self._released:
+                self._released.discard(self._oldest_unreleased)
+                self._oldest_unreleased += 1
+                advanced = True
+            if advanced and self.ring.control is not None:
+                self.ring.control[self._cursor_index] = self._oldest_unreleased
+
+    def drained(self) -> bool:
+        """True once the writer has closed the ring and every item has been read."""
+        return self.ring.closed and self.available() <= 0
+
+    def close(self):
+        """Unregister the cursor so the writer is no longer held back by this reader."""
+        if self._cursor_index is not None and self.ring.control is not None:
+            self.ring.control[self._cursor_index] = -1
+            self._cursor_index = None
@@ -4,16 +4,174 @@
 
 使用方法 / Usage:
 python images_to_video.py --input_folder /path/to/images --output_video output.mp4 --fps 50
+python images_to_video.py --input_folder /path/to/images --output_video output.mp4 --workers 8 --prefetch 32
+python images_to_video.py --input_folder /path/to/images --output_video output.mp4 --timing cfr
+python images_to_video.py --batch --input_root ./data/video --output_root ./data/converted --jobs 2
+
+PNG 解码在线程池 (或进程池) 中并行进行, 写入器按顺序消费 /
+PNG decoding runs in a thread (or process) pool with an ordered, bounded prefetch
+window; the writer consumes the decoded frames in order.
+
+时间轴 / Timing (--timing):
+- index: 每张图一帧 (旧行为) / one video frame per image at --fps (dropped or late frames shift the timing)
+- cfr:   按文件名时间戳 (ms) 构建恒定帧率时间轴, 重复或丢弃帧 /
+         exact constant-rate timeline from the millisecond filenames of Camera.record,
+         duplicating or dropping frames
+- vfr:   每张图一帧, 另存 <video>_timestamps.txt (mkvmerge timestamp v2 格式) /
+         one frame per image plus a <video>_timestamps.txt sidecar (mkvmerge timestamp
+         format v2), e.g. `mkvmerge -o out.mkv --timestamps 0:out_timestamps.txt out.mp4`
+The timeline and its timing errors are computed from the timestamps before any image
+is decoded; cfr / vfr write them to <video>_timing.json.
+
+批量模式 / Batch mode (--batch):
+Every folder with images under --input_root is a session (multi-camera sessions give one
+video per camera subfolder), converted to <output_root>/<relative path>.mp4, --jobs
+sessions at a time. <output_root>/conversion_manifest.json records each finished session
+(frame count, fingerprint of the image names / sizes / mtimes and the conversion options,
+output size). Sessions whose fingerprint and output still match are skipped, so re-running
+after new recordings or an interrupted run only converts what is missing.
 """
 
 import cv2
 import os
+import time
+import json
+import hashlib
 import argparse
 import numpy as np
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from utils.session import find_video_sessions, list_frame_images
+
+MANIFEST_FILE = "conversion_manifest.json"
+
+
+def _read_image(image_path):
+    return cv2.imread(image_path)
+
+
+def iter_images_prefetched(image_paths, workers=None, prefetch=None, executor='thread'):
+    """
+    按顺序读取图像, 并行预取 / Read images in order while decoding ahead in parallel.
+
+    At most `prefetch` decoded frames are in flight, so memory stays bounded however
+    long the sequence is. cv2.imread releases the GIL, so threads scale with cores;
+    'process' avoids the GIL entirely at the cost of pickling every frame back.
+
+    Args:
+        image_paths: Image paths in output order.
+        workers: Decoder threads / processes (default: CPU count).
+        prefetch: Maximum number of frames decoded ahead (default: 4 x workers).
+        executor: 'thread' or 'process'.
+
+    Yields:
+        (image_path, frame) in the order of image_paths; frame is None if it cannot be read.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    prefetch = max(1, prefetch or 4 * workers)
+    pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+
+    with pool_class(max_workers=workers) as pool:
+        pending = deque()
+        paths = iter(image_paths)
+        for image_path in paths:
+            pending.append((image_path, pool.submit(_read_image, image_path)))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            image_path, future = pending.popleft()
+            frame = future.result()
+            # Refill the window before handing the frame to the (slow) writer
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, pool.submit(_read_image, next_path)))
+            yield image_path, frame
+
 
+TIMING_MODES = ('index', 'cfr', 'vfr')
 
-def convert_images_to_video(input_folder, output_video, fps=50, image_extension='.png'):
+
+def parse_frame_timestamps(image_files):
+    """
+    从文件名解析时间戳 / Millisecond timestamps from Camera.record filenames ({timestamp_ms}.png).
+
+    Returns:
+        (N,) int64 array, or None if a filename is not a timestamp.
+    """
+    try:
+        return np.array([int(os.path.splitext(f)[0]) for f in image_files], dtype=np.int64)
+    except ValueError:
+        return None
+
+
+def build_frame_timeline(timestamps_ms, fps, timing='cfr'):
+    """
+    计算输出帧对应的源图像及时间误差 / Map every output video frame to a source image.
+
+    Args:
+        timestamps_ms: Sorted (N,) capture timestamps in ms.
+        fps: Output frame rate.
+        timing: 'cfr' (nearest source frame for every slot of a constant-rate grid
+                starting at the first frame), or 'index' / 'vfr' (every image once).
+
+    Returns:
+        (source, report): source is the non-decreasing (M,) index of the image shown in
+        each output frame; report has duplicated / dropped frame counts and the timing
+        error in ms (output presentation time minus capture time, for 'index' / 'vfr'
+        when played at a constant `fps`).
+    """
+    t = np.asarray(timestamps_ms, dtype=np.float64)
+    interval_ms = 1000.0 / fps
+    if timing == 'cfr':
+        n_out = int(np.floor((t[-1] - t[0]) / interval_ms + 1e-9)) + 1
+        out_t = t[0] + np.arange(n_out) * interval_ms
+        if len(t) > 1:
+            right = np.clip(np.searchsorted(t, out_t), 1, len(t) - 1)
+            left = right - 1
+            source = np.where(np.abs(t[left] - out_t) <= np.abs(t[right] - out_t), left, right)
+        else:
+            source = np.zeros(n_out, dtype=np.int64)
+    else:
+        source = np.arange(len(t))
+        out_t = t[0] + np.arange(len(t)) * interval_ms
+    error = out_t - t[source]
+    abs_error = np.abs(error)
+
+    used = np.zeros(len(t), dtype=bool)
+    used[source] = True
+    intervals = np.diff(t)
+    report = {
+        'timing': timing,
+        'fps': float(fps),
+        'source_frames': int(len(t)),
+        'output_frames': int(len(source)),
+        'duplicated_frames': int(np.count_nonzero(source[1:] == source[:-1])),
+        'dropped_frames': int(len(t) - np.count_nonzero(used)),
+        'capture_duration_s': float((t[-1] - t[0]) / 1000.0),
+        'video_duration_s': float(len(source) / fps),
+        'source_interval_median_ms': float(np.median(intervals)) if len(intervals) else None,
+        'source_interval_max_ms': float(intervals.max()) if len(intervals) else None,
+        'timing_error_mean_ms': float(abs_error.mean()),
+        'timing_error_p95_ms': float(np.percentile(abs_error, 95)),
+        'timing_error_max_ms': float(abs_error.max()),
+        'timing_error_end_ms': float(error[-1]),
+    }
+    return source, report
+
+
+def write_timestamps_sidecar(file_path, timestamps_ms):
+    """Write mkvmerge timestamp format v2: one presentation time (ms from the first frame) per line."""
+    t = np.asarray(timestamps_ms, dtype=np.int64)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write("# timestamp format v2\n")
+        f.write("\n".join(str(int(v)) for v in t - t[0]))
+        f.write("\n")
+
+
+def convert_images_to_video(input_folder, output_video, fps=50, image_extension='.png',
+                            workers=None, prefetch=None, executor='thread', timing='index'):
     """
     将图像序列转换为视频文件 / Convert image sequence to video file
 
@@ -22,11 +180,19 @@ def convert_images_to_video(input_folder, output_video, fps=50, image_extension=
     - output_video: 输出视频文件路径 / Output video file path
     - fps: 帧率 / Frame rate (default: 50)
     - image_extension: 图像文件扩展名 / Image file extension
+    - workers: 解码线程数 / Decoder threads or processes (default: CPU count)
+    - prefetch: 预取帧数上限 / Maximum frames decoded ahead (default: 4 x workers)
+    - executor: 'thread' 或 / or 'process'
+    - timing: 'index', 'cfr' 或 / or 'vfr' (see module docstring)
+
+    返回 / Returns:
+    - dict: frames, skipped, seconds, conversion fps, and the timeline report (cfr / vfr)
     """
+    if timing not in TIMING_MODES:
+        raise ValueError(f"Converter: unknown timing mode {timing}, expected one of {TIMING_MODES}")
 
     # 获取所有图像文件并排序 / Get all image files and sort them
-    image_files = sorted([f for f in os.listdir(input_folder)
-                          if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))])
+    image_files = list_frame_images(input_folder)
 
     if not image_files:
         raise ValueError(f" No image files found in {input_folder}")
@@ -35,6 +201,23 @@ def convert_images_to_video(input_folder, output_video, fps=50, image_extension=
     print(f"第一张: {image_files[0]}, 最后一张: {image_files[-1]}")
     print(f"First: {image_files[0]}, Last: {image_files[-1]}")
 
+    # 时间轴 (解码前计算) / Timeline, computed before anything is decoded
+    timestamps_ms = parse_frame_timestamps(image_files)
+    if timestamps_ms is None:
+        if timing != 'index':
+            raise ValueError(f"Converter: filenames in {input_folder} are not millisecond timestamps, "
+                             f"use --timing index")
+        source, timeline = np.arange(len(image_files)), None
+    else:
+        order = np.argsort(timestamps_ms, kind='stable')
+        image_files = [image_files[i] for i in order]
+        timestamps_ms = timestamps_ms[order]
+        source, timeline = build_frame_timeline(timestamps_ms, fps, timing)
+        print(f"Converter: timing '{timing}': {timeline['output_frames']} output frames from "
+              f"{timeline['source_frames']} images | duplicated {timeline['duplicated_frames']} | "
+              f"dropped {timeline['dropped_frames']} | timing error mean {timeline['timing_error_mean_ms']:.1f} ms, "
+              f"max {timeline['timing_error_max_ms']:.1f} ms, at end {timeline['timing_error_end_ms']:+.1f} ms")
+
     # 读取第一张图像以获取尺寸 / Read first image to get dimensions
     first_image_path = os.path.join(input_folder, image_files[0])
     first_image = cv2.imread(first_image_path)
@@ -52,43 +235,245 @@ def convert_images_to_video(input_folder, output_video, fps=50, image_extension=
     if not out.isOpened():
         raise ValueError("Converter:  Cannot create video writer")
 
-    #  Write frames
-    for i, image_file in enumerate(image_files):
-        image_path = os.path.join(input_folder, image_file)
-        frame = cv2.imread(image_path)
-
+    #  Write frames (decoded ahead in parallel, written in order)
+    # Images never shown are not decoded; duplicated ones are decoded once and written repeatedly
+    used, first_slot = np.unique(source, return_index=True)
+    repeats = np.diff(np.append(first_slot, len(source)))
+    image_paths = [os.path.join(input_folder, image_files[j]) for j in used]
+    written = 0
+    last_frame = None
+    start = time.perf_counter()
+    for i, (image_path, frame) in enumerate(iter_images_prefetched(image_paths, workers, prefetch, executor)):
         if frame is None:
-            print(f"Converter:  / Warning: Cannot read {image_file}, skipping")
-            continue
+            if timing == 'index' or last_frame is None:
+                print(f"Converter:  / Warning: Cannot read {os.path.basename(image_path)}, skipping")
+                continue
+            # Keep the timeline exact: show the previous frame instead
+            print(f"Converter:  / Warning: Cannot read {os.path.basename(image_path)}, repeating previous frame")
+            frame = last_frame
 
-        out.write(frame)
+        for _ in range(repeats[i]):
+            out.write(frame)
+        written += int(repeats[i])
+        last_frame = frame
 
         # 显示进度 / Show progress
         if (i + 1) % 50 == 0:
-            print(f"Converter: / Processed {i + 1}/{len(image_files)} frames")
+            elapsed = time.perf_counter() - start
+            print(f"Converter: / Processed {i + 1}/{len(image_paths)} frames ({(i + 1) / elapsed:.1f} fps)")
 
     # 释放资源 / Release resources
     out.release()
+    seconds = time.perf_counter() - start
 
     print(f"\n✓ Converter:  / Video created successfully: {output_video}")
-    print(f"  - Converter:  / Total frames: {len(image_files)}")
+    print(f"  - Converter:  / Total frames: {written}")
     print(f"  - Converter:  / Frame rate: {fps} FPS")
-    print(f"  - Converter:  / Duration: {len(image_files) / fps:.2f} 秒 / seconds")
+    print(f"  - Converter:  / Duration: {written / fps:.2f} 秒 / seconds")
+    print(f"  - Converter:  / Converted in {seconds:.2f}s ({len(image_paths) / seconds:.1f} fps)")
+
+    result = {'frames': written, 'skipped': len(source) - written,
+              'seconds': seconds, 'fps': len(image_paths) / seconds if seconds > 0 else 0.0}
+    if timeline is not None and timing != 'index':
+        base = os.path.splitext(output_video)[0]
+        if timing == 'vfr':
+            write_timestamps_sidecar(base + "_timestamps.txt", timestamps_ms)
+            print(f"  - Converter:  / Timestamps: {base}_timestamps.txt")
+        with open(base + "_timing.json", 'w', encoding='utf-8') as f:
+            json.dump(timeline, f, indent=2)
+        result['timeline'] = timeline
+    return result
+
+
+def discover_sessions(input_root):
+    """查找所有会话文件夹 / Every recording under input_root (utils.session.find_video_sessions) with frame images."""
+    return [d for d in find_video_sessions(input_root) if list_frame_images(d)]
+
+
+def session_fingerprint(session_dir, options):
+    """
+    会话指纹 / Frame count, total bytes and a hash of the image names, sizes and mtimes
+    plus the conversion options. Cheap enough to compute for every session on every run.
+    """
+    images = list_frame_images(session_dir)
+    digest = hashlib.sha1(json.dumps(options, sort_keys=True).encode())
+    total_bytes = 0
+    for f in images:
+        st = os.stat(os.path.join(session_dir, f))
+        digest.update(f"{f}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+        total_bytes += st.st_size
+    return {'frames': len(images), 'bytes': total_bytes, 'hash': digest.hexdigest()}
+
+
+def load_manifest(manifest_path):
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(manifest_path, manifest):
+    """Write atomically, so an interrupted run never leaves a truncated manifest."""
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def is_up_to_date(entry, fingerprint, output_video):
+    return (entry is not None
+            and entry.get('hash') == fingerprint['hash']
+            and entry.get('frames') == fingerprint['frames']
+            and os.path.exists(output_video)
+            and os.path.getsize(output_video) == entry.get('output_bytes'))
+
+
+def _lower_priority(nice):
+    # Leave the CPU to a recording running on the same machine
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+
+
+def _convert_session(session_dir, output_video, fps, timing, workers):
+    os.makedirs(os.path.dirname(output_video) or ".", exist_ok=True)
+    return convert_images_to_video(session_dir, output_video, fps, workers=workers, timing=timing)
+
+
+def batch_convert(input_root="./data/video", output_root="./data/converted", fps=50, timing='index',
+                  jobs=None, workers=None, force=False, nice=10):
+    """
+    批量转换所有会话 / Convert every session under input_root, skipping up-to-date ones.
+
+    Args:
+        input_root: Folder searched recursively for image sessions.
+        output_root: Videos go to <output_root>/<session path relative to input_root>.mp4.
+        fps: Output frame rate.
+        timing: 'index', 'cfr' or 'vfr' (see module docstring).
+        jobs: Sessions converted at the same time (default: half the CPUs).
+        workers: Decoder threads per session (default: CPUs / jobs).
+        force: Convert even the sessions the manifest says are up to date.
+        nice: Priority decrease of the conversion processes (POSIX only, 0 = unchanged).
+
+    Returns:
+        Summary dict (sessions converted / skipped / failed, frames, bytes, seconds, rates).
+    """
+    cpus = os.cpu_count() or 1
+    jobs = max(1, jobs or cpus // 2)
+    workers = max(1, workers or cpus // jobs)
+    options = {'fps': fps, 'timing': timing}
+
+    os.makedirs(output_root, exist_ok=True)
+    manifest_path = os.path.join(output_root, MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
+
+    todo, skipped = [], []
+    for session_dir in discover_sessions(input_root):
+        rel = os.path.relpath(session_dir, input_root)
+        if rel == '.':
+            rel = os.path.basename(os.path.abspath(input_root))
+        output_video = os.path.join(output_root, rel + ".mp4")
+        fingerprint = session_fingerprint(session_dir, options)
+        if not force and is_up_to_date(manifest.get(rel), fingerprint, output_video):
+            skipped.append(rel)
+        else:
+            todo.append((rel, session_dir, output_video, fingerprint))
+
+    print(f"Converter: {len(todo) + len(skipped)} sessions in {input_root} | "
+          f"{len(skipped)} up to date | {len(todo)} to convert ({jobs} jobs x {workers} decoders)")
+
+    converted, failed = [], []
+    frames = total_bytes = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_lower_priority, initargs=(nice,)) as pool:
+        futures = {pool.submit(_convert_session, session_dir, output_video, fps, timing, workers):
+                   (rel, output_video, fingerprint)
+                   for rel, session_dir, output_video, fingerprint in todo}
+        for future in as_completed(futures):
+            rel, output_video, fingerprint = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                print(f"Converter: ✗ {rel}: {e}")
+                failed.append(rel)
+                continue
+            # Only finished sessions enter the manifest, so an interrupted run resumes where it stopped
+            manifest[rel] = {
+                **fingerprint,
+                **options,
+                'output': output_video,
+                'output_bytes': os.path.getsize(output_video),
+                'output_frames': stats['frames'],
+                'seconds': stats['seconds'],
+                'converted_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            save_manifest(manifest_path, manifest)
+            converted.append(rel)
+            frames += fingerprint['frames']
+            total_bytes += fingerprint['bytes']
+            print(f"Converter: ✓ {rel} ({len(converted)}/{len(todo)})")
+
+    seconds = time.perf_counter() - start
+    summary = {
+        'sessions': len(todo) + len(skipped),
+        'converted': len(converted),
+        'skipped': len(skipped),
+        'failed': failed,
+        'frames': frames,
+        'bytes': total_bytes,
+        'seconds': seconds,
+        'frames_per_s': frames / seconds if seconds > 0 else 0.0,
+        'mb_per_s': total_bytes / 1e6 / seconds if seconds > 0 else 0.0,
+    }
+    print("\n" + "=" * 60)
+    print(f"Converter: converted {summary['converted']} | skipped {summary['skipped']} | failed {len(failed)}")
+    print(f"Converter: {frames} frames, {total_bytes / 1e6:.1f} MB in {seconds:.1f}s "
+          f"({summary['frames_per_s']:.1f} frames/s, {summary['mb_per_s']:.1f} MB/s)")
+    if failed:
+        print(f"Converter: failed sessions: {', '.join(failed)}")
+    return summary
 
 
 def main():
     parser = argparse.ArgumentParser(
         description='Converter:  / Convert image sequence to video'
     )
-    parser.add_argument('--input_folder', type=str, required=True,
+    parser.add_argument('--input_folder', type=str, default=None,
                         help='Converter:  / Input folder containing images')
-    parser.add_argument('--output_video', type=str, required=True,
+    parser.add_argument('--output_video', type=str, default=None,
                         help='Converter:  / Output video file path')
+    parser.add_argument('--batch', action='store_true',
+                        help='Converter:  / Convert every session under --input_root')
+    parser.add_argument('--input_root', type=str, default='./data/video',
+                        help='Converter:  / Batch mode: folder searched for sessions')
+    parser.add_argument('--output_root', type=str, default='./data/converted',
+                        help='Converter:  / Batch mode: output folder (and manifest)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Converter:  / Batch mode: sessions converted at once (default: half the CPUs)')
+    parser.add_argument('--force', action='store_true',
+                        help='Converter:  / Batch mode: also convert up-to-date sessions')
+    parser.add_argument('--nice', type=int, default=10,
+                        help='Converter:  / Batch mode: lower the priority of conversion processes (default: 10)')
     parser.add_argument('--fps', type=int, default=50,
                         help='Converter:  / Video frame rate (default: 50)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Converter:  / Decoder threads or processes (default: CPU count)')
+    parser.add_argument('--prefetch', type=int, default=None,
+                        help='Converter:  / Maximum frames decoded ahead (default: 4 x workers)')
+    parser.add_argument('--executor', type=str, default='thread', choices=['thread', 'process'],
+                        help='Converter:  / Decode in a thread pool or a process pool')
+    parser.add_argument('--timing', type=str, default='index', choices=list(TIMING_MODES),
+                        help='Converter:  / index: one frame per image, cfr: constant-rate timeline from '
+                             'the timestamp filenames, vfr: one frame per image + timestamps sidecar')
 
     args = parser.parse_args()
 
+    if args.batch:
+        batch_convert(args.input_root, args.output_root, args.fps, timing=args.timing,
+                      jobs=args.jobs, workers=args.workers, force=args.force, nice=args.nice)
+        return
+    if args.input_folder is None or args.output_video is None:
+        parser.error("--input_folder and --output_video are required (or use --batch)")
+
     # / Verify input folder exists
     if not os.path.exists(args.input_folder):
         raise ValueError(f"Converter:  / Input folder does not exist: {args.input_folder}")
@@ -100,7 +485,9 @@ def main():
         print(f" Converter: / Created output directory: {output_dir}")
 
     # 转换 / Convert
-    convert_images_to_video(args.input_folder, args.output_video, args.fps)
+    convert_images_to_video(args.input_folder, args.output_video, args.fps,
+                            workers=args.workers, prefetch=args.prefetch, executor=args.executor,
+                            timing=args.timing)
 
 
 if __name__ == "__main__":